@@ -0,0 +1,2804 @@
+"""Moteur audio de MacAmp, sans dépendance à Qt
+
+Décodage et cache, mixage multi-voix (enchaînement et fondu), égaliseur,
+time-stretch, normalisation de sonie, métriques et lecture des métadonnées.
+Utilisé par l'interface (macamp.py) comme par le mode sans interface (headless.py).
+"""
+import os
+import time
+import threading
+import json
+import bisect
+import contextlib
+import heapq
+import itertools
+import hashlib
+import io
+import mmap
+import struct
+import re
+import subprocess
+import unicodedata
+from array import array
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+# librosa, scipy, mutagen et PIL sont importés dans les fonctions qui s'en servent
+# (analyses, scan, pochettes) : la lecture seule démarre sans les charger
+
+class RingBuffer:
+    """Tampon circulaire sans verrou : un seul producteur (thread audio), un seul lecteur"""
+    def __init__(self, capacity, channels=2):
+        self.buffer = np.zeros((capacity, channels), dtype=np.float32)
+        self.capacity = capacity
+        self.write_pos = 0  # Nombre total de frames publiées (croissant)
+        
+    def write(self, block):
+        # Une capacité multiple de la taille de bloc évite le découpage : une seule copie
+        count = len(block)
+        start = self.write_pos % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            self.buffer[start:end] = block
+        else:
+            first = self.capacity - start
+            self.buffer[start:] = block[:first]
+            self.buffer[:count - first] = block[first:]
+        self.write_pos += count  # Publier seulement une fois la copie terminée
+        
+    def read_latest(self, out):
+        """Copie les len(out) dernières frames publiées dans out, renvoie la position d'écriture"""
+        pos = self.write_pos
+        count = min(len(out), self.capacity)
+        start = (pos - count) % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            out[:count] = self.buffer[start:end]
+        else:
+            first = self.capacity - start
+            out[:first] = self.buffer[start:]
+            out[first:count] = self.buffer[:count - first]
+        return pos
+
+class OutputRecorder:
+    """Enregistre dans un WAV exactement ce que le callback envoie à la sortie
+
+    Le callback copie chaque bloc dans un anneau préalloué (push) : ni allocation
+    ni accès disque. Un thread vide l'anneau par grandes écritures séquentielles.
+    Si le disque prend trop de retard, les blocs qui ne tiennent plus dans l'anneau
+    sont comptés dans dropped_blocks au lieu de bloquer le callback.
+    """
+    WRITE_FRAMES = 65536  # Taille minimale d'une écriture (sauf à l'arrêt)
+    
+    def __init__(self, path, sample_rate, channels=2, seconds=10.0):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.capacity = int(seconds * sample_rate)
+        self.buffer = np.zeros((self.capacity, channels), dtype=np.float32)
+        self.write_pos = 0  # Frames publiées par le callback (croissant)
+        self.read_pos = 0  # Frames écrites sur disque (croissant)
+        self.dropped_blocks = 0
+        self.dropped_frames = 0
+        self.reported_drops = 0
+        self.file = sf.SoundFile(path, 'w', samplerate=sample_rate, channels=channels, subtype='FLOAT')
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        
+    def push(self, block):
+        """Appelé depuis le callback : copie le bloc, ou le compte comme perdu si l'anneau est plein"""
+        count = len(block)
+        if count > self.capacity - (self.write_pos - self.read_pos):
+            self.dropped_blocks += 1
+            self.dropped_frames += count
+            return
+        start = self.write_pos % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            self.buffer[start:end] = block
+        else:
+            first = self.capacity - start
+            self.buffer[start:] = block[:first]
+            self.buffer[:count - first] = block[first:]
+        self.write_pos += count  # Publier seulement une fois la copie terminée
+        
+    def drain(self, minimum):
+        """Écrit ce qui est publié, par morceaux contigus d'au moins `minimum` frames"""
+        while self.write_pos - self.read_pos >= max(minimum, 1):
+            start = self.read_pos % self.capacity
+            count = min(self.write_pos - self.read_pos, self.capacity - start)
+            self.file.write(self.buffer[start:start + count])
+            self.read_pos += count  # Libérer la place une fois les frames sur disque
+            
+    def run(self):
+        while not self.stopping.wait(0.1):
+            self.drain(min(self.WRITE_FRAMES, self.capacity // 2))
+            if self.dropped_blocks != self.reported_drops:
+                self.reported_drops = self.dropped_blocks
+                print(f"Enregistrement: {self.dropped_blocks} blocs perdus (disque trop lent)")
+                
+    @property
+    def seconds(self):
+        return self.write_pos / self.sample_rate
+        
+    def stats(self):
+        return {'path': self.path, 'seconds': round(self.seconds, 3),
+                'dropped_blocks': self.dropped_blocks, 'dropped_frames': self.dropped_frames}
+        
+    def stop(self):
+        """Termine l'écriture (les frames déjà publiées compris) et ferme le fichier"""
+        self.stopping.set()
+        self.thread.join()
+        self.drain(0)
+        self.file.close()
+        return self.stats()
+
+def get_cache_dir():
+    """Dossier des caches persistants de MacAmp (créé au besoin)"""
+    cache_dir = os.environ.get('MACAMP_CACHE_DIR') or os.path.join(os.path.expanduser("~"), ".macamp")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+class PersistentCache:
+    """Cache JSON sur disque, indexé par chemin et invalidé si le fichier change
+
+    Avec signed=False, les clés sont de simples noms (réglages par périphérique…).
+    """
+    def __init__(self, name, signed=True):
+        self.path = os.path.join(get_cache_dir(), name)
+        self.signed = signed
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+            
+    @staticmethod
+    def file_signature(file_path):
+        stat = os.stat(file_path)
+        return [stat.st_mtime_ns, stat.st_size]
+        
+    def get(self, file_path):
+        entry = self.entries.get(file_path)
+        if entry is None:
+            return None
+        if not self.signed:
+            return entry['value']
+        try:
+            if entry['signature'] != self.file_signature(file_path):
+                return None
+        except OSError:
+            return None
+        return entry['value']
+        
+    def set(self, file_path, value):
+        try:
+            signature = self.file_signature(file_path) if self.signed else None
+        except OSError:
+            return
+        self.entries[file_path] = {'signature': signature, 'value': value}
+        self.dirty = True
+        
+    def save(self):
+        if not self.dirty:
+            return
+        # Écriture atomique pour ne jamais laisser un cache tronqué
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.entries), f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+class SeekIndexStore:
+    """Index de positionnement des MP3 sur disque, un petit .npy par fichier
+
+    Chaque index est un tableau int64 (signature du fichier, paramètres, puis
+    offsets) nommé par le hash du chemin : enregistrer un index n'écrit que le
+    sien, et seuls les index des pistes lues sont chargés. Même interface que
+    PersistentCache (get/set), sans save : chaque set est écrit aussitôt.
+    """
+    HEADER = 8  # mtime_ns, taille, stride, samples_per_frame, sample_rate, trame d'en-tête (début, fin), total
+    
+    def __init__(self, name='seek_index'):
+        self.directory = os.path.join(get_cache_dir(), name)
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            os.remove(os.path.join(get_cache_dir(), 'seek_index.json'))  # Ancien format : un seul JSON
+        except OSError:
+            pass
+            
+    def path_for(self, file_path):
+        digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.npy")
+        
+    def get(self, file_path):
+        try:
+            values = np.load(self.path_for(file_path))
+            signature = PersistentCache.file_signature(file_path)
+        except (OSError, ValueError):
+            return None
+        if len(values) < self.HEADER or values[:2].tolist() != signature:
+            return None
+        stride, samples_per_frame, sample_rate, header_start, header_end, total = values[2:self.HEADER].tolist()
+        return {
+            'offsets': values[self.HEADER:].tolist(),
+            'stride': stride,
+            'samples_per_frame': samples_per_frame,
+            'sample_rate': sample_rate,
+            'header_frame': [header_start, header_end] if header_start >= 0 else None,
+            'total': total,
+        }
+        
+    def set(self, file_path, index):
+        try:
+            signature = PersistentCache.file_signature(file_path)
+        except OSError:
+            return
+        header_frame = index['header_frame'] or [-1, -1]
+        values = np.array(signature + [index['stride'], index['samples_per_frame'], index['sample_rate'],
+                                       header_frame[0], header_frame[1], index['total']]
+                          + list(index['offsets']), dtype=np.int64)
+        path = self.path_for(file_path)
+        # Écriture atomique : un lecteur ne voit jamais d'index tronqué
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.save(f, values)
+        os.replace(temp_path, path)
+
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afpfs', 'webdav', 'fuse.sshfs', '9p')
+_network_mounts = None
+
+def network_mounts():
+    """Points de montage des partages réseau (NFS, SMB…), plus MACAMP_REMOTE_PATHS
+
+    Lus une fois par processus : /proc/mounts sous Linux, la sortie de `mount`
+    sous macOS. MACAMP_REMOTE_PATHS (séparés par os.pathsep) force des dossiers
+    locaux à être traités comme distants (stockage lent, benchmarks).
+    """
+    global _network_mounts
+    if _network_mounts is None:
+        mounts = []
+        try:
+            if os.path.exists('/proc/mounts'):
+                with open('/proc/mounts', 'r', encoding='utf-8') as f:
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) > 2 and fields[2] in NETWORK_FILESYSTEMS:
+                            mounts.append(fields[1].replace('\\040', ' '))
+            else:
+                output = subprocess.run(['mount'], capture_output=True, text=True, timeout=5).stdout
+                for line in output.splitlines():
+                    # //user@serveur/partage on /Volumes/Musique (smbfs, nodev, ...)
+                    match = re.match(r'.+? on (.+) \((\w+)', line)
+                    if match and match.group(2) in NETWORK_FILESYSTEMS:
+                        mounts.append(match.group(1))
+        except (OSError, subprocess.SubprocessError):
+            pass
+        extra = os.environ.get('MACAMP_REMOTE_PATHS', '')
+        mounts.extend(path for path in extra.split(os.pathsep) if path)
+        _network_mounts = [os.path.join(os.path.abspath(mount), '') for mount in mounts]
+    return _network_mounts
+
+def is_remote(file_path):
+    path = os.path.abspath(file_path)
+    return any(path.startswith(mount) for mount in network_mounts())
+
+class ReadAheadFile(io.RawIOBase):
+    """Fichier en lecture servi par grands blocs alignés, pour mutagen et soundfile
+
+    Les lecteurs de tags et les décodeurs font beaucoup de petites lectures et de
+    seek ; sur un partage réseau chacune coûte un aller-retour. Ici chaque accès
+    hors cache lit un bloc entier (CHUNK octets) et les derniers blocs restent en
+    mémoire : l'en-tête et la fin du fichier (ID3v1, APE) coûtent une lecture chacun.
+    """
+    CHUNK = 256 << 10
+    
+    def __init__(self, file_path, cached_chunks=8):
+        super().__init__()
+        self.name = file_path
+        self.file = open(file_path, 'rb', buffering=0)
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.pos = 0
+        self.cached_chunks = cached_chunks
+        self.chunks = OrderedDict()
+        
+    def chunk(self, number):
+        data = self.chunks.get(number)
+        if data is None:
+            self.file.seek(number * self.CHUNK)
+            data = self.file.read(self.CHUNK)
+            self.chunks[number] = data
+            while len(self.chunks) > self.cached_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(number)
+        return data
+        
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        count = 0
+        while count < len(view) and self.pos < self.size:
+            number, offset = divmod(self.pos, self.CHUNK)
+            data = self.chunk(number)
+            part = data[offset:offset + len(view) - count]
+            if not part:
+                break
+            view[count:count + len(part)] = part
+            count += len(part)
+            self.pos += len(part)
+        return count
+        
+    def readable(self):
+        return True
+        
+    def seekable(self):
+        return True
+        
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.pos, os.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+        
+    def tell(self):
+        return self.pos
+        
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
+
+@contextlib.contextmanager
+def scan_source(file_path):
+    """Ce qu'on passe à librosa / mutagen : le chemin en local, un ReadAheadFile sur un partage réseau"""
+    if not is_remote(file_path):
+        yield file_path
+        return
+    with ReadAheadFile(file_path) as source:
+        yield source
+
+def rewind(source):
+    """Remet au début une source de scan_source avant de la passer à un autre lecteur"""
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+@contextlib.contextmanager
+def map_file(file_path):
+    """Contenu d'un fichier indexable comme des octets
+
+    Projection en mémoire en local ; sur un partage réseau, lecture du fichier
+    entier en grands blocs séquentiels (les défauts de page d'une projection y
+    deviennent autant de petites lectures).
+    """
+    if is_remote(file_path):
+        with ReadAheadFile(file_path, cached_chunks=1) as source:
+            yield source.read()
+        return
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield data
+
+class StagingCache:
+    """Copies locales bornées des fichiers d'un partage réseau (les plus récemment lus)
+
+    Un fichier distant est copié une fois par grandes lectures séquentielles, puis
+    décodé, projeté en mémoire et indexé depuis le disque local. La copie est
+    nommée d'après le chemin, la date et la taille : un fichier modifié est recopié.
+    Au-delà de max_bytes, les copies les moins récemment utilisées sont supprimées.
+    """
+    COPY_CHUNK = 8 << 20
+    
+    def __init__(self, max_bytes=None):
+        self.directory = os.path.join(get_cache_dir(), 'staging')
+        os.makedirs(self.directory, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('MACAMP_STAGING_MB', 2048)) << 20
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.copying = {}  # Nom local -> Event, copie en cours
+        self.prefetcher = ThreadPoolExecutor(max_workers=1)
+        # Ordre LRU repris des dates de modification (touchées à chaque utilisation)
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp'):
+                os.remove(path)  # Copie interrompue
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        self.entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.total_bytes = sum(self.entries.values())
+        
+    def local_name(self, file_path):
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+        extension = os.path.splitext(file_path)[1].lower()
+        # L'extension reste : les décodeurs s'en servent pour reconnaître le format
+        return hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest() + extension
+        
+    def stage(self, file_path):
+        """Chemin local à lire pour file_path (copié au besoin) ; file_path lui-même s'il est local"""
+        if not is_remote(file_path):
+            return file_path
+        try:
+            name = self.local_name(file_path)
+        except OSError:
+            return file_path
+        path = os.path.join(self.directory, name)
+        while True:
+            with self.lock:
+                if name in self.entries:
+                    self.entries.move_to_end(name)
+                    try:
+                        os.utime(path)
+                    except OSError:
+                        pass
+                    return path
+                event = self.copying.get(name)
+                if event is None:
+                    event = self.copying[name] = threading.Event()
+                    break
+            event.wait()  # Copie lancée par un autre thread (read-ahead)
+        try:
+            size = self.copy(file_path, path)
+            with self.lock:
+                self.entries[name] = size
+                self.total_bytes += size
+                self.evict(keep=name)
+            return path
+        except OSError as e:
+            print(f"Copie locale impossible ({e}), lecture directe: {file_path}")
+            return file_path
+        finally:
+            with self.lock:
+                del self.copying[name]
+            event.set()
+            
+    def copy(self, source_path, path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        buffer = bytearray(self.COPY_CHUNK)
+        view = memoryview(buffer)
+        size = 0
+        with open(source_path, 'rb', buffering=0) as source, open(tmp_path, 'wb') as target:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(source.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                count = source.readinto(buffer)
+                if not count:
+                    break
+                target.write(view[:count])
+                size += count
+        os.replace(tmp_path, path)
+        return size
+        
+    def evict(self, keep):
+        """Supprime les copies les plus anciennes au-delà de max_bytes (appelé sous self.lock)"""
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            name, size = next(iter(self.entries.items()))
+            if name == keep:
+                break
+            del self.entries[name]
+            self.total_bytes -= size
+            try:
+                # Une copie projetée en mémoire reste lisible après sa suppression
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+                
+    def prefetch(self, file_path):
+        """Copie en arrière-plan (piste sur le point d'être jouée)"""
+        if is_remote(file_path):
+            self.prefetcher.submit(self.stage, file_path)
+
+_staging_cache = None
+
+def get_staging_cache():
+    """StagingCache partagé par le processus (créé au premier usage)"""
+    global _staging_cache
+    if _staging_cache is None:
+        _staging_cache = StagingCache()
+    return _staging_cache
+
+def k_weighting_sos(sample_rate):
+    """Filtre de pondération K (ITU-R BS.1770) recalculé pour une fréquence quelconque"""
+    # Étage 1 : plateau haut (effet acoustique de la tête)
+    K = np.tan(np.pi * 1681.974450955533 / sample_rate)
+    Q = 0.7071752369554196
+    Vh = 10 ** (3.999843853973347 / 20)
+    Vb = Vh ** 0.4996667741545416
+    a0 = 1 + K / Q + K * K
+    shelf = [(Vh + Vb * K / Q + K * K) / a0, 2 * (K * K - Vh) / a0, (Vh - Vb * K / Q + K * K) / a0,
+             1.0, 2 * (K * K - 1) / a0, (1 - K / Q + K * K) / a0]
+    # Étage 2 : passe-haut RLB
+    K = np.tan(np.pi * 38.13547087602444 / sample_rate)
+    Q = 0.5003270373238773
+    a0 = 1 + K / Q + K * K
+    high_pass = [1.0, -2.0, 1.0, 1.0, 2 * (K * K - 1) / a0, (1 - K / Q + K * K) / a0]
+    return np.array([shelf, high_pass], dtype=np.float64)
+
+def measure_loudness(audio_data, sample_rate):
+    """Sonie intégrée (LUFS, EBU R128) et true peak (dBTP) d'un buffer (canaux, frames)"""
+    from scipy.signal import sosfilt, resample_poly
+    audio_data = np.atleast_2d(audio_data)
+    weighted = sosfilt(k_weighting_sos(sample_rate), audio_data, axis=1)
+    
+    # Énergie par tranche de 100 ms, puis blocs de 400 ms avec 75 % de recouvrement
+    step = int(round(0.1 * sample_rate))
+    num_steps = weighted.shape[1] // step
+    integrated = -70.0
+    if num_steps >= 4:
+        energy = np.square(weighted[:, :num_steps * step]).reshape(weighted.shape[0], num_steps, step)
+        step_power = energy.sum(axis=(0, 2))  # Somme des canaux (poids 1.0 pour L/R)
+        cumulative = np.concatenate(([0.0], np.cumsum(step_power)))
+        block_power = (cumulative[4:] - cumulative[:-4]) / (4 * step)
+        with np.errstate(divide='ignore'):
+            block_loudness = -0.691 + 10 * np.log10(block_power)
+        # Porte absolue à -70 LUFS puis porte relative à -10 LU
+        gated = block_power[block_loudness > -70.0]
+        if gated.size:
+            relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+            gated = block_power[block_loudness > max(relative_gate, -70.0)]
+            if gated.size:
+                integrated = float(-0.691 + 10 * np.log10(gated.mean()))
+                
+    # True peak : suréchantillonnage x4 par morceaux pour borner la mémoire
+    peak = 0.0
+    chunk = 1 << 18
+    margin = 64
+    for start in range(0, audio_data.shape[1], chunk):
+        lo = max(0, start - margin)
+        segment = audio_data[:, lo:start + chunk + margin]
+        upsampled = resample_poly(segment, 4, 1, axis=1)
+        peak = max(peak, float(np.max(np.abs(upsampled))) if upsampled.size else 0.0)
+    true_peak = 20 * np.log10(peak) if peak > 0 else -np.inf
+    return {'integrated': integrated, 'true_peak': float(true_peak)}
+
+def analyze_loudness(file_path):
+    """Tâche du pool d'analyse : décode le fichier et mesure sa sonie"""
+    import librosa
+    with scan_source(file_path) as source:
+        audio_data, sample_rate = librosa.load(source, sr=None, mono=False)
+    return measure_loudness(audio_data, sample_rate)
+
+def loudness_gain(loudness, target_lufs=-18.0, ceiling_db=-1.0):
+    """Gain linéaire ramenant la piste à la cible, limité pour que le true peak reste sous le plafond"""
+    gain_db = target_lufs - loudness['integrated']
+    gain_db = min(gain_db, ceiling_db - loudness['true_peak'])
+    return float(10 ** (gain_db / 20))
+
+def analyze_beats(file_path, sample_rate=22050):
+    """Tâche du pool d'analyse : tempo (BPM) et temps des battements (secondes) d'un fichier"""
+    import librosa
+    with scan_source(file_path) as source:
+        y, sr = librosa.load(source, sr=sample_rate, mono=True)
+    tempo, beats = librosa.beat.beat_track(y=y, sr=sr, units='time')
+    return {
+        'bpm': round(float(np.atleast_1d(tempo)[0]), 1),
+        'beats': [round(float(t), 3) for t in beats],
+    }
+
+def lower_priority():
+    """Initialiseur des processus d'analyse de fond : laisser le processeur au scan et à la lecture"""
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass  # Windows
+
+class AnalysisQueue:
+    """File de travaux d'analyse par fichier, avec priorités, exécutés dans un pool de processus
+
+    Au plus `max_in_flight` travaux sont confiés au pool à la fois : un fichier
+    soumis avec une priorité plus forte (valeur plus petite, par exemple la
+    piste courante) passe devant tous ceux qui attendent encore.
+    on_done(file_path, future) est appelé depuis un thread du pool.
+    """
+    def __init__(self, executor, function, on_done, max_in_flight):
+        self.executor = executor
+        self.function = function
+        self.on_done = on_done
+        self.max_in_flight = max_in_flight
+        self.heap = []
+        self.priorities = {}  # Priorité courante des fichiers en attente
+        self.in_flight = set()
+        self.counter = itertools.count()  # Ordre d'arrivée à priorité égale
+        self.lock = threading.Lock()
+        
+    def submit(self, file_path, priority=10):
+        with self.lock:
+            if file_path in self.in_flight:
+                return
+            current = self.priorities.get(file_path)
+            if current is not None and current <= priority:
+                return
+            # L'ancienne entrée du tas devient obsolète (ignorée au dépilage)
+            self.priorities[file_path] = priority
+            heapq.heappush(self.heap, (priority, next(self.counter), file_path))
+            self.pump()
+            
+    def pending(self):
+        with self.lock:
+            return len(self.priorities) + len(self.in_flight)
+            
+    def pump(self):
+        while len(self.in_flight) < self.max_in_flight and self.heap:
+            priority, _, file_path = heapq.heappop(self.heap)
+            if self.priorities.get(file_path) != priority:
+                continue
+            del self.priorities[file_path]
+            try:
+                future = self.executor.submit(self.function, file_path)
+            except RuntimeError:
+                return  # Pool arrêté (fermeture de l'application)
+            self.in_flight.add(file_path)
+            future.add_done_callback(lambda f, path=file_path: self.finished(path, f))
+            
+    def finished(self, file_path, future):
+        with self.lock:
+            self.in_flight.discard(file_path)
+            self.pump()
+        self.on_done(file_path, future)
+
+def biquad_coefficients(kind, freq, sample_rate, gain_db=0.0, q=0.7071):
+    """Section SOS normalisée d'un biquad (formules RBJ de l'Audio EQ Cookbook)"""
+    A = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * min(freq, 0.49 * sample_rate) / sample_rate
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2 * q)
+    if kind == 'peaking':
+        b = [1 + alpha * A, -2 * cos_w0, 1 - alpha * A]
+        a = [1 + alpha / A, -2 * cos_w0, 1 - alpha / A]
+    elif kind in ('low_shelf', 'high_shelf'):
+        sign = 1 if kind == 'low_shelf' else -1
+        sqrt_a = 2 * np.sqrt(A) * alpha
+        b = [A * ((A + 1) - sign * (A - 1) * cos_w0 + sqrt_a),
+             sign * 2 * A * ((A - 1) - sign * (A + 1) * cos_w0),
+             A * ((A + 1) - sign * (A - 1) * cos_w0 - sqrt_a)]
+        a = [(A + 1) + sign * (A - 1) * cos_w0 + sqrt_a,
+             -sign * 2 * ((A - 1) + sign * (A + 1) * cos_w0),
+             (A + 1) + sign * (A - 1) * cos_w0 - sqrt_a]
+    elif kind == 'low_pass':
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    elif kind == 'high_pass':
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+    else:
+        raise ValueError(f"Type de filtre inconnu: {kind}")
+    return np.array(b + a, dtype=np.float64) / a[0]
+
+def sosfilt_kernel():
+    """kernel(sos, x (canaux, frames), zi (canaux, sections, 2)) : cascade SOS float64 sur place"""
+    try:
+        from scipy.signal._sosfilt import _sosfilt  # Noyau de sosfilt, sans copie
+        return _sosfilt
+    except ImportError:
+        from scipy.signal import sosfilt
+        
+        def kernel(sos, x, zi):
+            x[:], state = sosfilt(sos, x, axis=1, zi=zi.transpose(1, 0, 2))
+            zi[...] = state.transpose(1, 0, 2)
+        return kernel
+
+class ParametricEqualizer:
+    """Égaliseur paramétrique multibande : biquads en cascade dont l'état suit les blocs"""
+    DEFAULT_BANDS = [
+        ('low_shelf', 80.0, 0.7071),
+        ('peaking', 250.0, 1.0),
+        ('peaking', 1000.0, 1.0),
+        ('peaking', 4000.0, 1.0),
+        ('high_shelf', 10000.0, 0.7071),
+    ]
+    
+    def __init__(self, sample_rate=44100, channels=2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bands = [{'kind': kind, 'freq': freq, 'gain_db': 0.0, 'q': q}
+                      for kind, freq, q in self.DEFAULT_BANDS]
+        self.enabled = True
+        # (version, sos) publiés par l'interface, état du filtre propre au thread audio
+        self.coefficients = (0, None)
+        self.zi = None
+        self.work = None
+        self.kernel = None
+        
+    def set_sample_rate(self, sample_rate):
+        if sample_rate and sample_rate != self.sample_rate:
+            self.sample_rate = sample_rate
+            self.update_coefficients()
+        
+    def set_band(self, index, **params):
+        """Modifie une bande (kind, freq, gain_db, q) et recalcule les coefficients"""
+        self.bands[index].update(params)
+        self.update_coefficients()
+        
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        
+    def update_coefficients(self):
+        if self.kernel is None:
+            # scipy.signal est long à importer : au premier réglage, jamais dans le callback
+            self.kernel = sosfilt_kernel()
+        # Une section par bande, même à plat (b = a : gain unité, état cohérent avec
+        # celui des autres réglages) : la disposition de l'état ne change jamais.
+        # Seul un égaliseur entièrement à plat est court-circuité.
+        sos = np.array([biquad_coefficients(band['kind'], band['freq'], self.sample_rate,
+                                            band['gain_db'], band['q'])
+                        for band in self.bands], dtype=np.float64)
+        if all(band['gain_db'] == 0.0 for band in self.bands):
+            sos = None
+        self.coefficients = (self.coefficients[0] + 1, sos)
+        
+    def ensure_buffer(self, frames, channels=None):
+        """Tampon de travail float64 (canaux, frames), alloué hors callback autant que possible"""
+        channels = channels or self.channels
+        if self.work is None or self.work.shape[0] != channels or self.work.shape[1] < frames:
+            self.work = np.zeros((channels, frames), dtype=np.float64)
+        if self.zi is None or self.zi.shape[0] != channels:
+            self.zi = np.zeros((channels, len(self.bands), 2), dtype=np.float64)
+        
+    def process(self, block):
+        """Filtre le bloc (frames, canaux) sur place"""
+        _, sos = self.coefficients
+        if sos is None or not self.enabled:
+            if self.zi is not None:
+                self.zi[...] = 0  # Repartir du repos à la réactivation
+            return block
+        frames, channels = block.shape
+        self.ensure_buffer(frames, channels)
+        # L'état (canaux, sections, 2) est conservé quand les réglages changent (pas de clic)
+        work = self.work[:, :frames]
+        np.copyto(work, block.T)
+        self.kernel(sos, work, self.zi)
+        np.copyto(block, work.T)
+        return block
+
+class TimeStretcher:
+    """Changement de vitesse en flux continu, bloc par bloc
+
+    Sans conservation de la hauteur : rééchantillonnage linéaire (varispeed).
+    Avec : WSOLA, des trames de la source sont recollées par addition-recouvrement
+    en cherchant, autour de la position idéale, le décalage le plus cohérent
+    avec la trame précédente.
+    """
+    def __init__(self, channels=2, frame_size=1024, tolerance=256, capacity=1 << 16):
+        self.channels = channels
+        self.frame_size = frame_size
+        self.hop = frame_size // 2
+        self.tolerance = tolerance
+        self.capacity = capacity
+        n = np.arange(frame_size)
+        # Hann périodique : la somme des fenêtres à 50 % de recouvrement vaut 1
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * n / frame_size)).astype(np.float32)[:, None]
+        self.input = np.zeros((capacity, channels), dtype=np.float32)
+        self.output = np.zeros((capacity, channels), dtype=np.float32)
+        self.ola = np.zeros((frame_size, channels), dtype=np.float32)
+        self.ramp = np.arange(capacity, dtype=np.float64)
+        self.reset()
+        
+    def reset(self):
+        self.input_len = 0
+        self.output_len = 0
+        self.position = 0.0  # Position de lecture (varispeed) ou de la trame idéale (WSOLA)
+        self.prev_start = None
+        self.ola.fill(0)
+        
+    def fill(self, needed, pull):
+        """Tire de la source jusqu'à disposer de `needed` frames en entrée"""
+        if needed > self.input_len:
+            count = needed - self.input_len
+            pull(self.input[self.input_len:needed], count)
+            self.input_len = needed
+            
+    def discard(self, keep_from):
+        # Compactage amorti : on ne déplace les données que lorsque la moitié est consommée
+        if keep_from < self.capacity // 2:
+            return
+        remaining = self.input_len - keep_from
+        self.input[:remaining] = self.input[keep_from:self.input_len]
+        self.input_len = remaining
+        self.position -= keep_from
+        if self.prev_start is not None:
+            self.prev_start -= keep_from
+            
+    def process(self, out, frames, rate, preserve_pitch, pull):
+        """Produit `frames` frames dans `out` en consommant environ rate * frames frames de source"""
+        if preserve_pitch:
+            while self.output_len < frames:
+                self.synthesize_frame(rate, pull)
+            out[:frames] = self.output[:frames]
+            self.output_len -= frames
+            self.output[:self.output_len] = self.output[frames:frames + self.output_len]
+        else:
+            self.reset_overlap()
+            positions = self.ramp[:frames] * rate + self.position
+            self.fill(int(positions[-1]) + 2, pull)
+            index = positions.astype(np.intp)
+            frac = (positions - index).astype(np.float32)[:, None]
+            out[:frames] = self.input[index] * (1 - frac) + self.input[index + 1] * frac
+            self.position += rate * frames
+            self.prev_start = None
+            self.discard(int(self.position))
+            
+    def reset_overlap(self):
+        # Passage de WSOLA au varispeed : la trame en cours est abandonnée
+        self.output_len = 0
+        self.ola.fill(0)
+            
+    def synthesize_frame(self, rate, pull):
+        N, hop, tolerance = self.frame_size, self.hop, self.tolerance
+        ideal = int(round(self.position))
+        if self.prev_start is None:
+            start = ideal
+        elif rate == 1.0:
+            # Vitesse normale : continuité naturelle, reconstruction exacte
+            start = self.prev_start + hop
+        else:
+            natural = self.prev_start + hop
+            lo = max(ideal - tolerance, 0)
+            hi = ideal + tolerance
+            self.fill(max(hi, natural) + N, pull)
+            template = self.input[natural:natural + N].mean(axis=1)
+            region = self.input[lo:hi + N].mean(axis=1)
+            correlation = np.correlate(region, template, mode='valid')
+            start = lo + int(np.argmax(correlation))
+        self.fill(start + N, pull)
+        
+        frame = self.input[start:start + N]
+        if self.prev_start is None:
+            # Première trame : pas de fondu d'entrée, le son reprend sans creux
+            self.ola[:hop] += frame[:hop]
+            self.ola[hop:] += frame[hop:] * self.window[hop:]
+        else:
+            self.ola += frame * self.window
+        self.output[self.output_len:self.output_len + hop] = self.ola[:hop]
+        self.output_len += hop
+        self.ola[:hop] = self.ola[hop:]
+        self.ola[hop:] = 0
+        
+        self.prev_start = start
+        self.position = start + hop if rate == 1.0 else self.position + rate * hop
+        self.discard(max(0, min(int(self.position) - tolerance, start + hop)))
+
+class EngineMetrics:
+    """Métriques du moteur audio ; le callback ne fait que des incréments sans allocation"""
+    # Bornes supérieures (µs) des classes de l'histogramme des durées de callback
+    BUCKETS_US = [25, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, float('inf')]
+    
+    def __init__(self):
+        self.histogram = [0] * len(self.BUCKETS_US)
+        self.callbacks = 0
+        self.max_callback_us = 0.0
+        self.max_load = 0.0  # Durée du callback / période du bloc
+        self.recent_max_load = 0.0  # Idem, remis à zéro à chaque relevé du LatencyTuner
+        self.underflows = 0
+        self.overflows = 0
+        self.tracks = deque(maxlen=100)
+        self.cache_stats = {}
+        self.play_request_time = None
+        self.stream = {}  # Réglages du stream ouvert (taille de bloc, latence)
+        self.recorder = None  # OutputRecorder en cours (frames écrites, blocs perdus)
+        
+    def reset_callbacks(self):
+        self.histogram = [0] * len(self.BUCKETS_US)
+        self.callbacks = 0
+        self.max_callback_us = 0.0
+        self.max_load = 0.0
+        
+    def record_callback(self, duration, frames, sample_rate, status):
+        duration_us = duration * 1e6
+        self.histogram[bisect.bisect_left(self.BUCKETS_US, duration_us)] += 1
+        self.callbacks += 1
+        if duration_us > self.max_callback_us:
+            self.max_callback_us = duration_us
+        if sample_rate:
+            load = duration * sample_rate / frames
+            if load > self.max_load:
+                self.max_load = load
+            if load > self.recent_max_load:
+                self.recent_max_load = load
+        if status:
+            if status.output_underflow:
+                self.underflows += 1
+            if status.output_overflow:
+                self.overflows += 1
+                
+    def record_cache(self, name, hit):
+        stats = self.cache_stats.setdefault(name, [0, 0])
+        stats[0 if hit else 1] += 1
+        
+    def record_decode(self, file_path, duration, cache_hit):
+        self.record_cache('audio', cache_hit)
+        self.tracks.append({
+            'file': file_path,
+            'decode_ms': None if cache_hit else round(duration * 1000, 2),
+            'cache_hit': cache_hit,
+            'first_sound_ms': None,
+        })
+        
+    def mark_play_requested(self):
+        self.play_request_time = time.perf_counter()
+        
+    def record_first_sound(self, now, file_path, time_info):
+        # Délai jusqu'au callback, plus la latence de sortie annoncée par PortAudio
+        elapsed = now - self.play_request_time
+        self.play_request_time = None
+        try:
+            elapsed += max(0.0, time_info.outputBufferDacTime - time_info.currentTime)
+        except AttributeError:
+            pass
+        for track in reversed(self.tracks):
+            if track['file'] == file_path:
+                if track['first_sound_ms'] is None:
+                    track['first_sound_ms'] = round(elapsed * 1000, 2)
+                break
+                
+    def percentile_us(self, fraction):
+        """Borne supérieure de la classe contenant le percentile demandé"""
+        target = fraction * self.callbacks
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS_US, self.histogram):
+            cumulative += count
+            if count and cumulative >= target:
+                return bound
+        return 0.0
+        
+    def snapshot(self):
+        return {
+            'timestamp': time.time(),
+            'callbacks': {
+                'count': self.callbacks,
+                'histogram_us': {('inf' if bound == float('inf') else str(bound)): count
+                                 for bound, count in zip(self.BUCKETS_US, self.histogram)},
+                'p50_us': self.percentile_us(0.5),
+                'p99_us': self.percentile_us(0.99),
+                'max_us': round(self.max_callback_us, 1),
+                'max_load': round(self.max_load, 4),
+            },
+            'underflows': self.underflows,
+            'overflows': self.overflows,
+            'stream': dict(self.stream),
+            'recording': self.recorder.stats() if self.recorder else None,
+            'tracks': list(self.tracks),
+            'caches': {name: {'hits': hits, 'misses': misses,
+                              'hit_rate': hits / (hits + misses) if hits + misses else None}
+                       for name, (hits, misses) in self.cache_stats.items()},
+        }
+        
+    def dump(self, path):
+        """Écrit un instantané JSON des métriques"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, default=str)
+
+def output_device_name(device=None):
+    """Nom du périphérique de sortie (celui par défaut si device est None)"""
+    try:
+        return sd.query_devices(device, kind='output')['name']
+    except Exception:
+        return 'default'
+
+def list_output_devices():
+    """Noms des périphériques de sortie connus de PortAudio"""
+    try:
+        devices = sd.query_devices()
+    except Exception:
+        return []
+    return [device['name'] for device in devices if device['max_output_channels'] > 0]
+
+def find_output_device(name):
+    """Indice PortAudio du périphérique de sortie nommé name, None s'il est absent"""
+    try:
+        devices = sd.query_devices()
+    except Exception:
+        return None
+    for index, device in enumerate(devices):
+        if device['name'] == name and device['max_output_channels'] > 0:
+            return index
+    return None
+
+def refresh_devices():
+    """Relit la liste des périphériques : PortAudio ne la met à jour qu'à son initialisation
+
+    Ferme tous les streams ouverts : à n'appeler que stream fermé.
+    """
+    sd._terminate()
+    sd._initialize()
+
+class DeviceMonitor:
+    """Surveille le périphérique de sortie et rouvre le stream s'il disparaît
+
+    Un périphérique débranché ne produit plus de callbacks : après STALL_TIMEOUT
+    sans callback en lecture, la liste des périphériques est relue et le stream
+    rouvert (sur le périphérique choisi s'il est revenu, sinon sur celui par
+    défaut) à la même position. En repli, le retour du périphérique choisi est
+    guetté aux passages silencieux, à intervalle doublé à chaque échec (relire la
+    liste réinitialise PortAudio) ; à l'arrêt, il n'est recherché qu'au prochain play.
+    """
+    CHECK_INTERVAL = 0.5
+    STALL_TIMEOUT = 1.0
+    RETRY_INTERVAL = 2.0
+    MAX_RETRY_INTERVAL = 60.0
+    
+    def __init__(self, player):
+        self.player = player
+        self.last_callbacks = -1
+        self.stalled_since = None
+        self.last_retry = 0.0
+        self.retry_interval = self.RETRY_INTERVAL
+        self.thread = None
+        
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+            
+    def run(self):
+        while True:
+            time.sleep(self.CHECK_INTERVAL)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Erreur surveillance de la sortie audio: {e}")
+                
+    def check(self):
+        player = self.player
+        now = time.monotonic()
+        if not player.device_fallback:
+            self.retry_interval = self.RETRY_INTERVAL
+        if not player.is_playing or player.stream is None:
+            self.stalled_since = None
+            return
+        callbacks = player.metrics.callbacks
+        if callbacks != self.last_callbacks:
+            self.last_callbacks = callbacks
+            self.stalled_since = None
+        elif self.stalled_since is None:
+            self.stalled_since = now
+        elif now - self.stalled_since > self.STALL_TIMEOUT:
+            print(f"Sortie audio muette depuis {now - self.stalled_since:.1f} s, réouverture")
+            self.stalled_since = None
+            self.last_retry = now
+            player.reopen_stream(refresh=True)
+            return
+        if (player.device_fallback and now - self.last_retry > self.retry_interval
+                and player.latency_tuner.upcoming_silence()):
+            self.last_retry = now
+            player.reopen_stream(refresh=True)
+            if player.device_fallback:
+                self.retry_interval = min(self.retry_interval * 2, self.MAX_RETRY_INTERVAL)
+
+class LatencyTuner:
+    """Taille de bloc et latence du stream adaptées à la machine et à la charge
+
+    Un thread de surveillance relève les compteurs d'EngineMetrics (le callback
+    n'en fait pas plus) : une sous-alimentation ou une charge proche de la période
+    fait monter d'un niveau, une longue période de marge fait redescendre. Le stream
+    n'est rouvert qu'à un point sûr : prochain play, ou passage silencieux de la
+    source. Le niveau retenu est mémorisé par périphérique de sortie.
+    """
+    LEVELS = [(256, 'low'), (512, 'low'), (1024, 'low'), (2048, 'high'), (4096, 'high')]
+    DEFAULT_LEVEL = 1  # 512 / 'low', l'ancien réglage fixe
+    CHECK_INTERVAL = 0.5
+    CALM_CHECKS = 40  # 20 s de marge avant de réduire
+    SHRINK_LOAD = 0.3  # Charge max sous laquelle un bloc deux fois plus petit tient
+    GROW_LOAD = 0.8
+    SILENCE = 1e-3  # -60 dBFS
+    
+    def __init__(self, player):
+        self.player = player
+        self.enabled = True
+        self.settings = PersistentCache('latency.json', signed=False)
+        self.device = None
+        self.level = self.target = self.DEFAULT_LEVEL
+        self.unstable = set()  # Niveaux ayant sous-alimenté : pas de nouvel essai
+        self.seen_underflows = 0
+        self.calm_checks = 0
+        self.glitching_checks = 0
+        self.thread = None
+        
+    def settings_for_stream(self, device=None):
+        """(taille de bloc, latence) du stream qui va s'ouvrir, changement en attente compris"""
+        name = output_device_name(device)
+        if name != self.device:
+            self.device = name
+            saved = self.settings.get(name)
+            self.level = saved if saved in range(len(self.LEVELS)) else self.DEFAULT_LEVEL
+            self.unstable = set()
+        elif self.target != self.level:
+            self.level = self.target
+            self.save()
+        self.target = self.level
+        self.seen_underflows = self.player.metrics.underflows
+        self.calm_checks = self.glitching_checks = 0
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self.LEVELS[self.level]
+        
+    def run(self):
+        while True:
+            time.sleep(self.CHECK_INTERVAL)
+            if self.enabled and self.player.is_playing:
+                try:
+                    self.check()
+                except Exception as e:
+                    print(f"Erreur réglage de latence: {e}")
+                    
+    def check(self):
+        metrics = self.player.metrics
+        load, metrics.recent_max_load = metrics.recent_max_load, 0.0
+        underflows = metrics.underflows - self.seen_underflows
+        self.seen_underflows = metrics.underflows
+        if underflows or load > self.GROW_LOAD:
+            self.calm_checks = 0
+            if underflows:
+                self.glitching_checks += 1
+                self.unstable.add(self.level)
+            self.target = min(self.level + 1, len(self.LEVELS) - 1)
+        elif load < self.SHRINK_LOAD:
+            self.glitching_checks = 0
+            self.calm_checks += 1
+            if self.calm_checks >= self.CALM_CHECKS:
+                self.calm_checks = 0
+                if self.level > 0 and self.level - 1 not in self.unstable:
+                    self.target = self.level - 1
+        else:
+            self.calm_checks = self.glitching_checks = 0
+        # Des sous-alimentations répétées s'entendent déjà : inutile d'attendre un silence
+        if self.target != self.level and (self.glitching_checks >= 2 or self.upcoming_silence()):
+            self.apply()
+            
+    def upcoming_silence(self, seconds=0.25):
+        """La source est-elle silencieuse juste après la position courante ?"""
+        player = self.player
+        audio_data, start = player.audio_data, player.current_frame
+        if audio_data is None or not player.sample_rate:
+            return False
+        block = audio_data[:, start:start + int(seconds * player.sample_rate)]
+        if block.shape[1] == 0:
+            return False
+        peak = float(np.max(np.abs(np.asarray(block, dtype=np.float32)))) * player.source_scale
+        return peak < self.SILENCE
+        
+    def apply(self):
+        player = self.player
+        with player.stream_lock:
+            if not player.is_playing or player.stream is None:
+                return  # Appliqué au prochain play
+            self.level = self.target
+            player.buffer_size, player.latency = self.LEVELS[self.level]
+            player.ensure_buffers(player.buffer_size)
+            player.open_stream()
+        self.glitching_checks = 0
+        self.save()
+        print(f"Stream rouvert : blocs de {player.buffer_size}, latence '{player.latency}'")
+        
+    def save(self):
+        self.settings.set(self.device, self.level)
+        self.settings.save()
+
+def make_crossfade_curves(length, curve='equal_power'):
+    """Calcule les courbes (sortie, entrée) d'un fondu enchaîné de `length` échantillons"""
+    t = np.linspace(0.0, 1.0, length, endpoint=False, dtype=np.float64)
+    if callable(curve):
+        fade_out, fade_in = curve(t)
+    elif curve == 'equal_power':
+        fade_out, fade_in = np.cos(t * np.pi / 2), np.sin(t * np.pi / 2)
+    elif curve == 'linear':
+        fade_out, fade_in = 1.0 - t, t
+    elif curve == 's_curve':
+        fade_in = 0.5 - 0.5 * np.cos(t * np.pi)
+        fade_out = 1.0 - fade_in
+    else:
+        raise ValueError(f"Courbe de fondu inconnue: {curve}")
+    return (np.ascontiguousarray(fade_out, dtype=np.float32),
+            np.ascontiguousarray(fade_in, dtype=np.float32))
+
+PCM_SCALES = {
+    np.dtype('int16'): 1 / 32768,
+    np.dtype('int32'): 1 / 2147483648,
+    np.dtype('float32'): 1.0,
+}
+
+def read_aiff_header(file_path):
+    """(canaux, frames, bits, fréquence, offset des données, little-endian) d'un AIFF/AIFC non compressé"""
+    with open(file_path, 'rb') as f:
+        form, _, kind = struct.unpack('>4sI4s', f.read(12))
+        if form != b'FORM' or kind not in (b'AIFF', b'AIFC'):
+            raise ValueError("pas un fichier AIFF")
+        comm = None
+        little_endian = False
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("chunk SSND introuvable")
+            chunk_id, size = struct.unpack('>4sI', header)
+            if chunk_id == b'COMM':
+                body = f.read(size)
+                channels, frames, bits = struct.unpack('>hIh', body[:8])
+                exponent, mantissa = struct.unpack('>HQ', body[8:18])
+                sample_rate = mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)
+                if kind == b'AIFC':
+                    compression = body[18:22]
+                    if compression not in (b'NONE', b'sowt'):
+                        raise ValueError("AIFC compressé")
+                    little_endian = compression == b'sowt'
+                comm = (channels, frames, bits, int(round(sample_rate)))
+            elif chunk_id == b'SSND':
+                offset, _ = struct.unpack('>II', f.read(8))
+                if comm is None:
+                    raise ValueError("chunk COMM absent")
+                return comm + (f.tell() + offset, little_endian)
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+def open_pcm(file_path):
+    """Projette en mémoire les données PCM d'un WAV/AIFF sans les décoder
+
+    Renvoie (vue (canaux, frames) au format natif, fréquence, facteur d'échelle
+    vers [-1, 1]), ou None si le format demande un vrai décodage. La conversion
+    en float32 se fait bloc par bloc dans read_block ; l'échelle est repliée
+    dans le gain de sortie.
+    """
+    from scipy.io import wavfile
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension == '.wav':
+            sample_rate, data = wavfile.read(file_path, mmap=True)
+        elif extension in ('.aiff', '.aif'):
+            channels, frames, bits, sample_rate, offset, little_endian = read_aiff_header(file_path)
+            if bits not in (16, 32):
+                return None
+            dtype = np.dtype(('<' if little_endian else '>') + f"i{bits // 8}")
+            data = np.memmap(file_path, dtype=dtype, mode='r', offset=offset, shape=(frames, channels))
+        else:
+            return None
+    except (ValueError, OSError, struct.error):
+        return None  # 24 bits, compressé, en-tête inhabituel : décodage classique
+    scale = PCM_SCALES.get(np.dtype(data.dtype.name))
+    if scale is None:
+        return None
+    if data.ndim == 1:
+        # Mono : les deux canaux lisent la même mémoire
+        return np.broadcast_to(data[None, :], (2, data.shape[0])), sample_rate, scale
+    if data.shape[1] != 2:
+        return None
+    return data.T, sample_rate, scale
+
+MP3_BITRATES = {
+    'mpeg1': (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    'mpeg2': (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+def parse_mp3_header(header):
+    """(taille de la trame en octets, échantillons par trame, fréquence) d'un en-tête MPEG Layer III, ou None"""
+    value = int.from_bytes(header[:4], 'big')
+    if value >> 21 != 0x7FF:
+        return None
+    version = (value >> 19) & 3
+    layer = (value >> 17) & 3
+    bitrate_index = (value >> 12) & 15
+    rate_index = (value >> 10) & 3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES['mpeg1' if version == 3 else 'mpeg2'][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 3 else 576
+    padding = (value >> 9) & 1
+    return samples_per_frame * bitrate // (8 * sample_rate) + padding, samples_per_frame, sample_rate
+
+def build_seek_index(file_path, stride=32):
+    """Index de positionnement d'un MP3 : offset d'une trame audio sur `stride`
+
+    La trame Xing/Info/VBRI éventuelle est mise à part : elle est rejouée devant
+    chaque vue du fichier pour que le décodeur garde le même retrait de début
+    (gapless) qu'en lecture depuis le début. Résultat sérialisable en JSON.
+    """
+    with map_file(file_path) as data:
+        pos = 0
+        if data[:3] == b'ID3':
+            pos = 10 + (data[6] << 21 | data[7] << 14 | data[8] << 7 | data[9])
+        size = len(data)
+        offsets = []
+        header_frame = None
+        frames = 0
+        samples_per_frame = sample_rate = None
+        while pos + 4 <= size:
+            parsed = parse_mp3_header(data[pos:pos + 4])
+            if parsed is None or parsed[0] < 4:
+                pos += 1  # Resynchronisation octet par octet
+                continue
+            length, samples_per_frame, sample_rate = parsed
+            if pos + length > size:
+                break
+            if frames == 0 and header_frame is None and any(tag in data[pos:pos + 64] for tag in (b'Xing', b'Info', b'VBRI')):
+                header_frame = [pos, pos + length]
+            else:
+                if frames % stride == 0:
+                    offsets.append(pos)
+                frames += 1
+            pos += length
+    if not frames:
+        return None
+    if header_frame is not None:
+        with scan_source(file_path) as source:
+            total = sf.info(source).frames  # Exact : nombre de trames du Xing, retraits gapless déduits
+    else:
+        total = frames * samples_per_frame
+    return {
+        'offsets': offsets,
+        'stride': stride,
+        'samples_per_frame': samples_per_frame,
+        'sample_rate': sample_rate,
+        'header_frame': header_frame,
+        'total': total,
+    }
+
+class FileView:
+    """Fichier virtuel pour soundfile : `prefix` suivi du fichier à partir de `offset`"""
+    def __init__(self, file_path, offset, prefix=b''):
+        self.file = open(file_path, 'rb')
+        self.offset = offset
+        self.prefix = prefix
+        self.size = len(prefix) + os.path.getsize(file_path) - offset
+        self.pos = 0
+        
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        count = 0
+        if self.pos < len(self.prefix):
+            head = self.prefix[self.pos:self.pos + len(view)]
+            view[:len(head)] = head
+            count = len(head)
+        if count < len(view):
+            self.file.seek(self.offset + self.pos + count - len(self.prefix))
+            count += self.file.readinto(view[count:]) or 0
+        self.pos += count
+        return count
+        
+    def read(self, size=-1):
+        buffer = bytearray(self.size - self.pos if size < 0 else size)
+        return bytes(buffer[:self.readinto(buffer)])
+        
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.pos, os.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+        
+    def tell(self):
+        return self.pos
+        
+    def close(self):
+        self.file.close()
+
+class StreamingSource:
+    """Source compressée décodée à la demande, par blocs, avec l'interface d'un tableau (canaux, frames)
+
+    Les blocs récents restent en cache et le suivant est décodé en avance par un
+    thread : le callback ne décode lui-même qu'après un saut non préparé
+    (voir prepare). En boucle, les blocs du début de boucle et de la jointure
+    restent décodés (voir set_loop). Pour les MP3, l'index de build_seek_index permet d'ouvrir
+    le décodeur directement quelques trames avant la position voulue puis
+    d'écarter les échantillons en trop (positionnement exact) ; les autres
+    formats utilisent le seek de libsndfile (exact pour Ogg Vorbis).
+    Chaque bloc est lu en un seul appel : le décodeur MPEG de libsndfile
+    produit des échantillons faux quand on enchaîne de petites lectures.
+    """
+    CHUNK_FRAMES = 131072
+    PRIMING_FRAMES = 24  # Trames décodées puis jetées : réservoir de bits et recouvrement MDCT
+    prefetcher = ThreadPoolExecutor(max_workers=1)
+    
+    def __init__(self, file_path, seek_index=None, cached_chunks=4):
+        info = sf.info(file_path)
+        self.file_path = file_path
+        self.sample_rate = info.samplerate
+        self.seek_index = seek_index
+        total = seek_index['total'] if seek_index else info.frames
+        self.shape = (2, total)
+        self.ndim = 2
+        self.dtype = np.dtype(np.float32)
+        self.cached_chunks = cached_chunks
+        self.chunks = OrderedDict()
+        self.lock = threading.Lock()
+        self.prefetching = set()
+        self.loop_end_chunk = None  # Dernier bloc lu avant le retour en début de boucle
+        self.pinned = frozenset()  # Blocs jamais évincés tant que la boucle est active
+        self.header_frame = b''
+        if seek_index and seek_index['header_frame'] is not None:
+            start, end = seek_index['header_frame']
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                self.header_frame = f.read(end - start)
+                
+    def header_for(self, view_size):
+        """Trame Xing/VBRI dont la taille de flux annoncée est celle de la vue (évite les avertissements de mpg123)"""
+        header = bytearray(self.header_frame)
+        for tag in (b'Xing', b'Info'):
+            pos = header.find(tag)
+            if pos >= 0:
+                flags = int.from_bytes(header[pos + 4:pos + 8], 'big')
+                if flags & 2:
+                    field = pos + 8 + (4 if flags & 1 else 0)
+                    header[field:field + 4] = view_size.to_bytes(4, 'big')
+                return bytes(header)
+        pos = header.find(b'VBRI')
+        if pos >= 0:
+            header[pos + 10:pos + 14] = view_size.to_bytes(4, 'big')
+        return bytes(header)
+        
+    def read_frames(self, start, count):
+        """Décode jusqu'à `count` frames à partir de `start`"""
+        index = self.seek_index
+        if index is None:
+            with sf.SoundFile(self.file_path) as decoder:
+                decoder.seek(start)
+                return decoder.read(count, dtype='float32', always_2d=True)
+        samples_per_frame = index['samples_per_frame']
+        first = max(0, start // samples_per_frame - self.PRIMING_FRAMES)
+        entry = first // index['stride']
+        offset = index['offsets'][entry]
+        skip = start - entry * index['stride'] * samples_per_frame
+        prefix = b''
+        if self.header_frame:
+            prefix = self.header_for(len(self.header_frame) + os.path.getsize(self.file_path) - offset)
+        view = FileView(self.file_path, offset, prefix)
+        try:
+            with sf.SoundFile(view) as decoder:
+                return decoder.read(skip + count, dtype='float32', always_2d=True)[skip:]
+        finally:
+            view.close()
+            
+    def decode_chunk(self, number):
+        with self.lock:
+            self.prefetching.discard(number)
+            if number in self.chunks:
+                return self.chunks[number]
+            start = number * self.CHUNK_FRAMES
+            count = max(0, min(self.CHUNK_FRAMES, self.shape[1] - start))
+            chunk = np.zeros((2, count), dtype=np.float32)
+            filled = 0
+            while filled < count:
+                # Une vue MP3 sans trame Xing peut s'arrêter trop tôt (durée estimée) : reprendre où elle s'est arrêtée
+                data = self.read_frames(start + filled, count - filled)
+                if not len(data):
+                    break
+                chunk[:, filled:filled + len(data)] = data[:, :2].T if data.shape[1] > 1 else data[:, 0]
+                filled += len(data)
+            self.chunks[number] = chunk
+            evictable = [key for key in self.chunks if key not in self.pinned]
+            for key in evictable[:max(0, len(evictable) - self.cached_chunks)]:
+                del self.chunks[key]
+            return chunk
+            
+    def chunk(self, number):
+        chunk = self.chunks.get(number)
+        if chunk is None:
+            chunk = self.decode_chunk(number)
+        following = number + 1
+        if self.loop_end_chunk is not None and number >= self.loop_end_chunk:
+            return chunk  # La lecture repart au début de boucle, déjà décodé
+        if following * self.CHUNK_FRAMES < self.shape[1] and following not in self.chunks and following not in self.prefetching:
+            self.prefetching.add(following)
+            self.prefetcher.submit(self.decode_chunk, following)
+        return chunk
+        
+    def prepare(self, frame):
+        """Décode le bloc contenant `frame` avant l'ouverture du stream (appelé hors callback)"""
+        self.chunk(max(0, min(frame, self.shape[1] - 1)) // self.CHUNK_FRAMES)
+        
+    def set_loop(self, loop, seam_frames=0):
+        """Boucle (début, fin) en frames, ou None : ses blocs de jointure sont décodés d'avance
+
+        Le bloc du début de boucle et celui de la suite de la fin (fondu de
+        jointure) ne sont plus évincés ; le préchargement ne dépasse plus la fin.
+        Appelé hors callback : le décodage se fait dans le thread de préchargement.
+        """
+        if loop is None:
+            self.loop_end_chunk = None
+            self.pinned = frozenset()
+            return
+        start, end = loop
+        tail_end = min(end + seam_frames, self.shape[1])
+        self.loop_end_chunk = max(0, tail_end - 1) // self.CHUNK_FRAMES
+        self.pinned = frozenset({start // self.CHUNK_FRAMES, self.loop_end_chunk})
+        for number in self.pinned:
+            if number not in self.chunks and number not in self.prefetching:
+                self.prefetching.add(number)
+                self.prefetcher.submit(self.decode_chunk, number)
+        
+    def __getitem__(self, key):
+        _, columns = key
+        start, stop, _ = columns.indices(self.shape[1])
+        if stop <= start:
+            return np.zeros((2, 0), dtype=np.float32)
+        first, last = start // self.CHUNK_FRAMES, (stop - 1) // self.CHUNK_FRAMES
+        if first == last:
+            # Cas courant : une vue dans un seul bloc, sans copie
+            base = first * self.CHUNK_FRAMES
+            return self.chunk(first)[:, start - base:stop - base]
+        parts = []
+        for number in range(first, last + 1):
+            base = number * self.CHUNK_FRAMES
+            parts.append(self.chunk(number)[:, max(start, base) - base:min(stop, base + self.CHUNK_FRAMES) - base])
+        return np.concatenate(parts, axis=1)
+        
+    def __array__(self, dtype=None, copy=None):
+        data = self[:, 0:self.shape[1]]
+        return data.astype(dtype) if dtype is not None else data
+
+def decode_to_shared_memory(file_path, target_sr=None):
+    """Tâche du processus de décodage : PCM float32 (canaux, frames) écrit en mémoire partagée
+
+    Renvoie (nom du bloc, forme, fréquence). Le décodage (et le rééchantillonnage
+    éventuel) tient le GIL de ce processus, pas celui du callback audio.
+    """
+    import librosa
+    audio_data, sample_rate = librosa.load(file_path, sr=None, mono=False, res_type='kaiser_fast')
+    if audio_data.ndim == 1:
+        audio_data = np.vstack((audio_data, audio_data))
+    if target_sr and sample_rate != target_sr:
+        audio_data = librosa.resample(audio_data, orig_sr=sample_rate, target_sr=target_sr)
+        sample_rate = target_sr
+    block = shared_memory.SharedMemory(create=True, size=max(1, audio_data.nbytes))
+    np.ndarray(audio_data.shape, dtype=np.float32, buffer=block.buf)[:] = audio_data
+    # Le bloc appartient désormais au lecteur : ce processus ne doit pas le supprimer en sortant
+    resource_tracker.unregister(block._name, 'shared_memory')
+    block.close()
+    return block.name, audio_data.shape, sample_rate
+
+class WaveformPyramid:
+    """Enveloppes multi-résolution d'une piste pour l'affichage de la forme d'onde
+
+    Le niveau 0 résume des blocs de BASE_BLOCK frames (min, max et moyenne de
+    |x| du mélange des canaux) ; chaque niveau suivant regroupe FACTOR blocs du
+    précédent. Une vue est servie par le niveau le plus grossier assez fin pour
+    elle ; en deçà du niveau 0, les frames sont lues directement dans la source
+    (projection mémoire ou décodage en flux), sans rien copier d'autre que la vue.
+    """
+    BASE_BLOCK = 256
+    FACTOR = 4
+    
+    def __init__(self, source, sample_rate, scale=1.0):
+        self.source = source
+        self.sample_rate = sample_rate
+        self.scale = scale
+        self.total = source.shape[1]
+        self.levels = []  # Tableaux (blocs, 3) : min, max, moyenne de |x|
+        
+    def build(self, chunk_frames=1 << 20):
+        chunk_frames -= chunk_frames % self.BASE_BLOCK
+        blocks = -(-self.total // self.BASE_BLOCK)
+        base = np.zeros((blocks, 3), dtype=np.float32)
+        for start in range(0, self.total, chunk_frames):
+            mono = self.read_mono(start, min(self.total, start + chunk_frames))
+            edges = np.arange(0, len(mono), self.BASE_BLOCK)
+            first = start // self.BASE_BLOCK
+            base[first:first + len(edges)] = self.reduce(mono, edges)
+        self.levels = [base]
+        while len(self.levels[-1]) > 1024:
+            previous = self.levels[-1]
+            self.levels.append(self.merge(previous, np.arange(0, len(previous), self.FACTOR)))
+        return self
+        
+    def read_mono(self, start, stop):
+        block = np.asarray(self.source[:, start:stop], dtype=np.float32)
+        mono = block[0] + block[1]
+        mono *= np.float32(0.5 * self.scale)
+        return mono
+        
+    @staticmethod
+    def reduce(mono, edges):
+        counts = np.diff(np.append(edges, len(mono)))
+        return np.stack([
+            np.minimum.reduceat(mono, edges),
+            np.maximum.reduceat(mono, edges),
+            np.add.reduceat(np.abs(mono), edges) / counts,
+        ], axis=1)
+        
+    @staticmethod
+    def merge(level, edges):
+        counts = np.diff(np.append(edges, len(level)))
+        return np.stack([
+            np.minimum.reduceat(level[:, 0], edges),
+            np.maximum.reduceat(level[:, 1], edges),
+            np.add.reduceat(level[:, 2], edges) / counts,
+        ], axis=1)
+        
+    def columns(self, start, stop, count):
+        """(count, 3) : min, max et moyenne de |x| de chaque colonne de la vue [start, stop)"""
+        start, stop = max(0, int(start)), min(self.total, int(stop))
+        if stop <= start or count <= 0:
+            return np.zeros((0, 3), dtype=np.float32)
+        frames_per_column = (stop - start) / count
+        boundaries = start + np.floor(np.arange(count) * frames_per_column).astype(np.int64)
+        if frames_per_column < self.BASE_BLOCK or not self.levels:
+            # Zoom profond : frames lues dans la source, une vue de quelques centaines de Ko au plus
+            mono = self.read_mono(start, stop)
+            edges = np.unique(np.minimum(boundaries - start, len(mono) - 1))
+            return self.reduce(mono, edges)
+        level = 0
+        while level + 1 < len(self.levels) and self.BASE_BLOCK * self.FACTOR ** (level + 1) <= frames_per_column:
+            level += 1
+        block = self.BASE_BLOCK * self.FACTOR ** level
+        data = self.levels[level]
+        edges = np.unique(np.minimum(boundaries // block, len(data) - 1))
+        last = min(len(data), -(-stop // block))
+        return self.merge(data[:last], edges)
+        
+    def samples(self, start, stop):
+        """Échantillons (mélange mono) de [start, stop), pour le tracé au niveau de l'échantillon"""
+        return self.read_mono(max(0, int(start)), min(self.total, int(stop)))
+
+class AudioPlayer:
+    def __init__(self):
+        self.audio_data = None
+        self.sample_rate = None
+        self.is_playing = False
+        self.current_frame = 0
+        self.stream = None
+        self.volume = 1.0
+        self.pan = 0.0
+        self.repeat_enabled = False
+        self.buffer_size = 512
+        self.latency = 'low'
+        self.stream_lock = threading.Lock()
+        # Périphérique de sortie choisi, par son nom (les indices changent au rebranchement)
+        self.device_settings = PersistentCache('devices.json', signed=False)
+        self.output_device = self.device_settings.get('output')  # None : sortie par défaut
+        self.device_fallback = False  # Périphérique choisi absent, lecture sur la sortie par défaut
+        self.device_monitor = DeviceMonitor(self)
+        self.channels = 2
+        self.preload_buffer = None
+        self.audio_cache = {}
+        # Décodage complet (librosa) dans un processus à part, résultat en mémoire partagée
+        self.decode_pool = None
+        self.shared_blocks = []  # Blocs attachés par ce processus
+        self.released_blocks = []  # Supprimés, à fermer quand plus aucun tableau ne les vise
+        self.auto_play_next = True  # Activer la lecture automatique par défaut
+        self.current_file = None
+        # Voix suivante pour l'enchaînement sans blanc / le fondu enchaîné
+        self.next_audio_data = None
+        self.next_file = None
+        self.next_frame = 0
+        self.next_generation = 0
+        self.crossfade_duration = 0.0  # En secondes, 0 = enchaînement sans blanc
+        self.crossfade_curve = 'equal_power'
+        self.crossfade_frames = 0
+        self.fade_out_curve = None
+        self.fade_in_curve = None
+        # Buffers de mixage préalloués (aucune allocation dans le callback)
+        self.mix_buffer = np.zeros((self.buffer_size, self.channels), dtype=np.float32)
+        self.next_buffer = np.zeros((self.buffer_size, self.channels), dtype=np.float32)
+        self.loop_buffer = np.zeros((self.buffer_size, self.channels), dtype=np.float32)
+        # Boucle A-B (début, fin) en frames ; sans elle, repeat_enabled boucle toute la piste
+        self.ab_loop = None
+        self.seam_duration = 0.01  # Fondu à la jointure de la boucle (secondes)
+        self.seam_fade_out = self.seam_fade_in = None
+        self.seam_pos = None  # Avancement dans le fondu de jointure, None hors jointure
+        self.seam_frame = 0  # Suite de la fin de boucle, mixée en fondu sortant
+        # Notifications émises depuis le thread audio (aucune dépendance à l'interface)
+        self.on_track_changed = None  # Nouveau fichier enchaîné
+        self.on_track_looped = None  # Retour au début de la boucle (repeat ou A-B)
+        self.on_playback_finished = None  # Fin de la dernière piste
+        self.end_of_stream = False
+        self.metrics = EngineMetrics()
+        # Taille de bloc et latence ajustées en cours de lecture (désactiver pour garder 512 / 'low')
+        self.latency_tuner = LatencyTuner(self)
+        # Normalisation de sonie : gain par piste replié dans le gain de sortie
+        self.normalization_enabled = True
+        self.track_gains = {}
+        self.track_gain = 1.0
+        self.next_track_gain = 1.0
+        # Échelle des sources PCM entières projetées en mémoire (1.0 pour du float32)
+        self.source_scale = 1.0
+        self.next_source_scale = 1.0
+        self.output_gain = self.volume
+        self.equalizer = ParametricEqualizer(channels=self.channels)
+        self.analyzer_tap = None  # RingBuffer lu par l'analyseur de spectre
+        self.recorder = None  # OutputRecorder de la sortie, None hors enregistrement
+        # Vitesse de lecture (0.5x à 2x), modifiable en cours de lecture
+        self.playback_rate = 1.0
+        self.preserve_pitch = True
+        self.stretch_active = False
+        self.stretcher = TimeStretcher(self.channels)
+        # Index de positionnement des MP3, construits au scan de la bibliothèque
+        self.seek_indexes = SeekIndexStore()
+        # Copies locales des fichiers d'un partage réseau, lues à la place des originaux
+        self.staging = get_staging_cache()
+        
+    def seek_index_for(self, file_path):
+        if not file_path.lower().endswith('.mp3'):
+            return None
+        index = self.seek_indexes.get(file_path)
+        if index is None:
+            index = build_seek_index(self.staging.stage(file_path))
+            if index is not None:
+                self.seek_indexes.set(file_path, index)
+        return index
+        
+    def open_waveform_source(self, file_path):
+        """(source, fréquence, échelle) lisible depuis un autre thread que le callback
+
+        Les projections mémoire sont partagées ; une source en flux est ouverte à
+        part pour ne pas évincer les blocs dont le callback a besoin.
+        """
+        source, sample_rate, scale = self.decode_file(file_path)
+        if isinstance(source, StreamingSource):
+            source = StreamingSource(source.file_path, source.seek_index)
+        return source, sample_rate, scale
+        
+    def decode_file(self, file_path):
+        """Décode un fichier (ou le lit depuis le cache) en (tableau stéréo (canaux, frames), fréquence, échelle)"""
+        if file_path in self.audio_cache:
+            self.metrics.record_decode(file_path, 0.0, cache_hit=True)
+            return self.audio_cache[file_path]
+            
+        start = time.perf_counter()
+        # Sur un partage réseau, tout se lit depuis la copie locale (voir StagingCache)
+        local_path = self.staging.stage(file_path)
+        # WAV/AIFF PCM : projection en mémoire, temps et mémoire constants quelle que soit la taille
+        decoded = open_pcm(local_path)
+        if decoded is None:
+            # Formats compressés lus par libsndfile : décodage en flux, positionnement par index
+            try:
+                source = StreamingSource(local_path, self.seek_index_for(file_path))
+                decoded = (source, source.sample_rate, 1.0)
+            except (sf.LibsndfileError, RuntimeError, ValueError) as e:
+                print(f"Décodage en flux impossible ({e}), décodage complet")
+        if decoded is None:
+            audio_data, sample_rate = self.decode_shared(file_path)
+            decoded = (audio_data, sample_rate, 1.0)
+        self.metrics.record_decode(file_path, time.perf_counter() - start, cache_hit=False)
+        
+        # Mettre en cache
+        self.audio_cache[file_path] = decoded
+        return decoded
+        
+    def decode_shared(self, file_path, target_sr=None):
+        """Décode tout le fichier dans le processus de décodage ; (tableau float32 sans copie, fréquence)
+
+        Le thread appelant attend sans tenir le GIL : le callback garde la main
+        pendant le décodage d'un gros fichier.
+        """
+        if self.decode_pool is None:
+            self.decode_pool = ProcessPoolExecutor(max_workers=1)
+        file_path = self.staging.stage(file_path)
+        try:
+            decoded = self.decode_pool.submit(decode_to_shared_memory, file_path, target_sr).result()
+        except BrokenProcessPool:
+            # Processus tué (mémoire, signal) : en relancer un pour la prochaine fois
+            self.decode_pool = None
+            raise
+        return self.attach_shared(*decoded)
+        
+    def attach_shared(self, name, shape, sample_rate):
+        """Tableau (sans copie) sur un bloc écrit par decode_to_shared_memory ; (tableau, fréquence)"""
+        block = shared_memory.SharedMemory(name=name)
+        self.shared_blocks.append(block)
+        # frombuffer garde un export sur la projection : close() échoue tant que le tableau vit
+        audio_data = np.frombuffer(block.buf, dtype=np.float32, count=shape[0] * shape[1]).reshape(shape)
+        return audio_data, sample_rate
+        
+    def release_shared_blocks(self):
+        """Supprime les blocs partagés ; chacun est fermé dès qu'aucun tableau ne le vise plus"""
+        for block in self.shared_blocks:
+            block.unlink()
+        self.released_blocks.extend(self.shared_blocks)
+        self.shared_blocks = []
+        still_mapped = []
+        for block in self.released_blocks:
+            try:
+                block.close()
+            except BufferError:
+                still_mapped.append(block)  # Piste encore en lecture
+        self.released_blocks = still_mapped
+        
+    def shutdown(self):
+        """Arrête le processus de décodage et rend la mémoire partagée (fermeture de l'application)"""
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown(wait=False, cancel_futures=True)
+            self.decode_pool = None
+        self.stop_recording()
+        self.release_shared_blocks()
+        
+    def load_file(self, file_path):
+        try:
+            self.clear_next()
+            audio_data, sample_rate, scale = self.decode_file(file_path)
+            
+            self.audio_data = audio_data
+            self.sample_rate = sample_rate
+            self.current_file = file_path
+            self.current_frame = 0
+            self.clear_loop()  # Une boucle A-B appartient à sa piste
+            self.update_seam_curves()
+            self.source_scale = scale
+            self.track_gain = self.gain_for(file_path)
+            self.update_output_gain()
+            
+            # Précharger un petit buffer pour une meilleure réactivité
+            self.preload_buffer = audio_data[:, :self.buffer_size]
+            
+            return True
+        except Exception as e:
+            print(f"Erreur chargement audio: {e}")
+            return False
+            
+    def queue_next(self, file_path):
+        """Prépare la piste suivante en arrière-plan pour l'enchaîner à la piste courante"""
+        self.clear_next()
+        generation = self.next_generation
+        
+        def load_next():
+            try:
+                audio_data, sample_rate, scale = self.decode_file(file_path)
+                if self.sample_rate and sample_rate != self.sample_rate:
+                    # Le stream reste ouvert : adapter la piste suivante à sa fréquence,
+                    # dans le processus de décodage plutôt qu'ici
+                    audio_data, _ = self.decode_shared(file_path, self.sample_rate)
+                    scale = 1.0
+                elif hasattr(audio_data, 'prepare'):
+                    # Tête de la piste décodée ici plutôt que dans le callback
+                    audio_data.prepare(0)
+                # La voix n'est visible par le callback qu'une fois entièrement prête
+                if generation != self.next_generation:
+                    return  # Une autre piste a été demandée entre-temps
+                self.next_frame = 0
+                self.next_file = file_path
+                self.next_track_gain = self.gain_for(file_path)
+                self.next_source_scale = scale
+                self.next_audio_data = audio_data
+            except Exception as e:
+                print(f"Erreur préchargement piste suivante: {e}")
+                
+        threading.Thread(target=load_next, daemon=True).start()
+        
+    def clear_next(self):
+        self.next_generation += 1
+        self.next_audio_data = None
+        self.next_file = None
+        self.next_frame = 0
+        
+    def set_crossfade(self, duration, curve=None):
+        """Règle la durée (secondes) et la courbe du fondu enchaîné entre deux pistes"""
+        self.crossfade_duration = max(0.0, float(duration))
+        if curve is not None:
+            self.crossfade_curve = curve
+        self.update_crossfade_curves()
+        
+    def update_crossfade_curves(self):
+        """Précalcule les courbes de fondu pour la fréquence d'échantillonnage courante"""
+        if not self.sample_rate or self.crossfade_duration <= 0:
+            self.crossfade_frames = 0
+            self.fade_out_curve = self.fade_in_curve = None
+            return
+        length = int(self.crossfade_duration * self.sample_rate)
+        fade_out, fade_in = make_crossfade_curves(length, self.crossfade_curve)
+        # Publier les courbes avant la longueur pour que le callback ne lise jamais hors borne
+        self.fade_out_curve, self.fade_in_curve = fade_out, fade_in
+        self.crossfade_frames = length
+        
+    def ensure_buffers(self, frames):
+        if self.mix_buffer.shape[0] < frames:
+            self.mix_buffer = np.zeros((frames, self.channels), dtype=np.float32)
+            self.next_buffer = np.zeros((frames, self.channels), dtype=np.float32)
+            self.loop_buffer = np.zeros((frames, self.channels), dtype=np.float32)
+        self.equalizer.ensure_buffer(frames)
+            
+    def update_seam_curves(self):
+        length = max(1, int(self.seam_duration * self.sample_rate))
+        self.seam_fade_out, self.seam_fade_in = make_crossfade_curves(length, 'equal_power')
+        
+    def set_loop(self, start, end):
+        """Boucle A-B entre start et end (secondes), à l'échantillon près
+
+        La boucle doit couvrir au moins deux fondus de jointure.
+        """
+        if self.audio_data is None or not self.sample_rate:
+            return False
+        total = self.audio_data.shape[1]
+        start_frame = max(0, min(int(start * self.sample_rate), total))
+        end_frame = max(0, min(int(end * self.sample_rate), total))
+        if end_frame - start_frame < 2 * max(1, int(self.seam_duration * self.sample_rate)):
+            return False
+        # Un seul attribut : le callback ne voit jamais une boucle à moitié posée
+        self.ab_loop = (start_frame, end_frame)
+        self.prepare_loop()
+        return True
+        
+    def clear_loop(self):
+        self.ab_loop = None
+        self.prepare_loop()
+        
+    def set_repeat(self, enabled):
+        self.repeat_enabled = enabled
+        self.prepare_loop()
+        
+    def prepare_loop(self):
+        """Source en flux : début de boucle décodé d'avance, le callback n'a pas à le décoder au retour"""
+        source = self.audio_data
+        if hasattr(source, 'set_loop'):
+            seam_frames = max(1, int(self.seam_duration * (self.sample_rate or 44100)))
+            source.set_loop(self.loop_region(source.shape[1]), seam_frames)
+        
+    def get_loop(self):
+        """(début, fin) de la boucle A-B en secondes, None sans boucle"""
+        loop = self.ab_loop
+        if loop is None or not self.sample_rate:
+            return None
+        return loop[0] / self.sample_rate, loop[1] / self.sample_rate
+        
+    def loop_region(self, total):
+        """(début, fin) en frames de la boucle active, None si la lecture ne boucle pas"""
+        loop = self.ab_loop
+        if loop is not None and loop[0] < min(loop[1], total):
+            return loop[0], min(loop[1], total)
+        if self.repeat_enabled and total:
+            return 0, total
+        return None
+        
+    def read_loop(self, mix, frames, start, end):
+        """Lecture en boucle entre start et end avec un court fondu à la jointure"""
+        audio_data = self.audio_data
+        filled = 0
+        seam_offset = 0
+        while filled < frames:
+            count = min(frames - filled, end - self.current_frame)
+            if count <= 0:
+                # Jointure : la suite de la fin de boucle s'éteint pendant que le début revient
+                self.seam_frame = self.current_frame
+                self.seam_pos = 0
+                seam_offset = filled
+                self.current_frame = start
+                if self.on_track_looped:
+                    self.on_track_looped()
+                continue
+            self.read_block(audio_data, self.current_frame, count, mix[filled:filled + count])
+            self.current_frame += count
+            filled += count
+        seam_pos = self.seam_pos
+        if seam_pos is not None:
+            fade_out, fade_in = self.seam_fade_out, self.seam_fade_in
+            count = min(len(fade_in) - seam_pos, frames - seam_offset)
+            curve = slice(seam_pos, seam_pos + count)
+            tail = self.loop_buffer[:count]
+            self.read_block(audio_data, self.seam_frame, count, tail)
+            tail *= fade_out[curve, None]
+            region = mix[seam_offset:seam_offset + count]
+            region *= fade_in[curve, None]
+            region += tail
+            self.seam_frame += count
+            seam_pos += count
+            self.seam_pos = seam_pos if seam_pos < len(fade_in) else None
+            
+    @staticmethod
+    def read_block(audio_data, start, frames, out):
+        """Copie `frames` frames depuis `start` dans `out`, complète avec du silence"""
+        count = max(0, min(frames, audio_data.shape[1] - start))
+        if count:
+            out[:count] = audio_data[:, start:start + count].T
+        if count < frames:
+            out[count:frames] = 0
+        return count
+            
+    def mix_next_voice(self, mix, frames):
+        """Superpose la tête de la piste suivante à la fin de la piste courante"""
+        next_data = self.next_audio_data
+        if next_data is None:
+            return
+        total = self.audio_data.shape[1]
+        fade_frames = min(self.crossfade_frames, total)
+        fade_out, fade_in = self.fade_out_curve, self.fade_in_curve
+        fade_start = total - fade_frames
+        offset = fade_start - self.current_frame  # Début de la voix suivante dans le bloc
+        if offset >= frames:
+            return
+        offset = max(offset, 0)
+        count = frames - offset
+        # Partie du bloc située dans la zone de fondu
+        curve_pos = self.current_frame + offset - fade_start
+        faded = max(0, min(count, fade_frames - curve_pos))
+        
+        incoming = self.next_buffer[:count]
+        self.read_block(next_data, self.next_frame, count, incoming)
+        incoming_gain = self.next_track_gain * self.next_source_scale
+        current_gain = self.track_gain * self.source_scale
+        if incoming_gain != current_gain:
+            # Le gain de sortie est celui de la piste courante : corriger la voix entrante
+            incoming *= incoming_gain / current_gain
+        if faded:
+            mix[offset:offset + faded] *= fade_out[curve_pos:curve_pos + faded, None]
+            incoming[:faded] *= fade_in[curve_pos:curve_pos + faded, None]
+        mix[offset:frames] += incoming
+        self.next_frame += count
+            
+    def audio_callback(self, outdata, frames, time_info, status):
+        start = time.perf_counter()
+        self.render(outdata, frames)
+        # Copie vers l'analyseur : seul travail ajouté au callback
+        tap = self.analyzer_tap
+        if tap is not None:
+            tap.write(outdata)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.push(outdata)
+        now = time.perf_counter()
+        self.metrics.record_callback(now - start, frames, self.sample_rate, status)
+        if self.metrics.play_request_time is not None and self.audio_data is not None:
+            self.metrics.record_first_sound(now, self.current_file, time_info)
+        if self.end_of_stream:
+            raise sd.CallbackStop
+            
+    def render(self, outdata, frames):
+        if self.audio_data is None:
+            outdata.fill(0)
+            return
+            
+        if frames > self.mix_buffer.shape[0]:
+            self.ensure_buffers(frames)
+        mix = self.mix_buffer[:frames]
+        if self.playback_rate != 1.0 or self.stretch_active:
+            # Le time-stretch consomme la source à son propre rythme
+            self.stretch_active = True
+            self.stretcher.process(mix, frames, self.playback_rate, self.preserve_pitch, self.pull_source)
+        else:
+            self.read_source(mix, frames)
+        outdata[:] = self.process_block(mix)
+        
+    def pull_source(self, out, frames):
+        """Lit la source par morceaux ne dépassant pas la taille des buffers de mixage"""
+        chunk = self.next_buffer.shape[0]
+        for start in range(0, frames, chunk):
+            self.read_source(out[start:start + chunk], min(chunk, frames - start))
+            
+    def read_source(self, mix, frames):
+        """Remplit `mix` avec les prochaines frames de la source (voix, enchaînement, repeat)"""
+        if self.audio_data is None:
+            mix[:frames] = 0
+            return
+        total = self.audio_data.shape[1]
+        loop = self.loop_region(total)
+        if loop is not None and self.current_frame < loop[1]:
+            self.read_loop(mix, frames, *loop)
+            return
+        self.seam_pos = None
+        self.read_block(self.audio_data, self.current_frame, frames, mix)
+        
+        if self.next_audio_data is not None and not self.repeat_enabled:
+            # Mixage multi-voix : fin de la piste courante + début de la suivante
+            self.mix_next_voice(mix, frames)
+            if self.current_frame + frames >= total:
+                # La piste suivante devient la piste courante
+                previous_gain = self.track_gain * self.source_scale
+                self.audio_data = self.next_audio_data
+                self.current_frame = self.next_frame
+                self.current_file = self.next_file
+                self.track_gain = self.next_track_gain
+                self.source_scale = self.next_source_scale
+                gain = self.track_gain * self.source_scale
+                if gain != previous_gain:
+                    # Ce bloc a été mixé avec le gain de l'ancienne piste : le passer dans
+                    # celui de la nouvelle, que process_block va appliquer
+                    mix[:frames] *= previous_gain / gain
+                self.update_output_gain()
+                self.preload_buffer = self.audio_data[:, :self.buffer_size]
+                self.ab_loop = None
+                self.clear_next()
+                if self.on_track_changed:
+                    self.on_track_changed(self.current_file)
+            else:
+                self.current_frame += frames
+            return
+            
+        if self.current_frame + frames >= total:
+            # Fin du fichier : bloc complété de silence, ou dernier bloc plein
+            # (durée multiple de la taille de bloc)
+            if not self.end_of_stream:
+                self.current_frame = total
+                # Le stream s'arrêtera après ce bloc (on ne l'arrête pas depuis son callback)
+                self.end_of_stream = True
+                self.is_playing = False
+                # Passer à la piste suivante si auto_play_next est activé
+                if self.auto_play_next and self.on_playback_finished:
+                    self.on_playback_finished()
+        else:
+            # Lecture normale
+            self.current_frame += frames
+            
+    def process_block(self, mix):
+        """Chaîne DSP appliquée à chaque bloc mixé, sur place"""
+        self.equalizer.process(mix)
+        return self.apply_pan_and_volume(mix)
+            
+    def apply_pan_and_volume(self, audio_chunk):
+        # Appliquer le volume (et le gain de normalisation) et le pan sur place
+        audio_chunk *= self.output_gain
+        
+        if self.pan != 0:
+            if self.pan < 0:  # Pan vers la gauche
+                audio_chunk[:, 1] *= (1 + self.pan)
+            else:  # Pan vers la droite
+                audio_chunk[:, 0] *= (1 - self.pan)
+                
+        return audio_chunk
+            
+    def play(self, start_pos=0):
+        if self.audio_data is None:
+            return
+            
+        self.current_frame = int(start_pos * self.sample_rate)
+        if hasattr(self.audio_data, 'prepare'):
+            # Source en flux : saut par l'index et premier bloc décodé avant le stream
+            self.audio_data.prepare(self.current_frame)
+            self.prepare_loop()
+        if self.device_fallback:
+            # Sortie choisie absente : la rechercher à chaque play plutôt qu'en tâche de fond
+            with self.stream_lock:
+                self.close_stream()
+                refresh_devices()
+        if self.latency_tuner.enabled:
+            self.buffer_size, self.latency = self.latency_tuner.settings_for_stream(self.resolve_output_device())
+        self.ensure_buffers(self.buffer_size)
+        self.update_crossfade_curves()
+        self.update_seam_curves()
+        self.seam_pos = None
+        self.equalizer.set_sample_rate(self.sample_rate)
+        self.stretcher.reset()
+        self.stretch_active = False
+        self.metrics.mark_play_requested()
+        self.end_of_stream = False
+        
+        try:
+            with self.stream_lock:
+                try:
+                    self.open_stream()
+                except sd.PortAudioError:
+                    # Liste des périphériques périmée (sortie débranchée) : la relire et réessayer
+                    refresh_devices()
+                    self.open_stream()
+            self.is_playing = True
+        except Exception as e:
+            print(f"Erreur lecture: {e}")
+            
+    def resolve_output_device(self):
+        """Indice du périphérique choisi, None pour la sortie par défaut (ou s'il est absent)"""
+        if self.output_device is None:
+            return None
+        return find_output_device(self.output_device)
+        
+    def open_stream(self):
+        """(Ré)ouvre le stream de sortie avec la taille de bloc et la latence courantes"""
+        # Arrêter le stream existant s'il y en a un
+        self.close_stream()
+        
+        device = self.resolve_output_device()
+        self.device_fallback = self.output_device is not None and device is None
+        self.stream = sd.OutputStream(
+            device=device,
+            channels=self.channels,
+            samplerate=self.sample_rate,
+            callback=self.audio_callback,
+            blocksize=self.buffer_size,
+            latency=self.latency,
+            dtype=np.float32  # Utiliser float32 pour de meilleures performances
+        )
+        self.stream.start()
+        self.metrics.stream = {'blocksize': self.buffer_size,
+                               'latency': getattr(self.stream, 'latency', self.latency),
+                               'device': output_device_name(device)}
+        self.device_monitor.start()
+        recorder = self.recorder
+        if recorder is not None and recorder.sample_rate != self.sample_rate:
+            # Un WAV n'a qu'une fréquence : recommencer s'il est vide, sinon l'arrêter
+            if recorder.write_pos == 0:
+                self.start_recording(recorder.path)
+            else:
+                print(f"Enregistrement arrêté (fréquence {self.sample_rate} Hz): {self.stop_recording()}")
+        
+    def start_recording(self, path):
+        """Enregistre la sortie (après volume, pan et égaliseur) dans un WAV"""
+        self.stop_recording()
+        self.recorder = OutputRecorder(path, self.sample_rate or 44100, self.channels)
+        self.metrics.recorder = self.recorder
+        
+    def stop_recording(self):
+        """Arrête l'enregistrement ; renvoie ses statistiques (None s'il n'y en avait pas)"""
+        recorder, self.recorder = self.recorder, None
+        self.metrics.recorder = None
+        if recorder is None:
+            return None
+        return recorder.stop()
+        
+    def close_stream(self):
+        if self.stream:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception as e:
+                print(f"Erreur fermeture du stream: {e}")  # Périphérique déjà disparu
+            self.stream = None
+        
+    def reopen_stream(self, refresh=False):
+        """Rouvre le stream (nouveau périphérique, périphérique perdu ou revenu)
+
+        Le décodé, le cache et current_frame ne bougent pas : la lecture reprend
+        là où elle était, après une coupure de l'ordre d'une période de bloc.
+        """
+        with self.stream_lock:
+            playing = self.is_playing
+            self.close_stream()
+            if refresh:
+                refresh_devices()
+            if not playing:
+                self.device_fallback = (self.output_device is not None
+                                        and self.resolve_output_device() is None)
+                return  # Le prochain play ouvrira le stream
+            if self.latency_tuner.enabled:
+                self.buffer_size, self.latency = self.latency_tuner.settings_for_stream(self.resolve_output_device())
+                self.ensure_buffers(self.buffer_size)
+            self.open_stream()
+        print(f"Sortie audio : {self.metrics.stream['device']}")
+        
+    def set_output_device(self, name):
+        """Change de sortie (None : défaut du système) sans recharger la piste"""
+        self.output_device = name
+        self.device_settings.set('output', name)
+        self.device_settings.save()
+        # Un périphérique branché depuis le démarrage n'est connu qu'après relecture
+        self.reopen_stream(refresh=name is not None and find_output_device(name) is None)
+            
+    def pause(self):
+        with self.stream_lock:
+            if self.stream:
+                self.stream.stop()
+                self.is_playing = False
+            
+    def stop(self):
+        with self.stream_lock:
+            if self.stream:
+                self.stream.stop()
+                self.is_playing = False
+                self.current_frame = 0
+            
+    def set_volume(self, volume):
+        self.volume = volume
+        self.update_output_gain()
+        
+    def update_output_gain(self):
+        # Un seul facteur par bloc, quel que soit le nombre de gains combinés
+        self.output_gain = self.volume * self.track_gain * self.source_scale
+        
+    def gain_for(self, file_path):
+        if not self.normalization_enabled:
+            return 1.0
+        return self.track_gains.get(file_path, 1.0)
+        
+    def set_track_gain(self, file_path, gain):
+        """Enregistre le gain de normalisation d'une piste (pris en compte au prochain chargement)"""
+        self.track_gains[file_path] = gain
+        
+    def set_normalization(self, enabled):
+        self.normalization_enabled = enabled
+        self.track_gain = self.gain_for(self.current_file)
+        self.next_track_gain = self.gain_for(self.next_file)
+        self.update_output_gain()
+        
+    def set_pan(self, pan):
+        self.pan = pan
+        
+    def set_playback_rate(self, rate, preserve_pitch=None):
+        """Change la vitesse sans recharger la piste ni rouvrir le stream"""
+        self.playback_rate = min(2.0, max(0.5, float(rate)))
+        if preserve_pitch is not None:
+            self.preserve_pitch = preserve_pitch
+        
+    def get_position(self):
+        if self.audio_data is None:
+            return 0
+        return self.current_frame / self.sample_rate
+        
+    def get_duration(self):
+        if self.audio_data is None:
+            return 0
+        return self.audio_data.shape[1] / self.sample_rate
+        
+    def clear_cache(self):
+        """Nettoie le cache audio"""
+        self.audio_cache.clear()
+        self.release_shared_blocks()
+
+def render_to_file(files, output_path, settings=None, sample_rate=None, block_size=8192,
+                   workers=None, lookahead=2, progress=None):
+    """Mixe les fichiers dans un seul WAV/FLAC, hors temps réel, avec la chaîne de la lecture
+
+    Volume, pan, normalisation, égaliseur et enchaînement / fondu sont ceux de
+    settings (l'AudioPlayer de la lecture), sans la vitesse de lecture. Les pistes
+    à venir sont décodées (et rééchantillonnées) par un pool de processus pendant
+    que la précédente est mixée ; le fichier est écrit bloc par bloc, la mémoire
+    reste bornée à `lookahead` pistes décodées. progress(index, fichier) est appelé
+    au début de chaque piste. Renvoie le nombre de frames écrites.
+    """
+    files = list(files)
+    if not files:
+        return 0
+    player = AudioPlayer()
+    player.latency_tuner.enabled = False
+    if settings is not None:
+        player.volume, player.pan = settings.volume, settings.pan
+        player.normalization_enabled = settings.normalization_enabled
+        player.track_gains = dict(settings.track_gains)
+        player.crossfade_duration, player.crossfade_curve = settings.crossfade_duration, settings.crossfade_curve
+        player.equalizer.bands = [dict(band) for band in settings.equalizer.bands]
+        player.equalizer.enabled = settings.equalizer.enabled
+    player.auto_play_next = False
+    
+    def open_source(file_path):
+        """Projection en mémoire si le PCM est déjà à la bonne fréquence, sinon None (décodage)"""
+        decoded = open_pcm(player.staging.stage(file_path))
+        if decoded is not None and decoded[1] == sample_rate:
+            return decoded
+        return None
+    
+    if sample_rate is None:
+        first = player.staging.stage(files[0])
+        decoded = open_pcm(first)
+        sample_rate = decoded[1] if decoded else sf.info(first).samplerate
+    pool = ProcessPoolExecutor(max_workers=workers or max(1, min(lookahead, (os.cpu_count() or 2) - 1)))
+    pending = {}  # Indice -> future de décodage
+    
+    def schedule(first):
+        for index in range(first, min(first + lookahead, len(files))):
+            if index not in pending and open_source(files[index]) is None:
+                pending[index] = pool.submit(decode_to_shared_memory, player.staging.stage(files[index]), sample_rate)
+    
+    def source(index):
+        decoded = open_source(files[index])
+        if decoded is not None:
+            return decoded
+        audio_data, _ = player.attach_shared(*pending.pop(index).result())
+        return audio_data, sample_rate, 1.0
+    
+    position = [0]
+    
+    def track_changed(file_path):
+        position[0] += 1
+        # Les blocs des pistes terminées sont rendus dès qu'ils ne sont plus lus
+        player.release_shared_blocks()
+        if progress:
+            progress(position[0], file_path)
+    
+    try:
+        schedule(0)
+        player.audio_data, player.sample_rate, player.source_scale = source(0)
+        player.current_file = files[0]
+        player.current_frame = 0
+        player.track_gain = player.gain_for(files[0])
+        player.update_output_gain()
+        player.update_crossfade_curves()
+        player.update_seam_curves()
+        player.equalizer.set_sample_rate(sample_rate)
+        player.equalizer.update_coefficients()
+        player.ensure_buffers(block_size)
+        player.on_track_changed = track_changed
+        if progress:
+            progress(0, files[0])
+        subtype = 'PCM_24' if output_path.lower().endswith(('.wav', '.flac')) else None
+        written = 0
+        out = np.zeros((block_size, player.channels), dtype=np.float32)
+        with sf.SoundFile(output_path, 'w', samplerate=sample_rate, channels=player.channels,
+                          subtype=subtype) as output:
+            scheduled = None
+            while True:
+                index = position[0]
+                if index != scheduled:
+                    # Nouvelle piste : décoder les suivantes pendant qu'elle est mixée
+                    schedule(index + 1)
+                    scheduled = index
+                remaining = player.audio_data.shape[1] - player.current_frame
+                if (index + 1 < len(files) and player.next_audio_data is None
+                        and remaining <= player.crossfade_frames + block_size):
+                    # La voix suivante n'est lue qu'à partir du fondu : n'attendre son décodage qu'ici
+                    player.next_frame = 0
+                    player.next_file = files[index + 1]
+                    player.next_track_gain = player.gain_for(files[index + 1])
+                    player.next_audio_data, _, player.next_source_scale = source(index + 1)
+                frames = block_size
+                if index + 1 >= len(files):
+                    # Dernière piste : ne pas écrire le silence de complément
+                    frames = min(block_size, remaining)
+                    if frames <= 0:
+                        break
+                block = out[:frames]
+                player.render(block, frames)
+                np.clip(block, -1.0, 1.0, out=block)
+                output.write(block)
+                written += frames
+        return written
+    finally:
+        pool.shutdown(cancel_futures=True)
+        for future in pending.values():
+            if future.done() and future.exception() is None:
+                player.attach_shared(*future.result())
+        # Plus aucun tableau sur les blocs partagés avant de les rendre
+        player.audio_data = player.next_audio_data = player.preload_buffer = None
+        player.shutdown()
+
+def clean_title(artist, title):
+    """Nettoie le titre en retirant l'artiste s'il est présent"""
+    if artist and artist.lower() in title.lower():
+        # Essayer différents formats courants
+        patterns = [
+            f"{artist} - ",
+            f"{artist}-",
+            f"[{artist}]",
+            f"({artist})",
+            f"{artist}:",
+            f"{artist}_"
+        ]
+        for pattern in patterns:
+            if pattern.lower() in title.lower():
+                return title.replace(pattern, "").strip()
+    return title
+
+def parse_track_number(value):
+    """Numéro de piste d'un tag ("3", "03/12") ; 0 si absent ou illisible"""
+    digits = str(value).split('/')[0].strip()
+    return int(digits) if digits.isdigit() else 0
+
+def metadata_from_filename(file_path):
+    """Métadonnées déduites du seul nom de fichier (immédiat, sans lecture disque)"""
+    # Valeurs par défaut
+    metadata = {
+        'artist': "",
+        'title': os.path.basename(file_path),
+        'duration': '00:00',
+        'length': 0.0,
+        'track': 0
+    }
+
+    # Extraire le nom de fichier sans extension comme fallback
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    # Si le nom contient un tiret, on peut essayer d'extraire artiste et titre
+    if " - " in base_name:
+        parts = base_name.split(" - ", 1)
+        metadata['artist'] = parts[0].strip()
+        metadata['title'] = parts[1].strip()
+    return metadata
+
+def read_metadata(file_path):
+    """Artiste, titre et durée d'un fichier audio"""
+    import librosa
+    from mutagen import File
+    from mutagen.mp3 import MP3
+    from mutagen.easyid3 import EasyID3
+    try:
+        metadata = metadata_from_filename(file_path)
+        with scan_source(file_path) as source:
+            # Calculer la durée avec librosa (plus précis)
+            try:
+                y, sr = librosa.load(rewind(source), sr=None, duration=5)  # Charger juste les 5 premières secondes pour la détection
+                duration = librosa.get_duration(y=y, sr=sr)
+                if duration > 0:
+                    # Si c'est un extrait, calculer la durée totale
+                    total_duration = librosa.get_duration(path=rewind(source))
+                    metadata['length'] = total_duration
+                    minutes = int(total_duration // 60)
+                    seconds = int(total_duration % 60)
+                    metadata['duration'] = f"{minutes:02d}:{seconds:02d}"
+            except Exception as e:
+                print(f"Erreur librosa: {e}, tentative avec mutagen...")
+
+                # Si librosa échoue, essayer avec mutagen
+                audio = File(rewind(source))
+                if audio is not None and hasattr(audio, 'info') and hasattr(audio.info, 'length'):
+                    duration = audio.info.length
+                    metadata['length'] = duration
+                    minutes = int(duration // 60)
+                    seconds = int(duration % 60)
+                    metadata['duration'] = f"{minutes:02d}:{seconds:02d}"
+
+            # Essayer de lire les métadonnées selon le format
+            audio = File(rewind(source))
+            if isinstance(audio, MP3):
+                try:
+                    id3 = EasyID3(rewind(source))
+                    metadata['artist'] = id3.get('artist', [metadata['artist']])[0]
+                    raw_title = id3.get('title', [metadata['title']])[0]
+                    metadata['title'] = clean_title(metadata['artist'], raw_title)
+                    metadata['track'] = parse_track_number(id3.get('tracknumber', [''])[0])
+                except:
+                    pass
+
+            elif file_path.lower().endswith(('.wav', '.aiff')):
+                # Un WAV sans chunk de tags a audio.tags à None
+                if audio is not None and getattr(audio, 'tags', None):
+                    for tag in audio.tags:
+                        if tag == 'TRCK' or 'track' in tag.lower():
+                            metadata['track'] = parse_track_number(str(audio.tags[tag]))
+                        elif 'artist' in tag.lower():
+                            metadata['artist'] = str(audio.tags[tag])
+                        elif 'title' in tag.lower():
+                            raw_title = str(audio.tags[tag])
+                            metadata['title'] = clean_title(metadata['artist'], raw_title)
+
+            return metadata
+
+    except Exception as e:
+        print(f"Erreur lecture métadonnées: {e}")
+        return {
+            'artist': "",
+            'title': os.path.basename(file_path),
+            'duration': '00:00',
+            'length': 0.0,
+            'track': 0
+        }
+
+def read_metadata_batch(file_paths):
+    """Tâche du pool de scan : métadonnées d'un lot de fichiers en un seul aller-retour
+
+    Les MP3 reçoivent aussi leur index de positionnement ('seek_index').
+    """
+    results = []
+    for file_path in file_paths:
+        metadata = read_metadata(file_path)
+        if file_path.lower().endswith('.mp3'):
+            try:
+                metadata['seek_index'] = build_seek_index(file_path)
+            except Exception as e:
+                print(f"Erreur index MP3 {file_path}: {e}")
+        results.append(metadata)
+    return results
+
+def collation_key(text):
+    """Texte sans accents ni casse ("Beyoncé" -> "beyonce"), pour trier et chercher"""
+    text = unicodedata.normalize('NFKD', text or "")
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def search_tokens(text):
+    """Mots d'un texte, normalisés par collation_key"""
+    return re.findall(r'\w+', collation_key(text))
+
+class SearchIndex:
+    """Index de préfixes sur les mots (artiste, titre, nom de fichier) des lignes de la playlist
+
+    Chaque préfixe de chaque mot pointe vers la liste des lignes qui le contiennent :
+    une recherche est une intersection de listes déjà construites, sans parcourir
+    les chaînes. L'index ne fait que grandir : les tags reçus après coup s'ajoutent
+    aux mots du nom de fichier.
+    """
+    def __init__(self):
+        self.postings = {}
+        self.size = 0
+        self.indexed = []  # Mots déjà indexés par ligne (évite les doublons)
+
+    def add(self, row, *texts):
+        """Indexe les textes de la ligne row (ajoutée ou complétée)"""
+        while len(self.indexed) <= row:
+            self.indexed.append(set())
+        known = self.indexed[row]
+        prefixes = set()
+        for text in texts:
+            for token in search_tokens(text or ""):
+                if token in known:
+                    continue
+                known.add(token)
+                prefixes.update(token[:i] for i in range(1, len(token) + 1))
+        for prefix in prefixes:
+            posting = self.postings.get(prefix)
+            if posting is None:
+                posting = self.postings[prefix] = array('i')
+            posting.append(row)
+        self.size = max(self.size, row + 1)
+
+    def search(self, query):
+        """Masque booléen des lignes contenant un mot commençant par chaque mot de la requête
+
+        None si la requête est vide (tout afficher).
+        """
+        tokens = search_tokens(query)
+        if not tokens:
+            return None
+        postings = []
+        for token in set(tokens):
+            posting = self.postings.get(token)
+            if posting is None:
+                return np.zeros(self.size, dtype=bool)
+            postings.append(posting)
+        # Partir de la liste la plus courte : les suivantes ne font que la réduire
+        postings.sort(key=len)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.frombuffer(postings[0], dtype=np.int32)] = True
+        for posting in postings[1:]:
+            hits = np.zeros(self.size, dtype=bool)
+            hits[np.frombuffer(posting, dtype=np.int32)] = True
+            mask &= hits
+        return mask
+
+class SortKeys:
+    """Clés de tri des entrées de la playlist, calculées une fois à l'arrivée des métadonnées
+
+    Les colonnes texte sont ramenées à des rangs entiers (reconstruits seulement
+    après un changement) : trier revient à un argsort stable sur un tableau d'entiers.
+    """
+    COLUMNS = ('track', 'artist', 'title', 'duration')
+
+    def __init__(self):
+        self.keys = {column: [] for column in self.COLUMNS}
+        self.arrays = {}
+
+    def set(self, entry, metadata):
+        """Clés de l'entrée entry d'après ses métadonnées (ajout ou tags reçus)"""
+        values = {
+            # Pistes sans numéro après les autres
+            'track': metadata.get('track') or np.inf,
+            'artist': collation_key(metadata.get('artist', "").strip()),
+            'title': collation_key(metadata.get('title', "")),
+            'duration': metadata.get('length', 0.0),
+        }
+        for column, value in values.items():
+            keys = self.keys[column]
+            if entry == len(keys):
+                keys.append(value)
+            else:
+                keys[entry] = value
+            self.arrays.pop(column, None)
+
+    def column(self, name):
+        values = self.arrays.get(name)
+        if values is None:
+            keys = self.keys[name]
+            if name in ('artist', 'title'):
+                ranks = {key: rank for rank, key in enumerate(sorted(set(keys)))}
+                values = np.fromiter((ranks[key] for key in keys), dtype=np.int32, count=len(keys))
+            else:
+                values = np.asarray(keys, dtype=np.float64)
+            self.arrays[name] = values
+        return values
+
+    def order(self, name, entries, descending=False):
+        """Permutation des positions qui trie les entrées (dans leur ordre actuel) selon name
+
+        Tri stable : à clé égale l'ordre actuel est conservé, trier par titre puis
+        par artiste range donc les titres de chaque artiste.
+        """
+        keys = self.column(name)[entries]
+        if not descending:
+            return np.argsort(keys, kind='stable')
+        # Décroissant et stable : trier à l'envers puis retourner
+        return (len(keys) - 1 - np.argsort(keys[::-1], kind='stable'))[::-1]
+
+COVER_FILENAMES = ('cover', 'folder', 'front', 'album')
+
+def embedded_cover_data(file_path):
+    """Octets de l'image intégrée au fichier (APIC ID3, covr MP4, images FLAC), ou None"""
+    from mutagen import File
+    with scan_source(file_path) as source:
+        audio = File(source)
+    if audio is None:
+        return None
+    pictures = getattr(audio, 'pictures', None)  # FLAC
+    if pictures:
+        return pictures[0].data
+    tags = audio.tags
+    if tags is None:
+        return None
+    if hasattr(tags, 'getall'):  # ID3 (MP3, WAV, AIFF)
+        frames = tags.getall('APIC')
+        if frames:
+            # Préférer la couverture avant (type 3) si elle existe
+            front = [frame for frame in frames if frame.type == 3]
+            return (front or frames)[0].data
+        return None
+    covers = tags.get('covr') if hasattr(tags, 'get') else None  # MP4
+    return bytes(covers[0]) if covers else None
+
+def folder_cover_path(file_path):
+    """folder.jpg, cover.png... dans le dossier de la piste"""
+    directory = os.path.dirname(os.path.abspath(file_path))
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return None
+    for name in sorted(names):
+        stem, ext = os.path.splitext(name.lower())
+        if stem in COVER_FILENAMES and ext in ('.jpg', '.jpeg', '.png'):
+            return os.path.join(directory, name)
+    return None
+
+_cover_digests = None
+_cover_lock = threading.RLock()
+
+def get_cover_digests():
+    """Hash de pochette par fichier (covers.json), partagé par les threads de chargement"""
+    global _cover_digests
+    with _cover_lock:
+        if _cover_digests is None:
+            _cover_digests = PersistentCache('covers.json')
+        return _cover_digests
+
+def cover_digest(file_path):
+    """(hash, octets) de la pochette de la piste : octets None si le hash vient du cache
+
+    Le hash est mémorisé par chemin et signature (mtime, taille) : pour une piste
+    déjà vue, ni les tags ni l'image ne sont relus. Une pochette de dossier est
+    mémorisée sous le chemin de l'image, pour suivre ses propres modifications.
+    """
+    digests = get_cover_digests()
+    with _cover_lock:
+        entry = digests.get(file_path)
+    if entry is not None and entry['embedded']:
+        return entry['digest'], None
+    if entry is None:
+        try:
+            data = embedded_cover_data(file_path)
+        except Exception as e:
+            print(f"Erreur lecture pochette {file_path}: {e}")
+            data = None
+        digest = hashlib.sha1(data).hexdigest() if data is not None else None
+        with _cover_lock:
+            digests.set(file_path, {'embedded': data is not None, 'digest': digest})
+        if data is not None:
+            return digest, data
+    # Pas d'image intégrée : pochette du dossier
+    cover_path = folder_cover_path(file_path)
+    if cover_path is None:
+        return None, None
+    with _cover_lock:
+        entry = digests.get(cover_path)
+    if entry is not None:
+        return entry['digest'], None
+    with open(cover_path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    with _cover_lock:
+        digests.set(cover_path, {'embedded': False, 'digest': digest})
+    return digest, data
+
+def load_cover(file_path, size=360):
+    """Miniature de la pochette (chemin d'un JPEG en cache disque), ou None
+
+    Le cache est indexé par le hash du contenu de l'image : les pistes d'un
+    même album partagent une seule miniature. Le hash est lui-même en cache par
+    fichier : une miniature déjà générée est renvoyée sans relire la piste.
+    L'image source n'est jamais décodée en pleine taille (draft JPEG puis
+    thumbnail).
+    """
+    digest, data = cover_digest(file_path)
+    with _cover_lock:
+        get_cover_digests().save()  # Sans effet si rien n'a changé
+    if digest is None:
+        return None
+    cover_dir = os.path.join(get_cache_dir(), 'covers')
+    thumbnail_path = os.path.join(cover_dir, f"{digest}-{size}.jpg")
+    if os.path.exists(thumbnail_path):
+        return thumbnail_path
+    if data is None:
+        # Miniature effacée ou d'une autre taille : relire l'image
+        data = embedded_cover_data(file_path)
+        if data is None:
+            cover_path = folder_cover_path(file_path)
+            if cover_path is None:
+                return None
+            with open(cover_path, 'rb') as f:
+                data = f.read()
+    from PIL import Image
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', (size, size))  # Décodage JPEG directement à l'échelle réduite
+        image.thumbnail((size, size), Image.LANCZOS)
+        image = image.convert('RGB')
+    except Exception as e:
+        print(f"Pochette illisible {file_path}: {e}")
+        return None
+    os.makedirs(cover_dir, exist_ok=True)
+    temp_path = f"{thumbnail_path}.{threading.get_ident()}.tmp"
+    image.save(temp_path, 'JPEG', quality=90)
+    os.replace(temp_path, thumbnail_path)
+    return thumbnail_path
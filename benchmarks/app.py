@@ -0,0 +1,23 @@
+"""Fenêtre MacAmp partagée par les benchmarks, créée hors écran et sans sortie audio"""
+import os
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from PyQt6.QtWidgets import QApplication
+
+_app = None
+_window = None
+
+
+def get_window():
+    global _app, _window
+    if _window is None:
+        from macamp import MacAmp
+        # Les icônes et la police sont chargées relativement à la racine du dépôt
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        _app = QApplication.instance() or QApplication([])
+        _window = MacAmp()
+        _window.resize(530, 430)
+        _window.waveform_widget.resize(530, 180)
+    return _window
@@ -0,0 +1,173 @@
+"""Benchmarks du callback audio (sans périphérique) et du chargement de piste"""
+import os
+import threading
+import time
+
+import numpy as np
+import soundfile as sf
+from scipy.io import wavfile
+
+from harness import benchmark, summarize, time_samples
+from corpus import CORPUS_DIR, tone
+from audio_engine import AudioPlayer, StreamingSource, build_seek_index, render_to_file
+
+SAMPLE_RATE = 48000
+
+
+def make_player(seconds=60):
+    player = AudioPlayer()
+    data = tone(seconds, SAMPLE_RATE).T.astype(np.float32) / 32768
+    player.audio_data = np.ascontiguousarray(data)
+    player.sample_rate = SAMPLE_RATE
+    player.current_file = 'bench'
+    player.ensure_buffers(512)
+    player.update_crossfade_curves()
+    player.equalizer.set_sample_rate(SAMPLE_RATE)
+    return player
+
+
+def wav_60s():
+    path = os.path.join(CORPUS_DIR, 'load-60s.wav')
+    if not os.path.exists(path):
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        wavfile.write(path, 44100, tone(60, 44100))
+    return path
+
+
+def callback_benchmark(player, frames, iterations=3000):
+    outdata = np.zeros((frames, player.channels), dtype=np.float32)
+
+    def rewind():
+        # Rester loin de la fin de piste pour mesurer le régime établi
+        if player.current_frame > player.audio_data.shape[1] - 10 * SAMPLE_RATE:
+            player.current_frame = 0
+
+    samples = time_samples(lambda: player.audio_callback(outdata, frames, None, None), iterations, setup=rewind)
+    return summarize(samples, 'us')
+
+
+for frames in (512, 64):
+    @benchmark(f"callback/plain/{frames}")
+    def bench_plain(frames=frames):
+        return callback_benchmark(make_player(), frames)
+
+    @benchmark(f"callback/eq5/{frames}")
+    def bench_eq(frames=frames):
+        player = make_player()
+        for index, gain_db in enumerate((3.0, -2.0, 1.5, -4.0, 2.5)):
+            player.equalizer.set_band(index, gain_db=gain_db)
+        return callback_benchmark(player, frames)
+
+    @benchmark(f"callback/stretch_1.5x/{frames}")
+    def bench_stretch(frames=frames):
+        player = make_player()
+        player.set_playback_rate(1.5, preserve_pitch=True)
+        return callback_benchmark(player, frames)
+
+
+@benchmark("callback/int16_mmap/512")
+def bench_int16():
+    # Source PCM projetée en mémoire : conversion float32 bloc par bloc
+    path = wav_60s()
+    player = make_player()
+    player.load_file(path)
+    player.sample_rate = SAMPLE_RATE
+    return callback_benchmark(player, 512)
+
+
+@benchmark("callback/crossfade_10s_96k/512")
+def bench_crossfade():
+    player = make_player(seconds=30)
+    player.sample_rate = 96000
+    player.set_crossfade(10)
+    current = player.audio_data
+    incoming = current.copy()
+    total = current.shape[1]
+    fade_start = total - player.crossfade_frames
+    position = [fade_start]
+
+    def into_fade():
+        # Parcourir la zone de fondu en boucle, la voix suivante toujours prête
+        player.audio_data = current
+        player.next_audio_data = incoming
+        player.current_frame = position[0]
+        player.next_frame = position[0] - fade_start
+        position[0] = position[0] + 512 if position[0] + 1024 < total else fade_start
+
+    outdata = np.zeros((512, 2), dtype=np.float32)
+    samples = time_samples(lambda: player.render(outdata, 512), 3000, setup=into_fade)
+    return summarize(samples, 'us')
+
+
+@benchmark("load/wav_60s")
+def bench_load():
+    path = wav_60s()
+    player = AudioPlayer()
+    samples = time_samples(lambda: player.load_file(path), 5, setup=player.clear_cache, warmup=1)
+    return summarize(samples, 'ms')
+
+
+def mp3_120s():
+    path = os.path.join(CORPUS_DIR, 'seek-120s.mp3')
+    if not os.path.exists(path):
+        os.makedirs(CORPUS_DIR, exist_ok=True)
+        sf.write(path, tone(120, 44100).astype(np.float32) / 32768, 44100, format='MP3')
+    return path
+
+
+@benchmark("seek/mp3_120s")
+def bench_seek():
+    path = mp3_120s()
+    source = StreamingSource(path, build_seek_index(path))
+    positions = iter(np.random.default_rng(0).integers(0, source.shape[1] - 1, 30))
+    position = [0]
+
+    def forget():
+        # Saut à froid : aucun bloc en cache
+        source.chunks.clear()
+        position[0] = next(positions)
+
+    samples = time_samples(lambda: source.prepare(position[0]), 20, setup=forget, warmup=10)
+    return summarize(samples, 'ms')
+
+
+@benchmark("decode/stall_mp3_120s")
+def bench_decode_stall():
+    """Pire retard d'un thread réveillé chaque milliseconde (le callback) pendant un décodage complet"""
+    path = mp3_120s()
+    player = AudioPlayer()
+    player.decode_shared(path)  # Démarrage du processus de décodage
+    stalls = []
+    for _ in range(3):
+        done = threading.Event()
+        worst = [0.0]
+
+        def ticker():
+            last = time.perf_counter()
+            while not done.is_set():
+                time.sleep(0.001)
+                now = time.perf_counter()
+                worst[0] = max(worst[0], now - last)
+                last = now
+        thread = threading.Thread(target=ticker)
+        thread.start()
+        player.decode_shared(path)
+        done.set()
+        thread.join()
+        stalls.append(worst[0])
+    player.shutdown()
+    return summarize(np.array(stalls), 'ms')
+
+
+@benchmark("export/mix_wav_mp3_crossfade", higher_is_better=True)
+def bench_export():
+    """Secondes de mix exportées par seconde (WAV projeté et MP3 décodé, fondu de 5 s)"""
+    settings = AudioPlayer()
+    settings.crossfade_duration = 5.0
+    files = [wav_60s(), mp3_120s(), wav_60s()]
+    output = os.path.join(CORPUS_DIR, 'export.wav')
+    start = time.perf_counter()
+    frames = render_to_file(files, output, settings=settings)
+    elapsed = time.perf_counter() - start
+    os.remove(output)
+    return {'value': frames / 44100 / elapsed, 'unit': 'x temps réel'}
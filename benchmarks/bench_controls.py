@@ -0,0 +1,31 @@
+"""Rendu des contrôles dessinés à la main (boutons rotatifs, shuffle / repeat)"""
+from PyQt6.QtGui import QImage
+
+from harness import benchmark, summarize, time_samples
+from app import get_window
+
+
+def repaint_benchmark(widget, change):
+    image = QImage(widget.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    steps = iter(range(10 ** 6))
+
+    def advance():
+        change(widget, next(steps))
+
+    return summarize(time_samples(lambda: widget.render(image), 500, setup=advance), 'us')
+
+
+@benchmark("controls/volume_knob_drag")
+def bench_volume_drag():
+    # Glissé continu : une nouvelle valeur (demi-pas) à chaque image
+    return repaint_benchmark(get_window().volume_knob, lambda knob, i: setattr(knob, 'value', (i * 0.5) % 100))
+
+
+@benchmark("controls/pan_knob_drag")
+def bench_pan_drag():
+    return repaint_benchmark(get_window().pan_knob, lambda knob, i: setattr(knob, 'value', (i * 0.5) % 100))
+
+
+@benchmark("controls/shuffle_toggle")
+def bench_shuffle_toggle():
+    return repaint_benchmark(get_window().shuffle_button, lambda button, i: button.setChecked(i % 2 == 0))
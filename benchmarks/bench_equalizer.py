@@ -0,0 +1,39 @@
+"""Coût CPU par bloc de l'égaliseur paramétrique (5 bandes actives)
+
+Usage : python benchmarks/bench_equalizer.py (ou via benchmarks/run.py)
+"""
+import numpy as np
+
+from harness import benchmark, summarize, time_samples
+from audio_engine import ParametricEqualizer
+
+SAMPLE_RATE = 48000
+
+
+def equalizer_benchmark(frames, iterations=5000):
+    equalizer = ParametricEqualizer(SAMPLE_RATE)
+    for index, gain_db in enumerate((3.0, -2.0, 1.5, -4.0, 2.5)):
+        equalizer.set_band(index, gain_db=gain_db)
+    block = (np.random.default_rng(0).standard_normal((frames, 2)) * 0.1).astype(np.float32)
+    work = np.empty_like(block)
+
+    def refill():
+        work[:] = block
+
+    result = summarize(time_samples(lambda: equalizer.process(work), iterations, setup=refill), 'us')
+    period_us = frames / SAMPLE_RATE * 1e6
+    result['p99_period_fraction'] = result['p99'] / period_us
+    return result
+
+
+for frames in (512, 64):
+    @benchmark(f"equalizer/5_bands/{frames}")
+    def bench_equalizer(frames=frames):
+        return equalizer_benchmark(frames)
+
+
+if __name__ == '__main__':
+    for frames in (512, 64):
+        result = equalizer_benchmark(frames)
+        print(f"{frames:4d} frames : médiane {result['value']:7.1f} µs, p99 {result['p99']:7.1f} µs "
+              f"({100 * result['p99_period_fraction']:.2f} % de la période)")
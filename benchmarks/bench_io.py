@@ -0,0 +1,41 @@
+"""Scan et chargement depuis un stockage lent (latence simulée par slowfs)"""
+import os
+import time
+
+from harness import benchmark
+from corpus import CORPUS_DIR, make_corpus
+from slowfs import slow_storage
+
+from audio_engine import read_metadata, StagingCache
+
+REMOTE_DIR = os.path.join(CORPUS_DIR, 'remote')
+LATENCY = 0.005  # 5 ms par lecture, ordre de grandeur d'un partage SMB en Wi-Fi
+
+
+def remote_corpus(count=20):
+    return make_corpus(REMOTE_DIR, count=count, seconds=10)
+
+
+@benchmark("io/scan_slow_storage", higher_is_better=True)
+def bench_scan_slow():
+    paths = remote_corpus()
+    read_metadata(paths[0])  # Échauffement hors stockage lent
+    with slow_storage(REMOTE_DIR, latency=LATENCY) as stats:
+        start = time.perf_counter()
+        for path in paths:
+            read_metadata(path)
+        elapsed = time.perf_counter() - start
+    return {'value': len(paths) / elapsed, 'unit': 'fichiers/s', 'reads': stats['reads']}
+
+
+@benchmark("io/stage_slow_storage", higher_is_better=True)
+def bench_stage_slow():
+    """Débit de la copie locale (StagingCache) d'une piste depuis le stockage lent"""
+    path = remote_corpus()[0]
+    with slow_storage(REMOTE_DIR, latency=LATENCY):
+        staging = StagingCache()
+        start = time.perf_counter()
+        local_path = staging.stage(path)
+        elapsed = time.perf_counter() - start
+    os.remove(local_path)
+    return {'value': os.path.getsize(path) / elapsed / 1e6, 'unit': 'Mo/s'}
@@ -0,0 +1,55 @@
+"""Scan de bibliothèque (read_metadata, derrière MacAmp.get_metadata), recherche et tri de la playlist"""
+import itertools
+import random
+import time
+
+from harness import benchmark, summarize, time_samples
+from corpus import CORPUS_DIR, make_corpus
+import numpy as np
+
+from audio_engine import read_metadata, SearchIndex, SortKeys
+
+
+@benchmark("library/get_metadata_throughput", higher_is_better=True)
+def bench_get_metadata():
+    paths = make_corpus(CORPUS_DIR, count=40, seconds=10)
+    read_metadata(paths[0])  # Échauffement (imports paresseux de librosa)
+    start = time.perf_counter()
+    for path in paths:
+        read_metadata(path)
+    elapsed = time.perf_counter() - start
+    return {'value': len(paths) / elapsed, 'unit': 'fichiers/s', 'files': len(paths)}
+
+
+WORDS = ("love night dance blue fire heart city dream rain sun moon star road home gold "
+         "time light shadow river summer beyoncé café").split()
+
+
+@benchmark("library/search_100k")
+def bench_search():
+    """Frappe par frappe dans une playlist de 100 000 lignes (index seul, sans Qt)"""
+    rng = random.Random(1)
+    index = SearchIndex()
+    for row in range(100000):
+        index.add(row, f"Artist{row % 3000}", " ".join(rng.sample(WORDS, 3)))
+    query = "dance heart artist12"
+    keystrokes = itertools.cycle([query[:i] for i in range(1, len(query) + 1)])
+    samples = time_samples(lambda: index.search(next(keystrokes)), 500)
+    return summarize(samples, 'ms')
+
+
+@benchmark("library/sort_100k")
+def bench_sort():
+    """Tri par titre puis par artiste de 100 000 entrées (clés précalculées, sans Qt)"""
+    rng = random.Random(1)
+    keys = SortKeys()
+    for entry in range(100000):
+        keys.set(entry, {'artist': f"Artist{entry % 3000}", 'title': " ".join(rng.sample(WORDS, 3)),
+                         'length': rng.uniform(60, 600), 'track': entry % 12 + 1})
+    entries = np.arange(100000)
+
+    def sort_twice():
+        order = keys.order('title', entries)
+        keys.order('artist', entries[order])
+    samples = time_samples(sort_twice, 50, warmup=1)
+    return summarize(samples, 'ms')
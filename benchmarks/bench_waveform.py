@@ -0,0 +1,72 @@
+"""Benchmarks de la waveform (enveloppes multi-résolution et rendu hors écran)"""
+import numpy as np
+from PyQt6.QtGui import QImage
+
+from harness import benchmark, summarize, time_samples
+from app import get_window
+from audio_engine import WaveformPyramid
+
+SAMPLE_RATE = 44100
+
+
+class RepeatingSource:
+    """Source (canaux, frames) de longue durée : une seconde de bruit répétée, sans allouer la piste"""
+    def __init__(self, seconds):
+        rng = np.random.default_rng(0)
+        self.period = (rng.standard_normal((2, SAMPLE_RATE)) * 0.2).astype(np.float32)
+        self.shape = (2, int(seconds * SAMPLE_RATE))
+
+    def __getitem__(self, key):
+        start, stop, _ = key[1].indices(self.shape[1])
+        return self.period[:, np.arange(start, stop) % SAMPLE_RATE]
+
+
+_pyramid_2h = None
+
+
+def pyramid_2h():
+    global _pyramid_2h
+    if _pyramid_2h is None:
+        _pyramid_2h = WaveformPyramid(RepeatingSource(2 * 3600), SAMPLE_RATE).build()
+    return _pyramid_2h
+
+
+def widget_with(pyramid):
+    widget = get_window().waveform_widget
+    widget.set_waveform(pyramid, pyramid.total / SAMPLE_RATE)
+    return widget
+
+
+@benchmark("waveform/build_10min")
+def bench_build():
+    source = RepeatingSource(600)
+    return summarize(time_samples(lambda: WaveformPyramid(source, SAMPLE_RATE).build(), 3, warmup=1), 'ms')
+
+
+@benchmark("waveform/paint_2h")
+def bench_paint():
+    widget = widget_with(pyramid_2h())
+    image = QImage(widget.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    positions = iter(np.linspace(0, 1, 10000))
+
+    def advance():
+        widget.current_position = next(positions)
+
+    return summarize(time_samples(lambda: widget.render(image), 200, setup=advance), 'ms')
+
+
+@benchmark("waveform/zoom_2h")
+def bench_zoom():
+    # Changement de vue (calcul + rendu) à tous les niveaux de détail : barres, enveloppe PCM, échantillons
+    pyramid = pyramid_2h()
+    widget = widget_with(pyramid)
+    image = QImage(widget.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    rng = np.random.default_rng(0)
+    spans = [pyramid.total, 10 ** 7, 10 ** 5, 2 * 10 ** 4, 400]
+    views = iter([(rng.integers(0, pyramid.total - span + 1), span) for span in spans * 100])
+
+    def redraw():
+        widget.set_view(*next(views))
+        widget.render(image)
+
+    return summarize(time_samples(redraw, 400, warmup=50), 'ms')
@@ -0,0 +1,56 @@
+"""Génération d'un corpus de fichiers WAV/AIFF pour les benchmarks"""
+import os
+import struct
+import tempfile
+
+import numpy as np
+from scipy.io import wavfile
+
+CORPUS_DIR = os.path.join(tempfile.gettempdir(), 'macamp-bench')
+
+
+def extended_float(value):
+    """Nombre flottant 80 bits IEEE 754 étendu (fréquence d'échantillonnage AIFF)"""
+    exponent = 16383 + 63
+    mantissa = int(value)
+    while mantissa and not mantissa & (1 << 63):
+        mantissa <<= 1
+        exponent -= 1
+    return struct.pack('>HQ', exponent, mantissa)
+
+
+def write_aiff(path, data, sample_rate):
+    """Écrit un AIFF PCM 16 bits ; data est un tableau int16 (frames, canaux)"""
+    frames, channels = data.shape
+    pcm = data.astype('>i2').tobytes()
+    comm = struct.pack('>hIh', channels, frames, 16) + extended_float(sample_rate)
+    ssnd = struct.pack('>II', 0, 0) + pcm
+    body = (b'AIFF' + b'COMM' + struct.pack('>I', len(comm)) + comm
+            + b'SSND' + struct.pack('>I', len(ssnd)) + ssnd)
+    with open(path, 'wb') as f:
+        f.write(b'FORM' + struct.pack('>I', len(body)) + body)
+
+
+def tone(seconds, sample_rate=44100, channels=2, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * rng.uniform(110, 880) * t) + 0.05 * rng.standard_normal(t.size)
+    pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    return np.repeat(pcm[:, None], channels, axis=1)
+
+
+def make_corpus(directory, count=20, seconds=10, sample_rate=44100):
+    """Crée (ou réutilise) `count` fichiers, moitié WAV moitié AIFF, et renvoie leurs chemins"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        extension = 'wav' if i % 2 == 0 else 'aiff'
+        path = os.path.join(directory, f"Artiste {i % 5} - Titre {i:03d}.{extension}")
+        if not os.path.exists(path):
+            data = tone(seconds, sample_rate, seed=i)
+            if extension == 'wav':
+                wavfile.write(path, sample_rate, data)
+            else:
+                write_aiff(path, data, sample_rate)
+        paths.append(path)
+    return paths
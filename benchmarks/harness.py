@@ -0,0 +1,117 @@
+"""Mini-harnais de benchmarks : enregistrement, mesure, stockage et détection de régressions
+
+Chaque benchmark est une fonction décorée par @benchmark qui renvoie un dict
+contenant au moins 'value' (la métrique surveillée) et 'unit'. Les résultats
+sont écrits en JSON ; comparés à une référence, toute dégradation au-delà du
+seuil fait échouer l'exécution.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+BENCHMARKS = []
+
+
+def benchmark(name, higher_is_better=False):
+    """Enregistre une fonction de benchmark"""
+    def register(func):
+        BENCHMARKS.append({'name': name, 'func': func, 'higher_is_better': higher_is_better})
+        return func
+    return register
+
+
+def time_samples(func, iterations, setup=None, warmup=10):
+    """Durées (secondes) de `iterations` appels de func, setup exclu de la mesure"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - start
+    return samples
+
+
+def summarize(samples, unit='us'):
+    scale = {'us': 1e6, 'ms': 1e3, 's': 1.0}[unit]
+    return {
+        'value': float(np.median(samples) * scale),
+        'p99': float(np.percentile(samples, 99) * scale),
+        'max': float(np.max(samples) * scale),
+        'unit': unit,
+    }
+
+
+def run_benchmarks(selected=None):
+    results = {}
+    for bench in BENCHMARKS:
+        if selected and not any(pattern in bench['name'] for pattern in selected):
+            continue
+        result = bench['func']()
+        result['higher_is_better'] = bench['higher_is_better']
+        results[bench['name']] = result
+        extra = f" (p99 {result['p99']:.1f})" if 'p99' in result else ""
+        print(f"{bench['name']:<40} {result['value']:>12.2f} {result['unit']}{extra}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Liste des régressions dépassant le seuil relatif par rapport à la référence"""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference or not reference.get('value'):
+            continue
+        change = (result['value'] - reference['value']) / reference['value']
+        if result['higher_is_better']:
+            change = -change
+        if change > threshold:
+            regressions.append((name, reference['value'], result['value'], result['unit'], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks des chemins critiques de MacAmp")
+    parser.add_argument('-k', dest='selected', action='append', help="ne lancer que les benchmarks contenant ce texte")
+    parser.add_argument('--baseline', default=os.path.join(RESULTS_DIR, 'baseline.json'))
+    parser.add_argument('--output', default=os.path.join(RESULTS_DIR, 'latest.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="enregistrer les résultats comme référence")
+    parser.add_argument('--threshold', type=float, default=0.25, help="dégradation relative tolérée (0.25 = 25 %%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.selected)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    report = {'machine': platform.node(), 'python': platform.python_version(),
+              'timestamp': time.time(), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Référence enregistrée dans {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("Pas de référence : lancer avec --save-baseline pour en créer une")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, unit, change in regressions:
+        print(f"RÉGRESSION {name}: {before:.2f} -> {after:.2f} {unit} ({change * 100:+.0f} %)")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+"""Lance tous les benchmarks headless de MacAmp
+
+Usage :
+    python benchmarks/run.py --save-baseline   # enregistrer la référence
+    python benchmarks/run.py                   # comparer, code de sortie 1 si régression
+    python benchmarks/run.py -k callback       # sous-ensemble
+"""
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import app  # noqa: F401  (configure Qt hors écran avant tout import de macamp)
+import bench_audio  # noqa: F401
+import bench_equalizer  # noqa: F401
+import bench_waveform  # noqa: F401
+import bench_controls  # noqa: F401
+import bench_library  # noqa: F401
+import bench_io  # noqa: F401
+from harness import main
+
+if __name__ == '__main__':
+    sys.exit(main())
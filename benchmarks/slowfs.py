@@ -0,0 +1,85 @@
+"""Stockage lent simulé : latence injectée à chaque lecture sous un dossier
+
+Remplace open() le temps d'un bloc with : les fichiers ouverts en lecture sous
+`root` (par audio_engine, mutagen…) attendent `latency` secondes par appel
+système de lecture, plus le temps de transfert à `bandwidth` octets/s, comme
+un partage NFS/SMB. Le dossier est aussi déclaré distant (MACAMP_REMOTE_PATHS)
+pour que le moteur passe par ReadAheadFile et StagingCache. Les lectures faites
+directement par libsndfile ou par mmap ne passent pas par open() et ne sont
+pas ralenties.
+"""
+import builtins
+import contextlib
+import io
+import os
+import time
+
+import audio_engine
+
+
+class SlowFile(io.RawIOBase):
+    def __init__(self, path, stats, latency, bandwidth):
+        super().__init__()
+        self.raw = io.FileIO(path, 'rb')
+        self.name = path
+        self.stats = stats
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.stats['reads'] += 1
+        self.stats['bytes'] += count or 0
+        time.sleep(self.latency + (count or 0) / self.bandwidth)
+        return count
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.raw.seek(offset, whence)
+
+    def tell(self):
+        return self.raw.tell()
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+@contextlib.contextmanager
+def slow_storage(root, latency=0.002, bandwidth=100e6):
+    """Dans le bloc, les lectures sous root sont lentes ; renvoie les compteurs (lectures, octets)"""
+    root = os.path.join(os.path.abspath(root), '')
+    stats = {'reads': 0, 'bytes': 0}
+    real_open = builtins.open
+
+    def slow_open(file, mode='r', buffering=-1, *args, **kwargs):
+        if (isinstance(file, (str, bytes, os.PathLike)) and 'r' in mode and '+' not in mode
+                and os.path.abspath(os.fsdecode(file)).startswith(root)):
+            raw = SlowFile(os.fsdecode(file), stats, latency, bandwidth)
+            if buffering == 0:
+                return raw
+            buffered = io.BufferedReader(raw, buffer_size=buffering if buffering > 1 else io.DEFAULT_BUFFER_SIZE)
+            return buffered if 'b' in mode else io.TextIOWrapper(buffered, *args, **kwargs)
+        return real_open(file, mode, buffering, *args, **kwargs)
+
+    previous = os.environ.get('MACAMP_REMOTE_PATHS')
+    os.environ['MACAMP_REMOTE_PATHS'] = root
+    audio_engine._network_mounts = None
+    builtins.open = slow_open
+    try:
+        yield stats
+    finally:
+        builtins.open = real_open
+        if previous is None:
+            del os.environ['MACAMP_REMOTE_PATHS']
+        else:
+            os.environ['MACAMP_REMOTE_PATHS'] = previous
+        audio_engine._network_mounts = None
@@ -0,0 +1,256 @@
+"""Lecture sans interface : python -m macamp --headless playlist.m3u
+
+Utilise le même moteur (décodage, cache, enchaînement sans blanc) que
+l'interface, sans importer PyQt. Le lecteur se pilote par la socket de
+contrôle (voir remote_control.py).
+"""
+import argparse
+import os
+import queue
+import random
+import signal
+import sys
+import time
+from urllib.parse import unquote, urlparse
+
+from audio_engine import AudioPlayer, render_to_file
+from remote_control import ControlServer
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.aiff')
+
+
+def read_playlist(path):
+    """Chemins d'une playlist M3U/M3U8, relatifs au dossier de la playlist"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    files = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('file://'):
+                line = unquote(urlparse(line).path)
+            files.append(os.path.normpath(os.path.join(base_dir, line)))
+    return files
+
+
+def expand_arguments(paths):
+    files = []
+    for path in paths:
+        if path.lower().endswith(('.m3u', '.m3u8')):
+            files.extend(read_playlist(path))
+        elif path.lower().endswith(AUDIO_EXTENSIONS):
+            files.append(os.path.abspath(path))
+    return files
+
+
+class HeadlessPlayer:
+    """Playlist et transport autour d'AudioPlayer ; tous les changements d'état
+    passent par une file traitée dans le thread principal"""
+    def __init__(self, files, repeat=False, shuffle=False, crossfade=0.0):
+        self.player = AudioPlayer()
+        self.player.set_crossfade(crossfade)
+        self.playlist = list(files)
+        self.order = list(range(len(self.playlist)))
+        if shuffle:
+            random.shuffle(self.order)
+        self.repeat = repeat
+        self.position = 0  # Position dans self.order
+        self.events = queue.Queue()
+        self.running = True
+        self.server = None
+        # Les notifications du thread audio sont relayées au thread principal
+        self.player.on_track_changed = lambda file_path: self.events.put(('track_changed', file_path))
+        self.player.on_playback_finished = lambda: self.events.put(('finished', None))
+
+    @property
+    def current_index(self):
+        return self.order[self.position] if self.order else None
+
+    def peek_next_position(self):
+        if self.position < len(self.order) - 1:
+            return self.position + 1
+        return 0 if self.repeat and self.order else None
+
+    def queue_next(self):
+        next_position = self.peek_next_position()
+        if next_position is None:
+            self.player.clear_next()
+        else:
+            self.player.queue_next(self.playlist[self.order[next_position]])
+
+    def load_position(self, position, start=True):
+        self.position = position
+        file_path = self.playlist[self.order[position]]
+        print(f"Chargement de la piste: {file_path}")
+        if not self.player.load_file(file_path):
+            return False
+        if start:
+            self.player.play()
+        self.queue_next()
+        return True
+
+    def handle_event(self, kind, payload):
+        if kind == 'track_changed':
+            # Enchaînement réalisé par le moteur : suivre la position
+            next_position = self.peek_next_position()
+            if next_position is not None and self.playlist[self.order[next_position]] == payload:
+                self.position = next_position
+            print(f"Lecture: {payload}")
+            self.queue_next()
+            self.publish_status()
+        elif kind == 'finished':
+            next_position = self.peek_next_position()
+            if next_position is None:
+                print("Fin de la playlist")
+                self.publish_status()
+            else:
+                self.load_position(next_position)
+        elif kind == 'command':
+            command, reply = payload
+            response = self.execute(command)
+            reply.put(response)
+            if command.get('cmd') != 'status':
+                self.publish_status()
+
+    def execute(self, command):
+        """Exécute une commande de contrôle (dans le thread principal)"""
+        name = command.get('cmd')
+        player = self.player
+        if name == 'play':
+            if not player.is_playing and player.audio_data is not None:
+                player.play(start_pos=player.get_position())
+        elif name == 'pause':
+            player.pause()
+        elif name == 'stop':
+            player.stop()
+        elif name == 'next':
+            next_position = self.peek_next_position()
+            if next_position is not None:
+                self.load_position(next_position, start=player.is_playing)
+        elif name == 'previous':
+            if self.position > 0:
+                self.load_position(self.position - 1, start=player.is_playing)
+        elif name == 'seek':
+            position = float(command['position'])
+            if player.is_playing:
+                player.play(start_pos=position)
+            else:
+                player.current_frame = int(position * (player.sample_rate or 0))
+        elif name == 'loop':
+            # Sans bornes : supprimer la boucle A-B
+            if 'start' in command and 'end' in command:
+                if not player.set_loop(float(command['start']), float(command['end'])):
+                    return {'ok': False, 'error': "Boucle trop courte ou piste non chargée"}
+            else:
+                player.clear_loop()
+        elif name == 'enqueue':
+            files = expand_arguments(command.get('paths', []))
+            was_last = self.peek_next_position() is None
+            start = len(self.playlist)
+            self.playlist.extend(files)
+            self.order.extend(range(start, len(self.playlist)))
+            if start == 0 and files:
+                self.load_position(0)
+            elif was_last and files:
+                self.queue_next()
+            return dict(self.status(), added=len(files))
+        elif name == 'quit':
+            self.running = False
+        elif name != 'status':
+            return {'ok': False, 'error': f"Commande inconnue: {name}"}
+        return self.status()
+
+    def status(self):
+        return {
+            'ok': True,
+            'mode': 'headless',
+            'state': 'playing' if self.player.is_playing else 'paused' if self.player.audio_data is not None else 'stopped',
+            'file': self.player.current_file,
+            'index': self.current_index,
+            'position': self.player.get_position(),
+            'duration': self.player.get_duration(),
+            'playlist_length': len(self.playlist),
+            'timestamp': time.time(),
+        }
+
+    def publish_status(self):
+        if self.server is not None:
+            self.server.publish(dict(self.status(), event='status'))
+
+    def submit(self, command):
+        """Appelé depuis les threads du serveur de contrôle : attend la réponse du thread principal"""
+        reply = queue.Queue(maxsize=1)
+        self.events.put(('command', (command, reply)))
+        return reply.get(timeout=10)
+
+    def run(self):
+        if self.playlist:
+            self.load_position(0)
+        while self.running:
+            try:
+                kind, payload = self.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.handle_event(kind, payload)
+        self.player.stop()
+        recording = self.player.stop_recording()
+        if recording:
+            print(f"Enregistrement: {recording['path']} ({recording['seconds']:.1f} s, "
+                  f"{recording['dropped_blocks']} blocs perdus)")
+        self.player.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="macamp --headless", description="Lecteur MacAmp sans interface")
+    parser.add_argument('paths', nargs='*', help="playlists M3U ou fichiers audio")
+    parser.add_argument('--socket', help="chemin de la socket de contrôle")
+    parser.add_argument('--no-socket', action='store_true', help="ne pas ouvrir de socket de contrôle")
+    parser.add_argument('--repeat', action='store_true', help="reprendre la playlist au début")
+    parser.add_argument('--shuffle', action='store_true', help="lecture aléatoire")
+    parser.add_argument('--crossfade', type=float, default=0.0, help="durée du fondu enchaîné (secondes)")
+    parser.add_argument('--fixed-latency', action='store_true',
+                        help="garder des blocs de 512 frames au lieu d'ajuster taille de bloc et latence")
+    parser.add_argument('--device', help="nom du périphérique de sortie (mémorisé pour les lancements suivants)")
+    parser.add_argument('--record', metavar='FICHIER', help="enregistrer la sortie dans un fichier WAV")
+    parser.add_argument('--export', metavar='FICHIER',
+                        help="mixer la playlist dans un fichier WAV/FLAC (hors temps réel) puis quitter")
+    args = parser.parse_args(argv)
+
+    headless = HeadlessPlayer(expand_arguments(args.paths), repeat=args.repeat,
+                              shuffle=args.shuffle, crossfade=args.crossfade)
+    if args.export:
+        files = [headless.playlist[index] for index in headless.order]
+        start = time.perf_counter()
+        frames = render_to_file(files, args.export, settings=headless.player,
+                                progress=lambda index, file_path: print(f"Export ({index + 1}/{len(files)}): {file_path}"))
+        elapsed = time.perf_counter() - start
+        print(f"Exporté: {args.export} ({frames} frames en {elapsed:.1f} s)")
+        return 0
+    headless.player.latency_tuner.enabled = not args.fixed_latency
+    if args.device:
+        headless.player.set_output_device(args.device)
+    if args.record:
+        headless.player.start_recording(args.record)
+    server = None
+    if not args.no_socket:
+        server = ControlServer(headless.submit, args.socket)
+        server.start()
+        headless.server = server
+        print(f"Contrôle: {server.socket_path}")
+
+    def request_quit(signum, frame):
+        headless.events.put(('command', ({'cmd': 'quit'}, queue.Queue(maxsize=1))))
+
+    signal.signal(signal.SIGINT, request_quit)
+    signal.signal(signal.SIGTERM, request_quit)
+    try:
+        headless.run()
+    finally:
+        if server is not None:
+            server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,27 +1,45 @@
 import sys
 import os
+
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    # Mode sans interface : ni PyQt ni widgets ne sont importés
+    from headless import main as headless_main
+    sys.exit(headless_main([arg for arg in sys.argv[1:] if arg != '--headless']))
+
+if __name__ == '__main__' and '--new-instance' not in sys.argv[1:]:
+    # Instance unique : les fichiers sont confiés à la fenêtre déjà ouverte,
+    # avant de charger Qt et la pile audio
+    from remote_control import forward_to_running_instance
+    if forward_to_running_instance([arg for arg in sys.argv[1:] if not arg.startswith('-')]):
+        sys.exit(0)
+
 import numpy as np
-import librosa
 from PIL import Image
 import io
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QPushButton, 
                             QVBoxLayout, QHBoxLayout, QWidget, QFileDialog,
                             QLabel, QSlider, QListWidget, QFrame, QToolTip,
                             QTreeWidget, QTreeWidgetItem, QHeaderView, QStyledItemDelegate,
-                            QStackedWidget, QSizePolicy)
-from PyQt6.QtCore import Qt, QTimer, QSize, QPoint, QMimeData, QRect, QRectF
+                            QStackedWidget, QSizePolicy, QMenu, QLineEdit)
+from PyQt6.QtCore import (Qt, QTimer, QSize, QPoint, QPointF, QLineF, QMimeData, QRect, QRectF, QEvent, QModelIndex,
+                          pyqtSignal)
 from PyQt6.QtGui import (QPixmap, QPainter, QColor, QPen, QImage, QLinearGradient, 
-                        QBrush, QDragEnterEvent, QDropEvent, QFont, QFontDatabase, QPainterPath)
+                        QBrush, QDragEnterEvent, QDropEvent, QFont, QFontDatabase, QPainterPath,
+                        QShortcut, QKeySequence)
 from PyQt6.QtSvg import QSvgRenderer
-import sounddevice as sd
 from scipy.io import wavfile
 import pygame
 import eyed3
-from mutagen import File
-from mutagen.id3 import ID3
-from mutagen.mp3 import MP3
-from mutagen.easyid3 import EasyID3
 import time
+import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from audio_engine import (AudioPlayer, RingBuffer, PersistentCache, get_cache_dir,
+                          analyze_loudness, lower_priority, loudness_gain, clean_title, read_metadata,
+                          metadata_from_filename, read_metadata_batch, load_cover, WaveformPyramid,
+                          analyze_beats, AnalysisQueue, SearchIndex, SortKeys,
+                          list_output_devices, render_to_file)
+from remote_control import ControlServer
 
 class PlaylistItemDelegate(QStyledItemDelegate):
     def initStyleOption(self, option, index):
@@ -35,22 +53,33 @@ class PlaylistItemDelegate(QStyledItemDelegate):
                 option.palette.setColor(option.palette.ColorRole.Text, QColor("#FFFFFF"))
 
 class PlaylistWidget(QTreeWidget):
+    # Colonnes triables (clic sur l'en-tête) -> clé de tri (SortKeys)
+    SORT_COLUMNS = {0: 'track', 1: 'artist', 2: 'title', 3: 'duration'}
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setFont(QFont("Inter", 12))
         self.setAcceptDrops(True)
         self.setDragDropMode(QTreeWidget.DragDropMode.InternalMove)
-        self.setColumnCount(2)
-        self.setHeaderLabels(["Artiste", "Titre"])
+        self.setColumnCount(5)
+        self.setHeaderLabels(["N°", "Artiste", "Titre", "Durée", "BPM"])
         self.setAlternatingRowColors(False)
         self.setSelectionMode(QTreeWidget.SelectionMode.NoSelection)
         self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
         
         header = self.header()
-        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Fixed)
-        header.setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.setColumnWidth(0, 120)
+        for column in (0, 1, 3, 4):
+            header.setSectionResizeMode(column, QHeaderView.ResizeMode.Fixed)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        header.setStretchLastSection(False)
+        self.setColumnWidth(0, 40)
+        self.setColumnWidth(1, 120)
+        self.setColumnWidth(3, 56)
+        self.setColumnWidth(4, 48)
         header.setDefaultAlignment(Qt.AlignmentFlag.AlignLeft)
+        # Tri géré par MacAmp.sort_playlist (l'ordre de la playlist suit celui des lignes)
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(False)
         
         # Remettre le padding-left de 10px sur le header et les items
         header.setStyleSheet("""
@@ -104,8 +133,8 @@ class PlaylistWidget(QTreeWidget):
         
         for i in range(self.topLevelItemCount()):
             item = self.topLevelItem(i)
-            item.setTextAlignment(0, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
             item.setTextAlignment(1, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+            item.setTextAlignment(2, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.Fixed)
         header.setDefaultAlignment(Qt.AlignmentFlag.AlignLeft)
 
@@ -129,14 +158,14 @@ class PlaylistWidget(QTreeWidget):
             item = self.topLevelItem(i)
             if i == self.parent().parent().current_index:
                 # Piste active en jaune doré et gras
-                for col in range(2):
+                for col in range(self.columnCount()):
                     font = QFont("Inter", 12)
                     font.setBold(False)
                     item.setFont(col, font)
                     item.setForeground(col, QColor("#FFDD00"))
             else:
                 # Autres pistes en blanc et normal
-                for col in range(2):
+                for col in range(self.columnCount()):
                     font = QFont("Inter", 12)
                     font.setBold(False)
                     item.setFont(col, font)
@@ -145,24 +174,33 @@ class PlaylistWidget(QTreeWidget):
     def update_active_track(self):
         for i in range(self.topLevelItemCount()):
             item = self.topLevelItem(i)
-            if i == self.parent().parent().current_index:
-                item.setForeground(0, QColor("#FFDD00"))
-                item.setForeground(1, QColor("#FFDD00"))
-            else:
-                item.setForeground(0, QColor("#FFFFFF"))
-                item.setForeground(1, QColor("#FFFFFF"))
+            color = QColor("#FFDD00") if i == self.parent().parent().current_index else QColor("#FFFFFF")
+            for col in range(self.columnCount()):
+                item.setForeground(col, color)
 
     def addTopLevelItem(self, item):
         super().addTopLevelItem(item)
+        item.setTextAlignment(0, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
         # Aligner le texte de l'artiste à gauche
-        item.setTextAlignment(0, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-        # Aligner le texte du titre à gauche
         item.setTextAlignment(1, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        # Aligner le texte du titre à gauche
+        item.setTextAlignment(2, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        item.setTextAlignment(3, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        item.setTextAlignment(4, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
 
 class WaveformWidget(QWidget):
+    """Forme d'onde zoomable (molette) et défilable (Maj+molette ou défilement horizontal)
+
+    Vue entière et zooms larges : barres calculées depuis les enveloppes
+    multi-résolution (WaveformPyramid). Zoom profond : enveloppe min/max par
+    colonne lue dans la source PCM, puis tracé échantillon par échantillon.
+    Clic droit : points A et B de la boucle, dessinée en surimpression.
+    """
+    MIN_FRAMES_PER_PIXEL = 1 / 8  # Zoom maximal : 8 pixels par échantillon
+    
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.waveform = None
+        self.waveform = None  # WaveformPyramid
         self.current_position = 0
         self.hover_position = None
         self.duration = 0
@@ -178,11 +216,15 @@ class WaveformWidget(QWidget):
                 padding: 0px;
             }
         """)
-        # Cache pour les barres de la waveform
-        self.bar_cache = None
-        self.last_width = 0
-        self.last_position = -1
-        self.bar_heights = None  # Cache pour les hauteurs des barres
+        # Vue courante, en frames
+        self.view_start = 0
+        self.view_frames = 0
+        # Cache pour les barres de la waveform (recalculé si la vue ou la largeur change)
+        self.bar_heights = None
+        self.view_columns = None
+        self.view_samples = None
+        self.beats = None  # Temps des battements (secondes), tableau trié
+        self.loop_points = (None, None)  # Points A et B (secondes)
         
     def format_time(self, seconds):
         return time.strftime('%M:%S', time.gmtime(seconds))
@@ -190,31 +232,83 @@ class WaveformWidget(QWidget):
     def set_position(self, position):
         if position != self.current_position:
             self.current_position = position
+            if self.is_zoomed() and not self.is_dragging:
+                # Le zoom suit la lecture : page suivante quand la tête sort de la vue
+                frame = position * self.waveform.total
+                if not self.view_start <= frame < self.view_start + self.view_frames:
+                    self.set_view(frame, self.view_frames)
             self.update()
         
     def set_waveform(self, waveform, duration):
         self.waveform = waveform
         self.duration = duration
         self.current_file = self.parent().parent().current_file
+        self.view_start = 0
+        self.view_frames = waveform.total if waveform is not None else 0
+        self.compute_bar_heights()
+        self.update()
+        
+    def set_beats(self, beats):
+        self.beats = np.asarray(beats, dtype=np.float64) if beats else None
+        self.update()
+        
+    def set_loop_points(self, start, end):
+        self.loop_points = (start, end)
+        self.update()
+        
+    def clear_waveform(self):
+        self.waveform = None
+        self.bar_heights = self.view_columns = self.view_samples = None
+        self.update()
+        
+    def is_zoomed(self):
+        return self.waveform is not None and self.view_frames < self.waveform.total
         
-        # Précalculer les hauteurs des barres
+    def clamp_view_frames(self, frames):
+        return int(min(self.waveform.total, max(frames, self.width() * self.MIN_FRAMES_PER_PIXEL, 2)))
+        
+    def set_view(self, start, frames):
+        total = self.waveform.total
+        frames = self.clamp_view_frames(frames)
+        self.view_start = int(min(max(0, start), total - frames))
+        self.view_frames = frames
+        self.compute_bar_heights()
+        self.update()
+        
+    def frame_at(self, x):
+        return self.view_start + max(0.0, min(1.0, x / max(1, self.width()))) * self.view_frames
+        
+    def position_at(self, x):
+        """Position (0-1 de la piste) sous l'abscisse x, compte tenu du zoom"""
+        if self.waveform is None or not self.waveform.total:
+            return max(0, min(1, x / max(1, self.width())))
+        return self.frame_at(x) / self.waveform.total
+        
+    def compute_bar_heights(self):
+        # Précalculer les données de la vue : barres, enveloppe par colonne ou échantillons
+        self.bar_heights = self.view_columns = self.view_samples = None
+        if self.waveform is None:
+            return
         width = self.width()
         bar_width = 4
         gap = 2
         num_bars = width // (bar_width + gap)
-        samples_per_bar = len(self.waveform) // num_bars
-        
-        self.bar_heights = np.zeros(num_bars)
-        for i in range(num_bars):
-            if i * samples_per_bar >= len(self.waveform):
-                break
-            start_idx = i * samples_per_bar
-            end_idx = min((i + 1) * samples_per_bar, len(self.waveform))
-            if end_idx > start_idx:
-                amplitude = np.mean(np.abs(self.waveform[start_idx:end_idx]))
-                self.bar_heights[i] = min(1.0, amplitude * 2.5)
+        if num_bars == 0:
+            return
+        start, stop = self.view_start, self.view_start + self.view_frames
+        if self.view_frames <= width:
+            self.view_samples = self.waveform.samples(start, stop)
+        elif self.view_frames / num_bars >= self.waveform.BASE_BLOCK:
+            amplitude = self.waveform.columns(start, stop, num_bars)[:, 2]
+            self.bar_heights = np.minimum(1.0, amplitude * 2.5)
+        else:
+            self.view_columns = self.waveform.columns(start, stop, width)
         
-        self.update()
+    def resizeEvent(self, event):
+        # L'apparition de la pochette change la largeur : recalculer les barres
+        super().resizeEvent(event)
+        if self.waveform is not None:
+            self.compute_bar_heights()
         
     def get_current_file(self):
         return self.parent().parent().current_file
@@ -223,50 +317,45 @@ class WaveformWidget(QWidget):
         if self.waveform is not None:
             try:
                 position = max(0, min(1, position))
-                seek_time = position * self.duration
-                
-                # Mettre à jour la position dans MacAmp
-                main_window = self.parent().parent()
-                main_window.current_position = seek_time
-                
-                # Si en lecture, redémarrer à la nouvelle position immédiatement
-                if main_window.is_playing:
-                    # Arrêter le stream actuel
-                    if main_window.audio_player.stream:
-                        main_window.audio_player.stream.stop()
-                        main_window.audio_player.stream.close()
-                    
-                    # Démarrer la nouvelle lecture immédiatement
-                    main_window.audio_player.play(start_pos=seek_time)
-                
-                self.current_position = position
-                self.update()
-                
+                self.parent().parent().seek(position * self.duration)
             except Exception as e:
                 print(f"Erreur lors du déplacement: {e}")
         else:
             print("Impossible de se déplacer: pas de waveform")
         
     def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.RightButton:
+            return  # Menu de boucle (contextMenuEvent)
         if self.waveform is not None:
-            x = event.position().x()
-            width = self.width()
-            position = max(0, min(1, x / width))
             self.is_dragging = True
-            self.seek_to_position(position)
+            self.seek_to_position(self.position_at(event.position().x()))
             
     def mouseReleaseEvent(self, event):
         if self.is_dragging:
-            x = event.position().x()
-            width = self.width()
-            position = max(0, min(1, x / width))
-            self.seek_to_position(position)
+            self.seek_to_position(self.position_at(event.position().x()))
         self.is_dragging = False
+        
+    def contextMenuEvent(self, event):
+        if self.waveform is None:
+            return
+        seconds = self.position_at(event.pos().x()) * self.duration
+        main_window = self.parent().parent()
+        menu = QMenu(self)
+        menu.addAction(f"Début de boucle (A) à {self.format_time(seconds)}",
+                       lambda: main_window.set_loop_point(0, seconds))
+        menu.addAction(f"Fin de boucle (B) à {self.format_time(seconds)}",
+                       lambda: main_window.set_loop_point(1, seconds))
+        if self.loop_points != (None, None):
+            menu.addAction("Supprimer la boucle", main_window.clear_loop)
+        menu.exec(event.globalPos())
+        
+    def mouseDoubleClickEvent(self, event):
+        # Double-clic : revenir à la piste entière
+        if self.is_zoomed():
+            self.set_view(0, self.waveform.total)
             
     def mouseMoveEvent(self, event):
-        x = event.position().x()
-        width = self.width()
-        position = max(0, min(1, x / width))
+        position = self.position_at(event.position().x())
         hover_time = position * self.duration
         
         if self.is_dragging and event.buttons() & Qt.MouseButton.LeftButton:
@@ -277,9 +366,26 @@ class WaveformWidget(QWidget):
             self.format_time(hover_time),
             self
         )
+        
+    def wheelEvent(self, event):
+        if self.waveform is None:
+            return
+        delta = event.angleDelta()
+        scroll = delta.x() or (delta.y() if event.modifiers() & Qt.KeyboardModifier.ShiftModifier else 0)
+        if scroll:
+            # Défilement : un cran = 10 % de la vue
+            self.set_view(self.view_start - scroll / 120 * self.view_frames * 0.1, self.view_frames)
+        elif delta.y():
+            # Zoom centré sur le curseur
+            anchor = self.frame_at(event.position().x())
+            frames = self.clamp_view_frames(self.view_frames * 0.8 ** (delta.y() / 120))
+            fraction = (anchor - self.view_start) / self.view_frames
+            self.set_view(anchor - fraction * frames, frames)
+        event.accept()
             
     def paintEvent(self, event):
-        if self.waveform is None or self.bar_heights is None:
+        if self.waveform is None or (self.bar_heights is None and self.view_columns is None
+                                     and self.view_samples is None):
             return
             
         painter = QPainter(self)
@@ -287,45 +393,177 @@ class WaveformWidget(QWidget):
         
         width = self.width()
         height = self.height()
+        y_center = height // 2
+        played = QColor("#FFDD00")
+        remaining = QColor(80, 80, 80)
         
         # Fond
         painter.fillRect(0, 0, width, height, QColor(26, 26, 26))
         
-        # Nombre de barres à afficher
-        bar_width = 4
-        gap = 2
-        num_bars = width // (bar_width + gap)
-        
-        # Calculer la position de la barre de progression
-        progress_x = int(self.current_position * width)
-        
-        # Dessiner les barres avec les hauteurs précalculées
-        for i in range(num_bars):
-            if i >= len(self.bar_heights):
-                break
-                
-            x = i * (bar_width + gap)
-            bar_height = int(self.bar_heights[i] * height * 0.98)
-            y_center = height // 2
-            y_top = y_center - bar_height // 2
+        # Calculer la position de la barre de progression dans la vue
+        progress_frame = self.current_position * self.waveform.total
+        progress_x = int((progress_frame - self.view_start) / max(1, self.view_frames) * width)
+        
+        if self.bar_heights is not None:
+            # Nombre de barres à afficher
+            bar_width = 4
+            gap = 2
+            # Dessiner les barres avec les hauteurs précalculées
+            for i, level in enumerate(self.bar_heights):
+                x = i * (bar_width + gap)
+                bar_height = int(level * height * 0.98)
+                y_top = y_center - bar_height // 2
+                # Couleur selon la position
+                painter.fillRect(x, y_top, bar_width, bar_height, played if x <= progress_x else remaining)
+        elif self.view_columns is not None:
+            # Enveloppe min/max, une colonne par pixel
+            half = height * 0.49
+            columns = self.view_columns
+            scale = width / len(columns)
+            for color, rows in ((played, range(0, min(len(columns), int(progress_x / scale) + 1))),
+                                (remaining, range(max(0, int(progress_x / scale) + 1), len(columns)))):
+                painter.setPen(QPen(color, max(1.0, scale)))
+                lines = [QLineF(i * scale, y_center - columns[i, 1] * half, i * scale, y_center - columns[i, 0] * half)
+                         for i in rows]
+                painter.drawLines(lines)
+        else:
+            # Zoom maximal : tracé des échantillons
+            half = height * 0.49
+            samples = self.view_samples
+            step = width / max(1, self.view_frames)
+            path = QPainterPath()
+            for i, value in enumerate(samples):
+                point = QPointF(i * step, y_center - float(value) * half)
+                if i == 0:
+                    path.moveTo(point)
+                else:
+                    path.lineTo(point)
+            painter.setPen(QPen(played, 1.5))
+            painter.drawPath(path)
+        
+        if self.beats is not None and self.duration:
+            self.paint_beats(painter, width, height)
+        if self.loop_points != (None, None) and self.duration:
+            self.paint_loop(painter, width, height)
+        
+        if 0 <= progress_x <= width:
+            # Ligne de progression avec glow
+            glow_color = QColor("#FFDD00")
+            glow_color.setAlpha(30)
+            glow_pen = QPen(glow_color, 8)
+            painter.setPen(glow_pen)
+            painter.drawLine(progress_x, 0, progress_x, height)
             
-            # Couleur selon la position
-            if x <= progress_x:
-                painter.fillRect(x, y_top, bar_width, bar_height, QColor("#FFDD00"))
-            else:
-                painter.fillRect(x, y_top, bar_width, bar_height, QColor(80, 80, 80))
-        
-        # Ligne de progression avec glow
-        glow_color = QColor("#FFDD00")
-        glow_color.setAlpha(30)
-        glow_pen = QPen(glow_color, 8)
-        painter.setPen(glow_pen)
-        painter.drawLine(progress_x, 0, progress_x, height)
-        
-        # Ligne principale plus épaisse
-        line_color = QColor("#FFDD00")
-        painter.setPen(QPen(line_color, 4))
-        painter.drawLine(progress_x, 0, progress_x, height)
+            # Ligne principale plus épaisse
+            line_color = QColor("#FFDD00")
+            painter.setPen(QPen(line_color, 4))
+            painter.drawLine(progress_x, 0, progress_x, height)
+
+    def paint_loop(self, painter, width, height):
+        """Zone A-B en surimpression (ou le seul point A/B déjà posé)"""
+        frames_per_second = self.waveform.total / self.duration
+        xs = [None if point is None else
+              (point * frames_per_second - self.view_start) / max(1, self.view_frames) * width
+              for point in self.loop_points]
+        color = QColor("#FFDD00")
+        if None not in xs:
+            color.setAlpha(40)
+            painter.fillRect(QRectF(xs[0], 0, xs[1] - xs[0], height), color)
+        color.setAlpha(160)
+        painter.setPen(QPen(color, 1, Qt.PenStyle.DashLine))
+        painter.drawLines([QLineF(x, 0, x, height) for x in xs if x is not None])
+        
+    def paint_beats(self, painter, width, height):
+        """Repères de battement de la vue, seulement s'ils sont assez espacés pour rester lisibles"""
+        frames_per_second = self.waveform.total / self.duration
+        start = self.view_start / frames_per_second
+        end = (self.view_start + self.view_frames) / frames_per_second
+        visible = self.beats[np.searchsorted(self.beats, start):np.searchsorted(self.beats, end)]
+        if not len(visible) or len(visible) > width // 6:
+            return
+        color = QColor(255, 255, 255)
+        color.setAlpha(45)
+        painter.setPen(QPen(color, 1))
+        xs = (visible - start) / (end - start) * width
+        painter.drawLines([QLineF(x, 0, x, height) for x in xs])
+
+class ControlAtlas:
+    """Rendus pré-rastérisés des contrôles dessinés à la main, un atlas par contrôle et par taille
+
+    Chaque état (bouton coché ou non, pas de valeur d'un bouton rotatif) est dessiné
+    une seule fois, au ratio de pixels de l'écran, dans une bande de pixmaps ; le
+    paintEvent ne fait plus qu'une copie de pixels. Les atlas sont jetés au
+    changement de ratio (passage sur un écran Retina ou non) ou de thème.
+    """
+    atlases = {}  # (nom, largeur, hauteur) -> bande de `count` états
+    ratio = None
+    
+    @classmethod
+    def draw(cls, painter, widget, name, state, count, render):
+        """Copie l'état `state` (0 à count - 1) ; render(painter, state) dessine un état en coordonnées du widget"""
+        ratio = painter.device().devicePixelRatioF()
+        if ratio != cls.ratio:
+            cls.invalidate()
+            cls.ratio = ratio
+        width, height = widget.width(), widget.height()
+        key = (name, width, height)
+        atlas = cls.atlases.get(key)
+        if atlas is None:
+            atlas = cls.atlases[key] = cls.rasterize(width, height, ratio, count, render)
+        frame_width, frame_height = round(width * ratio), round(height * ratio)
+        painter.drawPixmap(QRectF(0, 0, width, height), atlas,
+                           QRectF(state * frame_width, 0, frame_width, frame_height))
+        
+    @staticmethod
+    def rasterize(width, height, ratio, count, render):
+        frame_width, frame_height = round(width * ratio), round(height * ratio)
+        atlas = QPixmap(frame_width * count, frame_height)
+        atlas.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(atlas)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        for state in range(count):
+            painter.save()
+            painter.translate(state * frame_width, 0)
+            painter.scale(ratio, ratio)
+            painter.setClipRect(QRectF(0, 0, width, height))
+            render(painter, state)
+            painter.restore()
+        painter.end()
+        return atlas
+        
+    @classmethod
+    def invalidate(cls):
+        cls.atlases.clear()
+
+def paint_icon_button(painter, svg_renderer, width, height, checked):
+    """Fond rond et icône SVG centrée, blanche ou jaune doré si le bouton est coché"""
+    # Dessiner le fond rond gris
+    painter.setPen(Qt.PenStyle.NoPen)
+    if checked:
+        painter.setBrush(QColor("#3d3d3d"))  # Plus foncé quand actif
+    else:
+        painter.setBrush(QColor("#2d2d2d"))
+    painter.drawEllipse(0, 0, width, height)
+    
+    # Calculer la taille et la position de l'icône (plus petite)
+    icon_size = min(width, height) * 0.45  # Réduit à 45% du bouton
+    target = QRectF((width - icon_size) / 2, (height - icon_size) / 2, icon_size, icon_size)
+    if not checked:
+        svg_renderer.render(painter, target)
+        return
+    # Icône recolorée en jaune doré dans une couche à la résolution de l'atlas
+    ratio = painter.device().devicePixelRatioF() * painter.transform().m11()
+    side = max(1, round(icon_size * ratio))
+    icon = QImage(side, side, QImage.Format.Format_ARGB32_Premultiplied)
+    icon.fill(Qt.GlobalColor.transparent)
+    icon_painter = QPainter(icon)
+    icon_painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    svg_renderer.render(icon_painter, QRectF(0, 0, side, side))
+    icon_painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceIn)
+    icon_painter.fillRect(icon.rect(), QColor("#FFDD00"))
+    icon_painter.end()
+    painter.drawImage(target, icon)
 
 class RotaryKnob(QWidget):
     def __init__(self, parent=None):
@@ -337,9 +575,10 @@ class RotaryKnob(QWidget):
         self.setCursor(Qt.CursorShape.PointingHandCursor)
         
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Un état par pas de valeur entier (0 à 100)
+        ControlAtlas.draw(QPainter(self), self, 'rotary', round(self.value), 101, self.paint_step)
         
+    def paint_step(self, painter, step):
         # Dessiner le fond du bouton
         painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(QColor("#2d2d2d"))
@@ -355,7 +594,7 @@ class RotaryKnob(QWidget):
         pen.setColor(QColor("#FFDD00"))  # Changé de blanc à jaune doré
         pen.setWidth(6)  # Arc plus épais, 6px
         painter.setPen(pen)
-        span = int(-270 * (self.value / 100.0) * 16)
+        span = int(-270 * (step / 100.0) * 16)
         painter.drawArc(rect, -135 * 16, span)
         
     def mousePressEvent(self, event):
@@ -407,16 +646,17 @@ class PanKnob(QWidget):
         self.parent().parent().set_pan(pan)
         
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Un état par pas de valeur entier (0 à 100)
+        ControlAtlas.draw(QPainter(self), self, 'pan', round(self.value), 101, self.paint_step)
         
+    def paint_step(self, painter, step):
         # Dessiner le fond rond gris
         painter.setPen(Qt.PenStyle.NoPen)
         painter.setBrush(QColor("#2d2d2d"))
         painter.drawEllipse(0, 0, self.width(), self.height())
         
         # Calculer l'angle
-        angle = (self.value - 50) * 1.8  # -90 à +90 degrés
+        angle = (step - 50) * 1.8  # -90 à +90 degrés
         
         # Ligne blanche
         pen = QPen(QColor("#ffffff"), 4)  # Contour blanc, épaisseur 4px
@@ -462,6 +702,8 @@ class PanKnob(QWidget):
         self.parent().parent().set_pan(pan)
 
 class ShuffleButton(QPushButton):
+    ATLAS = 'shuffle'
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setFixedSize(40, 40)
@@ -484,57 +726,18 @@ class ShuffleButton(QPushButton):
         """)
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-        
-        # Dessiner le fond rond gris
-        painter.setPen(Qt.PenStyle.NoPen)
-        if self.isChecked():
-            painter.setBrush(QColor("#3d3d3d"))  # Plus foncé quand actif
-        else:
-            painter.setBrush(QColor("#2d2d2d"))
-        painter.drawEllipse(0, 0, self.width(), self.height())
-        
-        # Calculer la taille et la position de l'icône (plus petite)
-        icon_size = min(self.width(), self.height()) * 0.45  # Réduit à 45% du bouton
-        x = (self.width() - icon_size) / 2
-        y = (self.height() - icon_size) / 2
-        
-        # Dessiner l'icône SVG
-        if self.isChecked():
-            # Créer une image temporaire pour l'icône avec une résolution plus élevée
-            scale_factor = 2  # Augmenter la résolution
-            temp_image = QImage(icon_size * scale_factor, icon_size * scale_factor, QImage.Format.Format_ARGB32)
-            temp_image.fill(Qt.GlobalColor.transparent)
-            temp_painter = QPainter(temp_image)
-            temp_painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-            temp_painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-            self.svg_renderer.render(temp_painter, QRectF(0, 0, icon_size * scale_factor, icon_size * scale_factor))
-            temp_painter.end()
-            
-            # Convertir l'image en jaune doré
-            for i in range(temp_image.width()):
-                for j in range(temp_image.height()):
-                    color = temp_image.pixelColor(i, j)
-                    if color.alpha() > 0:  # Si le pixel n'est pas transparent
-                        temp_image.setPixelColor(i, j, QColor("#FFDD00"))
-            
-            # Dessiner l'image modifiée avec lissage
-            painter.drawImage(QRectF(x, y, icon_size, icon_size), temp_image)
-        else:
-            # Dessiner l'icône en blanc avec lissage
-            painter.setPen(QPen(QColor("#FFFFFF")))
-            painter.setBrush(QColor("#FFFFFF"))
-            self.svg_renderer.render(painter, QRectF(x, y, icon_size, icon_size))
+        ControlAtlas.draw(QPainter(self), self, self.ATLAS, int(self.isChecked()), 2, self.paint_state)
         
-        painter.end()
+    def paint_state(self, painter, checked):
+        paint_icon_button(painter, self.svg_renderer, self.width(), self.height(), checked)
 
     def setActive(self, active):
         self.setChecked(active)  # Mettre à jour l'état coché
         self.update()  # Forcer le redessinage
 
 class RepeatButton(QPushButton):
+    ATLAS = 'repeat'
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setFixedSize(40, 40)
@@ -557,202 +760,237 @@ class RepeatButton(QPushButton):
         """)
 
     def paintEvent(self, event):
-        painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-        
-        # Dessiner le fond rond gris
-        painter.setPen(Qt.PenStyle.NoPen)
-        if self.isChecked():
-            painter.setBrush(QColor("#3d3d3d"))  # Plus foncé quand actif
-        else:
-            painter.setBrush(QColor("#2d2d2d"))
-        painter.drawEllipse(0, 0, self.width(), self.height())
+        ControlAtlas.draw(QPainter(self), self, self.ATLAS, int(self.isChecked()), 2, self.paint_state)
         
-        # Calculer la taille et la position de l'icône (plus petite)
-        icon_size = min(self.width(), self.height()) * 0.45  # Réduit à 45% du bouton
-        x = (self.width() - icon_size) / 2
-        y = (self.height() - icon_size) / 2
-        
-        # Dessiner l'icône SVG
-        if self.isChecked():
-            # Créer une image temporaire pour l'icône avec une résolution plus élevée
-            scale_factor = 2  # Augmenter la résolution
-            temp_image = QImage(icon_size * scale_factor, icon_size * scale_factor, QImage.Format.Format_ARGB32)
-            temp_image.fill(Qt.GlobalColor.transparent)
-            temp_painter = QPainter(temp_image)
-            temp_painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-            temp_painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-            self.svg_renderer.render(temp_painter, QRectF(0, 0, icon_size * scale_factor, icon_size * scale_factor))
-            temp_painter.end()
-            
-            # Convertir l'image en jaune doré
-            for i in range(temp_image.width()):
-                for j in range(temp_image.height()):
-                    color = temp_image.pixelColor(i, j)
-                    if color.alpha() > 0:  # Si le pixel n'est pas transparent
-                        temp_image.setPixelColor(i, j, QColor("#FFDD00"))
-            
-            # Dessiner l'image modifiée avec lissage
-            painter.drawImage(QRectF(x, y, icon_size, icon_size), temp_image)
-        else:
-            # Dessiner l'icône en blanc avec lissage
-            painter.setPen(QPen(QColor("#FFFFFF")))
-            painter.setBrush(QColor("#FFFFFF"))
-            self.svg_renderer.render(painter, QRectF(x, y, icon_size, icon_size))
-        
-        painter.end()
+    def paint_state(self, painter, checked):
+        paint_icon_button(painter, self.svg_renderer, self.width(), self.height(), checked)
 
     def setActive(self, active):
         self.setChecked(active)  # Mettre à jour l'état coché
         self.update()  # Forcer le redessinage
 
-class AudioPlayer:
-    def __init__(self):
-        self.audio_data = None
-        self.sample_rate = None
-        self.is_playing = False
-        self.current_frame = 0
-        self.stream = None
-        self.volume = 1.0
-        self.pan = 0.0
-        self.repeat_enabled = False
-        self.buffer_size = 512
-        self.channels = 2
-        self.preload_buffer = None
-        self.audio_cache = {}
-        self.auto_play_next = True  # Activer la lecture automatique par défaut
-        
-    def load_file(self, file_path):
-        try:
-            # Vérifier si le fichier est déjà en cache
-            if file_path in self.audio_cache:
-                self.audio_data, self.sample_rate = self.audio_cache[file_path]
-                self.current_frame = 0
-                return True
-                
-            # Charger le fichier audio avec librosa de manière ultra optimisée
-            audio_data, sample_rate = librosa.load(file_path, sr=None, mono=False, res_type='kaiser_fast')
-            
-            # Convertir en stéréo si mono
-            if len(audio_data.shape) == 1:
-                audio_data = np.vstack((audio_data, audio_data))
-            
-            # Mettre en cache
-            self.audio_cache[file_path] = (audio_data, sample_rate)
-            
-            self.audio_data = audio_data
-            self.sample_rate = sample_rate
-            self.current_frame = 0
-            
-            # Précharger un petit buffer pour une meilleure réactivité
-            self.preload_buffer = audio_data[:, :self.buffer_size]
-            
-            return True
-        except Exception as e:
-            print(f"Erreur chargement audio: {e}")
-            return False
-            
-    def audio_callback(self, outdata, frames, time, status):
-        if self.audio_data is None:
-            outdata.fill(0)
+class SpectrumWidget(QWidget):
+    """Analyseur de spectre et VU-mètres alimentés par le tampon circulaire du thread audio"""
+    def __init__(self, audio_player, parent=None):
+        super().__init__(parent)
+        self.audio_player = audio_player
+        self.fft_size = 2048
+        self.num_bands = 48
+        self.ring = RingBuffer(8192, audio_player.channels)
+        audio_player.analyzer_tap = self.ring
+        # Buffers et tables précalculés : rien n'est alloué à chaque image hors FFT
+        self.frames = np.zeros((self.fft_size, audio_player.channels), dtype=np.float32)
+        self.window = np.hanning(self.fft_size).astype(np.float32)
+        self.window_gain = float(self.window.sum())
+        self.band_starts = None
+        self.bin_map_key = None
+        self.levels = np.zeros(self.num_bands, dtype=np.float32)
+        self.vu_levels = np.zeros(audio_player.channels, dtype=np.float32)
+        self.last_write_pos = -1
+        # Cadence adaptative : on ralentit si l'interface n'arrive plus à suivre
+        self.target_interval = 33  # ~30 images/s
+        self.max_interval = 200
+        self.interval = self.target_interval
+        self.last_tick = None
+        self.healthy_ticks = 0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(self.interval)
+        
+    def update_bin_map(self, sample_rate):
+        """Précalcule les indices de début des bandes logarithmiques dans le spectre"""
+        key = (sample_rate, self.num_bands)
+        if key == self.bin_map_key:
             return
-            
-        if self.current_frame + frames > self.audio_data.shape[1]:
-            # Fin du fichier
-            remaining = self.audio_data.shape[1] - self.current_frame
-            if remaining > 0:
-                outdata[:remaining] = self.apply_pan_and_volume(self.audio_data[:, self.current_frame:self.current_frame + remaining].T)
-                outdata[remaining:] = 0
-                
-                # Si repeat est activé, recommencer la piste
-                if self.repeat_enabled:
-                    self.current_frame = 0
-                    if remaining < frames:
-                        outdata[remaining:] = self.apply_pan_and_volume(self.preload_buffer[:, :frames-remaining].T)
-                    if hasattr(self, 'parent') and hasattr(self.parent, 'waveform_widget'):
-                        self.parent.waveform_widget.set_position(0)
-                else:
-                    self.stream.stop()
-                    self.is_playing = False
-                    # Passer à la piste suivante si auto_play_next est activé
-                    if self.auto_play_next and hasattr(self, 'parent'):
-                        self.parent.next_track()
-        else:
-            # Lecture normale
-            chunk = self.audio_data[:, self.current_frame:self.current_frame + frames].T
-            outdata[:] = self.apply_pan_and_volume(chunk)
-            self.current_frame += frames
-            
-    def apply_pan_and_volume(self, audio_chunk):
-        # Appliquer le volume et le pan de manière ultra optimisée
-        audio_chunk = audio_chunk * self.volume
-        
-        if self.pan != 0:
-            if self.pan < 0:  # Pan vers la gauche
-                audio_chunk[:, 1] *= (1 + self.pan)
-            else:  # Pan vers la droite
-                audio_chunk[:, 0] *= (1 - self.pan)
-                
-        return audio_chunk
-            
-    def play(self, start_pos=0):
-        if self.audio_data is None:
+        num_bins = self.fft_size // 2 + 1
+        edges = np.geomspace(30.0, min(16000.0, sample_rate / 2), self.num_bands + 1)
+        starts = np.floor(edges[:-1] * self.fft_size / sample_rate).astype(np.intp)
+        self.band_starts = np.clip(np.maximum.accumulate(starts), 1, num_bins - 1)
+        self.bin_map_key = key
+        
+    def tick(self):
+        now = time.perf_counter()
+        if self.last_tick is not None:
+            lateness = (now - self.last_tick) * 1000 - self.interval
+            self.adapt_rate(lateness)
+        self.last_tick = now
+        
+        pos = self.ring.write_pos
+        if pos == self.last_write_pos:
+            # Plus de son : laisser retomber les barres puis s'arrêter de redessiner
+            if self.levels.any() or self.vu_levels.any():
+                self.levels *= 0.7
+                self.vu_levels *= 0.7
+                self.levels[self.levels < 1e-3] = 0
+                self.vu_levels[self.vu_levels < 1e-3] = 0
+                self.update()
             return
-            
-        self.current_frame = int(start_pos * self.sample_rate)
-        
-        try:
-            # Arrêter le stream existant s'il y en a un
-            if self.stream:
-                self.stream.stop()
-                self.stream.close()
-            
-            self.stream = sd.OutputStream(
-                channels=self.channels,
-                samplerate=self.sample_rate,
-                callback=self.audio_callback,
-                blocksize=self.buffer_size,
-                latency='low',  # Réduire la latence
-                dtype=np.float32  # Utiliser float32 pour de meilleures performances
-            )
-            self.stream.start()
-            self.is_playing = True
-        except Exception as e:
-            print(f"Erreur lecture: {e}")
-            
-    def pause(self):
-        if self.stream:
-            self.stream.stop()
-            self.is_playing = False
-            
-    def stop(self):
-        if self.stream:
-            self.stream.stop()
-            self.is_playing = False
-            self.current_frame = 0
-            
-    def set_volume(self, volume):
-        self.volume = volume
-        
-    def set_pan(self, pan):
-        self.pan = pan
+        self.last_write_pos = self.ring.read_latest(self.frames)
+        self.update_bin_map(self.audio_player.sample_rate or 44100)
+        
+        mono = self.frames.mean(axis=1)
+        spectrum = np.abs(np.fft.rfft(mono * self.window)) * (2.0 / self.window_gain)
+        bands = np.maximum.reduceat(spectrum, self.band_starts)
+        with np.errstate(divide='ignore'):
+            db = 20 * np.log10(bands)
+        new_levels = np.clip((db + 72) / 72, 0, 1)
+        # Montée immédiate, descente amortie
+        np.maximum(new_levels, self.levels * 0.85, out=self.levels)
+        
+        recent = self.frames[-self.audio_player.buffer_size:]
+        peak = np.abs(recent).max(axis=0)
+        with np.errstate(divide='ignore'):
+            vu_db = 20 * np.log10(peak)
+        np.maximum(np.clip((vu_db + 60) / 60, 0, 1), self.vu_levels * 0.9, out=self.vu_levels)
+        self.update()
         
-    def get_position(self):
-        if self.audio_data is None:
-            return 0
-        return self.current_frame / self.sample_rate
+    def adapt_rate(self, lateness):
+        if lateness > self.interval * 0.5:
+            # Interface occupée : réduire la cadence
+            self.interval = min(self.max_interval, int(self.interval * 1.5))
+            self.healthy_ticks = 0
+            self.timer.setInterval(self.interval)
+        elif self.interval > self.target_interval:
+            self.healthy_ticks += 1
+            if self.healthy_ticks >= 30:
+                self.interval = max(self.target_interval, int(self.interval * 0.8))
+                self.healthy_ticks = 0
+                self.timer.setInterval(self.interval)
         
-    def get_duration(self):
-        if self.audio_data is None:
-            return 0
-        return self.audio_data.shape[1] / self.sample_rate
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        width = self.width()
+        height = self.height()
+        painter.fillRect(0, 0, width, height, QColor(26, 26, 26))
         
-    def clear_cache(self):
-        """Nettoie le cache audio"""
-        self.audio_cache.clear()
+        vu_width = 6
+        spectrum_width = width - 2 * (vu_width + 2) - 4
+        bar_step = spectrum_width / self.num_bands
+        bar_width = max(1, int(bar_step) - 1)
+        color = QColor("#FFDD00")
+        for i, level in enumerate(self.levels):
+            bar_height = int(level * height)
+            if bar_height:
+                painter.fillRect(int(i * bar_step), height - bar_height, bar_width, bar_height, color)
+                
+        x = width - 2 * (vu_width + 2)
+        for level in self.vu_levels:
+            painter.fillRect(x, 0, vu_width, height, QColor(45, 45, 45))
+            bar_height = int(level * height)
+            painter.fillRect(x, height - bar_height, vu_width, bar_height, color)
+            x += vu_width + 2
+
+class MetricsOverlay(QLabel):
+    """Surcouche de diagnostic du moteur audio (Ctrl+I)"""
+    def __init__(self, metrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setFont(QFont("Menlo", 10))
+        self.setStyleSheet("""
+            QLabel {
+                background-color: rgba(0, 0, 0, 190);
+                color: #FFDD00;
+                border-radius: 6px;
+                padding: 6px;
+            }
+        """)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+        
+    def toggle(self):
+        if self.isVisible():
+            self.timer.stop()
+            self.hide()
+        else:
+            self.refresh()
+            self.show()
+            self.raise_()
+            self.timer.start(500)
+            
+    def refresh(self):
+        snapshot = self.metrics.snapshot()
+        callbacks = snapshot['callbacks']
+        lines = [
+            f"callbacks  {callbacks['count']}",
+            f"p50/p99    {callbacks['p50_us']:g} / {callbacks['p99_us']:g} µs",
+            f"max        {callbacks['max_us']:g} µs ({callbacks['max_load'] * 100:.1f} %)",
+            f"underruns  {snapshot['underflows']}   overflows {snapshot['overflows']}",
+        ]
+        stream = snapshot['stream']
+        if stream:
+            latency = stream['latency']
+            latency = f"{latency * 1000:.1f} ms" if isinstance(latency, float) else latency
+            lines.append(f"bloc       {stream['blocksize']}   latence {latency}")
+            lines.append(f"sortie     {stream['device']}")
+        recording = snapshot['recording']
+        if recording:
+            lines.append(f"enreg.     {recording['seconds']:.0f} s   perdus {recording['dropped_blocks']}")
+        if snapshot['tracks']:
+            track = snapshot['tracks'][-1]
+            decode = "cache" if track['cache_hit'] else f"{track['decode_ms']} ms"
+            lines.append(f"décodage   {decode}")
+            lines.append(f"1er son    {track['first_sound_ms']} ms")
+        for name, stats in snapshot['caches'].items():
+            if stats['hit_rate'] is not None:
+                lines.append(f"cache {name:<8} {stats['hit_rate'] * 100:.0f} % ({stats['hits']}/{stats['hits'] + stats['misses']})")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.move(8, 8)
+
+class EqualizerWindow(QWidget):
+    """Fenêtre de réglage de l'égaliseur paramétrique"""
+    def __init__(self, equalizer, parent=None):
+        super().__init__(parent, Qt.WindowType.Tool)
+        self.equalizer = equalizer
+        self.setWindowTitle("Égaliseur")
+        self.setStyleSheet("""
+            QWidget {
+                background-color: #111111;
+                color: #ffffff;
+            }
+            QSlider::groove:vertical {
+                background: #2d2d2d;
+                width: 6px;
+                border-radius: 3px;
+            }
+            QSlider::handle:vertical {
+                background: #FFDD00;
+                height: 12px;
+                margin: 0px -4px;
+                border-radius: 6px;
+            }
+        """)
+        layout = QHBoxLayout(self)
+        layout.setSpacing(12)
+        layout.setContentsMargins(12, 12, 12, 12)
+        for index, band in enumerate(equalizer.bands):
+            column = QVBoxLayout()
+            slider = QSlider(Qt.Orientation.Vertical)
+            slider.setRange(-120, 120)  # Dixièmes de dB
+            slider.setValue(int(band['gain_db'] * 10))
+            slider.setFixedHeight(120)
+            slider.valueChanged.connect(lambda value, i=index: self.equalizer.set_band(i, gain_db=value / 10))
+            freq = band['freq']
+            label = QLabel(f"{freq / 1000:g}k" if freq >= 1000 else f"{freq:g}")
+            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            column.addWidget(slider, alignment=Qt.AlignmentFlag.AlignHCenter)
+            column.addWidget(label)
+            layout.addLayout(column)
 
 class MacAmp(QMainWindow):
+    # Émis depuis le thread audio, traité dans le thread de l'interface
+    track_changed = pyqtSignal(str)
+    track_looped = pyqtSignal()
+    playback_finished = pyqtSignal()
+    metadata_ready = pyqtSignal(object, object)
+    cover_ready = pyqtSignal(int, object)
+    waveform_ready = pyqtSignal(int, object)
+    beats_ready = pyqtSignal(str, object)
+    remote_command = pyqtSignal(object)
+    export_finished = pyqtSignal(str, object)
+    
     def __init__(self):
         super().__init__()
         
@@ -783,6 +1021,41 @@ class MacAmp(QMainWindow):
         
         # Initialiser le lecteur audio
         self.audio_player = AudioPlayer()
+        self.audio_player.on_track_changed = self.track_changed.emit
+        self.audio_player.on_track_looped = self.track_looped.emit
+        self.audio_player.on_playback_finished = self.playback_finished.emit
+        self.track_changed.connect(self.on_track_changed)
+        self.track_looped.connect(self.on_track_looped)
+        self.playback_finished.connect(self.on_playback_finished)
+        self.metadata_ready.connect(self.on_metadata_ready)
+        self.cover_ready.connect(self.on_cover_ready)
+        self.waveform_ready.connect(self.on_waveform_ready)
+        self.beats_ready.connect(self.on_beats_ready)
+        self.remote_command.connect(self.execute_remote_command)
+        self.export_finished.connect(self.on_export_finished)
+        self.export_running = False
+        self.queued_index = None
+        # Analyse de sonie en arrière-plan pendant le scan de la bibliothèque
+        self.loudness_cache = PersistentCache('loudness.json')
+        self.analysis_pool = None
+        self.loudness_pool = None
+        self.loudness_queue = None
+        # Tempo et battements : file prioritaire (piste courante, suivante) et cache persistant
+        self.beat_cache = PersistentCache('beats.json')
+        self.beat_pool = None
+        self.beat_queue = None
+        self.playlist_items = {}  # Chemin -> lignes de la playlist
+        # Chaque piste ajoutée reçoit un numéro d'entrée stable ; row_entries donne
+        # l'entrée affichée à chaque position (la playlist peut être triée)
+        self.row_entries = np.zeros(0, dtype=np.int64)
+        self.search_index = SearchIndex()  # Indexé par entrée
+        self.sort_keys = SortKeys()  # Idem
+        self.sort_column = None
+        self.sort_descending = False
+        self.row_visible = np.ones(0, dtype=bool)
+        self.equalizer_window = None
+        self.cover_generation = 0
+        self.waveform_generation = 0
         
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -797,11 +1070,37 @@ class MacAmp(QMainWindow):
         self.cover_wave_layout = QHBoxLayout()
         self.cover_wave_layout.setSpacing(0)
         self.cover_wave_layout.setContentsMargins(0, 0, 0, 0)
+        # Pochette à gauche de la waveform, masquée tant qu'aucune image n'est chargée
+        self.cover_label = QLabel()
+        self.cover_label.setFixedSize(180, 180)
+        self.cover_label.setScaledContents(True)
+        self.cover_label.setStyleSheet("background-color: #1a1a1a;")
+        self.cover_label.hide()
+        self.cover_wave_layout.addWidget(self.cover_label)
         self.waveform_widget = WaveformWidget()
         self.waveform_widget.setFixedHeight(180)
         self.waveform_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         self.cover_wave_layout.addWidget(self.waveform_widget)
         layout.addLayout(self.cover_wave_layout)
+        # Diagnostic du moteur : surcouche (Ctrl+I) et export JSON (Ctrl+Shift+I)
+        self.metrics_overlay = MetricsOverlay(self.audio_player.metrics, central_widget)
+        QShortcut(QKeySequence("Ctrl+I"), self, activated=self.metrics_overlay.toggle)
+        QShortcut(QKeySequence("Ctrl+Shift+I"), self, activated=self.dump_metrics)
+        # Boucle A-B à la position de lecture : [ pour A, ] pour B, \ pour la supprimer
+        QShortcut(QKeySequence("["), self, activated=lambda: self.set_loop_point_here(0))
+        QShortcut(QKeySequence("]"), self, activated=lambda: self.set_loop_point_here(1))
+        QShortcut(QKeySequence("\\"), self, activated=self.clear_loop)
+        self.metrics_file = os.environ.get('MACAMP_METRICS_FILE')
+        if self.metrics_file:
+            # Export périodique pour la surveillance en production
+            self.metrics_timer = QTimer(self)
+            self.metrics_timer.timeout.connect(lambda: self.dump_metrics(self.metrics_file))
+            self.metrics_timer.start(10000)
+        # Analyseur de spectre temps réel sous la waveform
+        self.spectrum_widget = SpectrumWidget(self.audio_player)
+        self.spectrum_widget.setFixedHeight(48)
+        self.spectrum_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        layout.addWidget(self.spectrum_widget)
         # Contrôles de lecture
         playback_layout = QHBoxLayout()
         playback_layout.setSpacing(5)
@@ -893,17 +1192,45 @@ class MacAmp(QMainWindow):
         self.prev_button.clicked.connect(self.previous_track)
         self.next_button.clicked.connect(self.next_track)
         self.repeat_button.clicked.connect(self.toggle_repeat)
+        self.next_button.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.next_button.customContextMenuRequested.connect(self.show_crossfade_menu)
+        self.volume_knob.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.volume_knob.customContextMenuRequested.connect(self.show_volume_menu)
         
         self.shuffle_enabled = False
         self.shuffle_order = []
         self.shuffle_pos = 0
+        self.repeat_enabled = False
         
         layout.addLayout(playback_layout)
         
+        # --- Filtre instantané de la playlist (Ctrl+F, Échap pour effacer) ---
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Rechercher…")
+        self.search_field.setClearButtonEnabled(True)
+        self.search_field.setStyleSheet("""
+            QLineEdit {
+                font-size: 12px;
+                padding: 3px 6px;
+                background-color: #2d2d2d;
+                color: #ffffff;
+                border: none;
+                border-radius: 4px;
+            }
+        """)
+        self.search_field.textChanged.connect(self.apply_filter)
+        QShortcut(QKeySequence("Ctrl+F"), self, activated=self.focus_search)
+        QShortcut(QKeySequence("Escape"), self.search_field, activated=self.search_field.clear,
+                  context=Qt.ShortcutContext.WidgetShortcut)
+        layout.addWidget(self.search_field)
+        
         # --- Playlist dans un container pour masquer/afficher sans changer la taille de la fenêtre ---
         self.playlist_container = QStackedWidget()
         self.playlist_widget = PlaylistWidget(self)
         self.playlist_widget.itemDoubleClicked.connect(self.play_selected_track)
+        self.playlist_widget.header().sectionClicked.connect(self.sort_playlist)
+        self.playlist_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.playlist_widget.customContextMenuRequested.connect(self.show_playlist_menu)
         self.playlist_widget.setStyleSheet("""
             QTreeWidget {
                 background-color: #2d2d2d;
@@ -974,6 +1301,9 @@ class MacAmp(QMainWindow):
         self.is_large = True
         taille_etendue = QSize(530, 430)
         self.resize(taille_etendue)
+        
+        self.control_server = None
+        self.start_control_server()
     
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
@@ -990,102 +1320,41 @@ class MacAmp(QMainWindow):
             
     def clean_title(self, artist, title):
         """Nettoie le titre en retirant l'artiste s'il est présent"""
-        if artist and artist.lower() in title.lower():
-            # Essayer différents formats courants
-            patterns = [
-                f"{artist} - ",
-                f"{artist}-",
-                f"[{artist}]",
-                f"({artist})",
-                f"{artist}:",
-                f"{artist}_"
-            ]
-            for pattern in patterns:
-                if pattern.lower() in title.lower():
-                    return title.replace(pattern, "").strip()
-        return title
+        return clean_title(artist, title)
 
     def get_metadata(self, file_path):
-        try:
-            # Valeurs par défaut
-            metadata = {
-                'artist': "",
-                'title': os.path.basename(file_path),
-                'duration': '00:00'
-            }
-            
-            # Extraire le nom de fichier sans extension comme fallback
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            
-            # Si le nom contient un tiret, on peut essayer d'extraire artiste et titre
-            if " - " in base_name:
-                parts = base_name.split(" - ", 1)
-                metadata['artist'] = parts[0].strip()
-                metadata['title'] = parts[1].strip()
-            
-            # Calculer la durée avec librosa (plus précis)
-            try:
-                y, sr = librosa.load(file_path, sr=None, duration=5)  # Charger juste les 5 premières secondes pour la détection
-                duration = librosa.get_duration(y=y, sr=sr)
-                if duration > 0:
-                    # Si c'est un extrait, calculer la durée totale
-                    total_duration = librosa.get_duration(filename=file_path)
-                    minutes = int(total_duration // 60)
-                    seconds = int(total_duration % 60)
-                    metadata['duration'] = f"{minutes:02d}:{seconds:02d}"
-            except Exception as e:
-                print(f"Erreur librosa: {e}, tentative avec mutagen...")
-                
-                # Si librosa échoue, essayer avec mutagen
-                audio = File(file_path)
-                if audio is not None and hasattr(audio, 'info') and hasattr(audio.info, 'length'):
-                    duration = audio.info.length
-                    minutes = int(duration // 60)
-                    seconds = int(duration % 60)
-                    metadata['duration'] = f"{minutes:02d}:{seconds:02d}"
-                
-            # Essayer de lire les métadonnées selon le format
-            audio = File(file_path)
-            if isinstance(audio, MP3):
-                try:
-                    id3 = EasyID3(file_path)
-                    metadata['artist'] = id3.get('artist', [metadata['artist']])[0]
-                    raw_title = id3.get('title', [metadata['title']])[0]
-                    metadata['title'] = self.clean_title(metadata['artist'], raw_title)
-                except:
-                    pass
-                    
-            elif file_path.lower().endswith(('.wav', '.aiff')):
-                if audio is not None and hasattr(audio, 'tags'):
-                    for tag in audio.tags:
-                        if 'artist' in tag.lower():
-                            metadata['artist'] = str(audio.tags[tag])
-                        elif 'title' in tag.lower():
-                            raw_title = str(audio.tags[tag])
-                            metadata['title'] = self.clean_title(metadata['artist'], raw_title)
-            
-            return metadata
-            
-        except Exception as e:
-            print(f"Erreur lecture métadonnées: {e}")
-            return {
-                'artist': "",
-                'title': os.path.basename(file_path),
-                'duration': '00:00'
-            }
+        return read_metadata(file_path)
             
     def add_files(self, files):
-        for file_path in files:
+        items = []
+        first_entry = len(self.row_entries)
+        for entry, file_path in enumerate(files, first_entry):
             self.playlist.append(file_path)
-            metadata = self.get_metadata(file_path)
+            # Affichage immédiat d'après le nom de fichier, les tags arrivent du pool de scan
+            metadata = metadata_from_filename(file_path)
+            self.search_index.add(entry, os.path.basename(file_path), metadata['artist'], metadata['title'])
+            self.sort_keys.set(entry, metadata)
             item = QTreeWidgetItem([
+                "",
                 metadata['artist'].strip(),  # Supprimer tous les espaces en début et fin
                 metadata['title'],
             ])
+            item.setData(0, Qt.ItemDataRole.UserRole, entry)
             self.playlist_widget.addTopLevelItem(item)
-            # Forcer l'alignement à gauche de la colonne Artiste
-            item.setTextAlignment(0, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-            item.setTextAlignment(1, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+            self.playlist_items.setdefault(file_path, []).append(item)
+            items.append(item)
+        self.row_entries = np.concatenate([self.row_entries, np.arange(first_entry, first_entry + len(files))])
+        self.row_visible = np.concatenate([self.row_visible, np.ones(len(files), dtype=bool)])
+        if self.sort_column is not None:
+            # Les nouvelles lignes sont en fin de liste : la playlist n'est plus triée
+            self.sort_column = None
+            self.playlist_widget.header().setSortIndicatorShown(False)
+        if self.search_field.text():
+            self.apply_filter(self.search_field.text())
+        # Tags d'abord : la sonie décode chaque piste en entier, dans son propre pool
+        self.scan_metadata(files, items)
+        self.analyze_loudness(files)
+        self.analyze_beats(files)
         if self.current_index == -1 and self.playlist:
             self.current_index = 0
             self.load_track(self.playlist[0])
@@ -1095,7 +1364,417 @@ class MacAmp(QMainWindow):
                 QTimer.singleShot(0, self._force_waveform_full_width)
                 QTimer.singleShot(30, self._force_waveform_full_width)
                 QTimer.singleShot(100, self._force_waveform_full_width)
+        elif self.queued_index is None:
+            # La piste courante a maintenant une suivante à enchaîner
+            self.queue_next_track()
+        self.publish_status()
+            
+    def get_analysis_pool(self):
+        """Pool de processus du scan des métadonnées"""
+        if self.analysis_pool is None:
+            self.analysis_pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+        return self.analysis_pool
+            
+    def scan_metadata(self, files, items, batch_size=64):
+        """Lit les tags par lots dans le pool ; chaque lot met à jour ses lignes à son arrivée"""
+        for start in range(0, len(files), batch_size):
+            batch = (files[start:start + batch_size], items[start:start + batch_size])
+            future = self.get_analysis_pool().submit(read_metadata_batch, batch[0])
+            future.add_done_callback(lambda f, batch=batch: self.metadata_ready.emit(batch, f))
+            
+    def on_metadata_ready(self, batch, future):
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Erreur lecture métadonnées: {e}")
+            return
+        for file_path, item, metadata in zip(*batch, results):
+            entry = item.data(0, Qt.ItemDataRole.UserRole)
+            if metadata.get('track'):
+                item.setText(0, str(metadata['track']))
+            item.setText(1, metadata['artist'].strip())
+            item.setText(2, metadata['title'])
+            if metadata.get('length'):
+                item.setText(3, metadata['duration'])
+            self.search_index.add(entry, metadata['artist'], metadata['title'])
+            self.sort_keys.set(entry, metadata)
+            if metadata.get('seek_index'):
+                self.audio_player.seek_indexes.set(file_path, metadata['seek_index'])
+        if self.search_field.text():
+            self.apply_filter(self.search_field.text())
+            
+    def sort_playlist(self, column):
+        """Trie la playlist sur une colonne (clic sur l'en-tête ; second clic : ordre inverse)"""
+        key = PlaylistWidget.SORT_COLUMNS.get(column)
+        if key is None or len(self.playlist) < 2:
+            return
+        self.sort_descending = self.sort_column == column and not self.sort_descending
+        self.sort_column = column
+        order = self.sort_keys.order(key, self.row_entries, self.sort_descending)
+        # Position d'avant -> position d'après, pour les indices gardés par l'interface
+        new_position = np.empty_like(order)
+        new_position[order] = np.arange(len(order))
+        remap = new_position.tolist()
+        self.playlist = [self.playlist[i] for i in order.tolist()]
+        self.row_entries = self.row_entries[order]
+        self.row_visible = self.row_visible[order]
+        if self.current_index >= 0:
+            self.current_index = remap[self.current_index]
+        if self.queued_index is not None:
+            self.queued_index = remap[self.queued_index]
+        self.shuffle_order = [remap[i] for i in self.shuffle_order]
+        # Réordonner les lignes existantes (sans les recréer), puis reporter le filtre
+        items = self.playlist_widget.invisibleRootItem().takeChildren()
+        self.playlist_widget.insertTopLevelItems(0, [items[i] for i in order.tolist()])
+        set_row_hidden, root = self.playlist_widget.setRowHidden, QModelIndex()
+        for row in np.flatnonzero(~self.row_visible).tolist():
+            set_row_hidden(row, root, True)
+        header = self.playlist_widget.header()
+        header.setSortIndicator(column, Qt.SortOrder.DescendingOrder if self.sort_descending
+                                else Qt.SortOrder.AscendingOrder)
+        header.setSortIndicatorShown(True)
+        # Les couleurs suivent les lignes : pas besoin de repeindre la piste active
+        if self.current_file:
+            # La piste suivante dépend de l'ordre
+            self.queue_next_track()
+            
+    def focus_search(self):
+        if not self.is_large:
+            self.toggle_playlist()
+        self.search_field.setFocus()
+        self.search_field.selectAll()
+            
+    def apply_filter(self, text):
+        """Masque les lignes hors de la recherche ; seules celles qui changent d'état sont touchées"""
+        mask = self.search_index.search(text)
+        if mask is None:
+            mask = np.ones(len(self.row_visible), dtype=bool)
+        else:
+            mask = mask[self.row_entries]
+        changed = np.flatnonzero(mask != self.row_visible)
+        if not len(changed):
+            return
+        # Gros changement (première lettre tapée) : un seul relayout au lieu d'un par ligne
+        self.playlist_widget.setUpdatesEnabled(False)
+        set_row_hidden, root = self.playlist_widget.setRowHidden, QModelIndex()
+        for row, visible in zip(changed.tolist(), mask[changed].tolist()):
+            set_row_hidden(row, root, not visible)
+        self.playlist_widget.setUpdatesEnabled(True)
+        self.row_visible = mask
+            
+    def show_playlist_menu(self, pos):
+        menu = QMenu(self)
+        action = menu.addAction("Exporter la playlist…", lambda: self.export_playlist(False))
+        action.setEnabled(bool(self.playlist) and not self.export_running)
+        if not self.row_visible.all():
+            action = menu.addAction("Exporter les pistes affichées…", lambda: self.export_playlist(True))
+            action.setEnabled(bool(self.row_visible.any()) and not self.export_running)
+        menu.exec(self.playlist_widget.viewport().mapToGlobal(pos))
+        
+    def export_playlist(self, visible_only):
+        """Mixe la playlist (ou les lignes affichées) dans un fichier, dans un thread"""
+        if visible_only:
+            files = [f for f, visible in zip(self.playlist, self.row_visible.tolist()) if visible]
+        else:
+            files = list(self.playlist)
+        path, _ = QFileDialog.getSaveFileName(self, "Exporter le mix", "mix.wav",
+                                              "Audio (*.wav *.flac)")
+        if not path or not files:
+            return
+        if not path.lower().endswith(('.wav', '.flac')):
+            path += '.wav'
+        self.export_running = True
+        
+        def worker():
+            try:
+                result = render_to_file(files, path, settings=self.audio_player)
+            except Exception as e:
+                result = e
+            self.export_finished.emit(path, result)
+            
+        threading.Thread(target=worker, daemon=True).start()
+        
+    def on_export_finished(self, path, result):
+        self.export_running = False
+        if isinstance(result, Exception):
+            print(f"Erreur export {path}: {result}")
+        else:
+            print(f"Exporté: {path} ({result} frames)")
+            
+    def get_beat_queue(self):
+        if self.beat_queue is None:
+            # Pool séparé : la piste courante n'attend pas derrière le scan de la bibliothèque
+            workers = max(1, ((os.cpu_count() or 2) - 1) // 2)
+            self.beat_pool = ProcessPoolExecutor(max_workers=workers)
+            self.beat_queue = AnalysisQueue(self.beat_pool, analyze_beats,
+                                            lambda path, f: self.beats_ready.emit(path, f), workers)
+        return self.beat_queue
+        
+    def analyze_beats(self, files, priority=10):
+        """Affiche le BPM des pistes déjà analysées et met les autres en file"""
+        for file_path in files:
+            beats = self.beat_cache.get(file_path)
+            if beats is not None:
+                self.show_bpm(file_path, beats)
+            else:
+                self.get_beat_queue().submit(file_path, priority)
+                
+    def prioritize_beats(self):
+        """Piste courante puis suivante en tête de la file d'analyse"""
+        if self.current_file:
+            beats = self.beat_cache.get(self.current_file)
+            self.waveform_widget.set_beats(beats['beats'] if beats else None)
+            self.analyze_beats([self.current_file], priority=0)
+        if self.queued_index is not None:
+            self.analyze_beats([self.playlist[self.queued_index]], priority=1)
+            
+    def show_bpm(self, file_path, beats):
+        for item in self.playlist_items.get(file_path, ()):
+            item.setText(4, f"{beats['bpm']:.0f}")
+            
+    def on_beats_ready(self, file_path, future):
+        try:
+            beats = future.result()
+        except Exception as e:
+            print(f"Erreur analyse tempo {file_path}: {e}")
+            return
+        self.beat_cache.set(file_path, beats)
+        self.show_bpm(file_path, beats)
+        if file_path == self.current_file:
+            self.waveform_widget.set_beats(beats['beats'])
+        if self.beat_queue.pending() == 0:
+            self.beat_cache.save()
+            
+    def analyze_loudness(self, files, priority=10):
+        """Applique les gains en cache et met en file l'analyse des pistes inconnues"""
+        for file_path in files:
+            loudness = self.loudness_cache.get(file_path)
+            self.audio_player.metrics.record_cache('loudness', loudness is not None)
+            if loudness is not None:
+                self.audio_player.set_track_gain(file_path, loudness_gain(loudness))
+                continue
+            self.get_loudness_queue().submit(file_path, priority)
+            
+    def get_loudness_queue(self):
+        if self.loudness_queue is None:
+            # Pool séparé et moins prioritaire : les tags de la bibliothèque ne l'attendent pas
+            workers = max(1, ((os.cpu_count() or 2) - 1) // 2)
+            self.loudness_pool = ProcessPoolExecutor(max_workers=workers, initializer=lower_priority)
+            self.loudness_queue = AnalysisQueue(self.loudness_pool, analyze_loudness,
+                                                self.on_loudness_analyzed, workers)
+        return self.loudness_queue
+        
+    def prioritize_loudness(self):
+        """Piste courante puis suivante en tête de la file d'analyse de sonie"""
+        if self.current_file:
+            self.analyze_loudness([self.current_file], priority=0)
+        if self.queued_index is not None:
+            self.analyze_loudness([self.playlist[self.queued_index]], priority=1)
+            
+    def on_loudness_analyzed(self, file_path, future):
+        # Appelé depuis le thread du pool : aucun accès aux widgets ici
+        try:
+            loudness = future.result()
+            self.loudness_cache.set(file_path, loudness)
+            self.audio_player.set_track_gain(file_path, loudness_gain(loudness))
+        except Exception as e:
+            print(f"Erreur analyse sonie {file_path}: {e}")
+        if self.loudness_queue.pending() == 0:
+            self.loudness_cache.save()
+            
+    def show_volume_menu(self, pos):
+        menu = QMenu(self)
+        action = menu.addAction("Normaliser le volume (EBU R128)")
+        action.setCheckable(True)
+        action.setChecked(self.audio_player.normalization_enabled)
+        action.triggered.connect(self.audio_player.set_normalization)
+        eq_action = menu.addAction("Égaliseur…")
+        eq_action.triggered.connect(self.show_equalizer)
+        speed_menu = menu.addMenu("Vitesse")
+        for rate in (0.5, 0.75, 1.0, 1.25, 1.5, 2.0):
+            rate_action = speed_menu.addAction(f"{rate:g}×")
+            rate_action.setCheckable(True)
+            rate_action.setChecked(self.audio_player.playback_rate == rate)
+            rate_action.triggered.connect(lambda checked, r=rate: self.audio_player.set_playback_rate(r))
+        speed_menu.addSeparator()
+        pitch_action = speed_menu.addAction("Conserver la hauteur")
+        pitch_action.setCheckable(True)
+        pitch_action.setChecked(self.audio_player.preserve_pitch)
+        pitch_action.triggered.connect(
+            lambda checked: self.audio_player.set_playback_rate(self.audio_player.playback_rate, checked))
+        record_action = menu.addAction("Enregistrer la sortie…")
+        record_action.setCheckable(True)
+        record_action.setChecked(self.audio_player.recorder is not None)
+        record_action.triggered.connect(self.toggle_recording)
+        self.add_output_menu(menu)
+        menu.exec(self.volume_knob.mapToGlobal(pos))
+        
+    def toggle_recording(self, checked):
+        if not checked:
+            recording = self.audio_player.stop_recording()
+            if recording:
+                print(f"Enregistrement: {recording['path']} ({recording['seconds']:.1f} s, "
+                      f"{recording['dropped_blocks']} blocs perdus)")
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Enregistrer la sortie", "enregistrement.wav",
+                                              "WAV (*.wav)")
+        if path:
+            if not path.lower().endswith('.wav'):
+                path += '.wav'
+            self.audio_player.start_recording(path)
+        
+    def add_output_menu(self, menu):
+        """Sous-menu de choix de la sortie audio ; le changement ne recharge pas la piste"""
+        output_menu = menu.addMenu("Sortie audio")
+        chosen = self.audio_player.output_device
+        names = [None] + list_output_devices()
+        if chosen is not None and chosen not in names:
+            names.append(chosen)  # Débranché : reste affiché pour pouvoir y revenir
+        for name in names:
+            if name is None:
+                label = "Sortie par défaut"
+            elif name == chosen and self.audio_player.device_fallback:
+                label = f"{name} (absent)"
+            else:
+                label = name
+            action = output_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(name == chosen)
+            action.triggered.connect(lambda checked, n=name: self.audio_player.set_output_device(n))
+        output_menu.addSeparator()
+        refresh_action = output_menu.addAction("Rechercher les sorties")
+        refresh_action.triggered.connect(lambda: self.audio_player.reopen_stream(refresh=True))
+            
+    def show_equalizer(self):
+        if self.equalizer_window is None:
+            self.equalizer_window = EqualizerWindow(self.audio_player.equalizer, self)
+        self.equalizer_window.show()
+        self.equalizer_window.raise_()
+            
+    def start_control_server(self):
+        """Socket de contrôle locale (voir remote_control.py)"""
+        try:
+            self.control_server = ControlServer(self.submit_remote_command)
+            self.control_server.start()
+        except (OSError, RuntimeError) as e:
+            print(f"Socket de contrôle indisponible: {e}")
+            self.control_server = None
+            
+    def submit_remote_command(self, command, timeout=10):
+        # Appelé depuis un thread du serveur : exécution dans le thread de l'interface
+        reply = queue.Queue(maxsize=1)
+        abandoned = threading.Event()
+        self.remote_command.emit((command, reply, abandoned))
+        try:
+            return reply.get(timeout=timeout)
+        except queue.Empty:
+            # L'interface est bloquée : la commande ne doit pas s'exécuter plus tard à l'insu du client
+            abandoned.set()
+            return {'ok': False, 'error': f"L'interface n'a pas répondu en {timeout} s, commande annulée"}
+        
+    def execute_remote_command(self, payload):
+        command, reply, abandoned = payload
+        if abandoned.is_set():
+            return
+        try:
+            reply.put(self.handle_remote_command(command))
+        except Exception as e:
+            reply.put({'ok': False, 'error': str(e)})
+            
+    def handle_remote_command(self, command):
+        name = command.get('cmd')
+        response = {}
+        if name == 'play':
+            if not self.is_playing:
+                self.play()
+        elif name == 'pause':
+            if self.is_playing:
+                self.toggle_play()
+        elif name == 'stop':
+            self.stop()
+        elif name == 'next':
+            self.next_track()
+        elif name == 'previous':
+            self.previous_track()
+        elif name == 'seek':
+            if not self.audio_player.get_duration():
+                return {'ok': False, 'error': "Aucune piste chargée"}
+            self.seek(float(command['position']))
+        elif name == 'loop':
+            # Sans bornes : supprimer la boucle A-B
+            if 'start' in command and 'end' in command:
+                start, end = sorted((float(command['start']), float(command['end'])))
+                if not self.audio_player.set_loop(start, end):
+                    return {'ok': False, 'error': "Boucle trop courte ou piste non chargée"}
+                self.waveform_widget.set_loop_points(start, end)
+            else:
+                self.clear_loop()
+        elif name == 'enqueue':
+            files = [path for path in command.get('paths', [])
+                     if path.lower().endswith(('.mp3', '.wav', '.ogg', '.aiff'))]
+            if files:
+                self.add_files(files)
+            if command.get('activate'):
+                # Fichiers ouverts depuis une seconde instance
+                self.showNormal()
+                self.raise_()
+                self.activateWindow()
+            response['added'] = len(files)
+        elif name != 'status':
+            return {'ok': False, 'error': f"Commande inconnue: {name}"}
+        response.update(self.remote_status())
+        return response
+        
+    def remote_status(self):
+        return {
+            'mode': 'gui',
+            'state': 'playing' if self.is_playing else 'paused' if self.current_file else 'stopped',
+            'file': self.current_file,
+            'index': self.current_index,
+            'position': self.audio_player.get_position(),
+            'duration': self.audio_player.get_duration(),
+            'playlist_length': len(self.playlist),
+            'timestamp': time.time(),
+        }
+        
+    def publish_status(self):
+        """Pousse l'état courant aux clients abonnés"""
+        if self.control_server is not None:
+            self.control_server.publish(dict(self.remote_status(), event='status'))
+            
+    def dump_metrics(self, path=None):
+        if path is None:
+            path = os.path.join(get_cache_dir(), time.strftime("metrics-%Y%m%d-%H%M%S.json"))
+        try:
+            self.audio_player.metrics.dump(path)
+            print(f"Métriques écrites dans {path}")
+        except Exception as e:
+            print(f"Erreur export métriques: {e}")
             
+    def changeEvent(self, event):
+        if event.type() in (QEvent.Type.PaletteChange, QEvent.Type.ApplicationPaletteChange,
+                            QEvent.Type.StyleChange, QEvent.Type.DevicePixelRatioChange):
+            # Thème clair / sombre ou écran : les atlas des contrôles sont redessinés au prochain affichage
+            ControlAtlas.invalidate()
+            self.update()
+        super().changeEvent(event)
+        
+    def closeEvent(self, event):
+        if self.control_server is not None:
+            self.control_server.stop()
+        if self.metrics_file:
+            self.dump_metrics(self.metrics_file)
+        self.loudness_cache.save()
+        self.beat_cache.save()
+        if self.beat_pool is not None:
+            self.beat_pool.shutdown(wait=False, cancel_futures=True)
+        if self.analysis_pool is not None:
+            self.analysis_pool.shutdown(wait=False, cancel_futures=True)
+        if self.loudness_pool is not None:
+            self.loudness_pool.shutdown(wait=False, cancel_futures=True)
+        self.audio_player.shutdown()
+        super().closeEvent(event)
+
     def browse_files(self):
         file_names, _ = QFileDialog.getOpenFileNames(
             self,
@@ -1110,12 +1789,9 @@ class MacAmp(QMainWindow):
     def update_active_track(self):
         for i in range(self.playlist_widget.topLevelItemCount()):
             item = self.playlist_widget.topLevelItem(i)
-            if i == self.current_index:
-                item.setForeground(0, QColor("#FFDD00"))
-                item.setForeground(1, QColor("#FFDD00"))
-            else:
-                item.setForeground(0, QColor("#FFFFFF"))
-                item.setForeground(1, QColor("#FFFFFF"))
+            color = QColor("#FFDD00") if i == self.current_index else QColor("#FFFFFF")
+            for col in range(self.playlist_widget.columnCount()):
+                item.setForeground(col, color)
 
     def play_selected_track(self, item):
         index = self.playlist_widget.indexOfTopLevelItem(item)
@@ -1206,11 +1882,26 @@ class MacAmp(QMainWindow):
                 self.is_playing = True
                 self.play_button.setText("⏸")
                 print(f"Lecture démarrée à {position} secondes")
+                self.publish_status()
         except Exception as e:
             print(f"Erreur lecture position: {e}")
             
     def play(self):
         self.play_from_position(self.current_position)
+        
+    def seek(self, seconds):
+        """Déplace la lecture (secondes), sans dépendre de la waveform ; reprise immédiate en lecture"""
+        duration = self.audio_player.get_duration()
+        seconds = max(0.0, min(seconds, duration))
+        self.current_position = seconds
+        if self.is_playing:
+            # Redémarrer le stream à la nouvelle position
+            self.audio_player.close_stream()
+            self.audio_player.play(start_pos=seconds)
+        else:
+            self.audio_player.current_frame = int(seconds * self.audio_player.sample_rate)
+        self.waveform_widget.current_position = seconds / duration if duration else 0
+        self.waveform_widget.update()
 
     def toggle_play(self):
         try:
@@ -1220,6 +1911,7 @@ class MacAmp(QMainWindow):
                 self.audio_player.pause()
                 self.play_button.setText("▶")
                 self.is_playing = False
+                self.publish_status()
         except Exception as e:
             print(f"Erreur toggle: {e}")
             
@@ -1230,6 +1922,7 @@ class MacAmp(QMainWindow):
             self.is_playing = False
             self.current_position = 0
             self.waveform_widget.set_position(0)
+            self.publish_status()
         except Exception as e:
             print(f"Erreur stop: {e}")
             
@@ -1249,23 +1942,20 @@ class MacAmp(QMainWindow):
         try:
             print(f"Chargement de la piste: {file_name}")
             self.current_file = file_name
+            self.waveform_widget.set_loop_points(None, None)  # Le lecteur oublie la boucle au chargement
             self.update_active_track()
-            
-            # Charger la waveform de manière optimisée
-            y, sr = librosa.load(file_name, sr=None, duration=None, mono=True)  # Charger en mono pour la waveform
-            duration = len(y) / sr
-            # Réduire la résolution de la waveform pour de meilleures performances
-            self.waveform = librosa.resample(y, orig_sr=sr, target_sr=1000)  # Réduit à 1000Hz au lieu de 2000Hz
-            print(f"Waveform chargée, durée: {duration} secondes")
-            self.waveform_widget.set_waveform(self.waveform, duration)
+            self.load_cover(file_name)
             
             # Charger l'audio avec le nouveau lecteur de manière asynchrone
             if self.audio_player.load_file(file_name):
+                # Après le chargement : la waveform réutilise la source décodée en cache
+                self.load_waveform(file_name)
                 # Appliquer les réglages actuels
                 self.audio_player.set_volume(self.volume_knob.value / 100)
                 pan = (self.pan_knob.value - 50) / 50.0
                 self.audio_player.set_pan(pan)
                 print("Audio chargé et volume réglé")
+                self.queue_next_track()
             
             # Mettre à jour les boutons
             self.play_button.setEnabled(True)
@@ -1283,6 +1973,129 @@ class MacAmp(QMainWindow):
         except Exception as e:
             print(f"Erreur chargement: {e}")
 
+    def load_cover(self, file_name):
+        """Extraction et miniature de la pochette dans un thread, sans bloquer le chargement"""
+        self.cover_generation += 1
+        generation = self.cover_generation
+        size = self.cover_label.width() * 2  # Résolution Retina
+        
+        def worker():
+            try:
+                path = load_cover(file_name, size=size)
+            except Exception as e:
+                print(f"Erreur pochette: {e}")
+                path = None
+            self.cover_ready.emit(generation, path)
+            
+        threading.Thread(target=worker, daemon=True).start()
+        
+    def on_cover_ready(self, generation, path):
+        if generation != self.cover_generation:
+            return  # Pochette d'une piste déjà quittée
+        pixmap = QPixmap(path) if path else QPixmap()
+        if pixmap.isNull():
+            self._force_waveform_full_width()
+            return
+        self.cover_label.setPixmap(pixmap)
+        self.cover_label.show()
+        
+    def _force_waveform_full_width(self):
+        """Sans pochette, la waveform reprend toute la largeur"""
+        self.cover_label.hide()
+        self.cover_label.clear()
+        self.cover_wave_layout.invalidate()
+        self.waveform_widget.updateGeometry()
+
+    def load_waveform(self, file_name):
+        """Enveloppes multi-résolution calculées dans un thread, affichées dès qu'elles sont prêtes"""
+        self.waveform_generation += 1
+        generation = self.waveform_generation
+        self.waveform_widget.clear_waveform()
+        
+        def worker():
+            try:
+                source, sample_rate, scale = self.audio_player.open_waveform_source(file_name)
+                pyramid = WaveformPyramid(source, sample_rate, scale).build()
+            except Exception as e:
+                print(f"Erreur waveform: {e}")
+                return
+            self.waveform_ready.emit(generation, pyramid)
+            
+        threading.Thread(target=worker, daemon=True).start()
+        
+    def on_waveform_ready(self, generation, pyramid):
+        if generation != self.waveform_generation:
+            return  # Waveform d'une piste déjà quittée
+        self.waveform = pyramid
+        duration = pyramid.total / pyramid.sample_rate
+        print(f"Waveform chargée, durée: {duration} secondes")
+        self.waveform_widget.set_waveform(pyramid, duration)
+
+    def peek_next_index(self):
+        """Indice de la piste qui suivra la piste courante, sans changer d'état"""
+        if not self.playlist:
+            return None
+        if self.shuffle_enabled and len(self.playlist) > 1 and self.shuffle_order:
+            if self.shuffle_pos < len(self.shuffle_order) - 1:
+                return self.shuffle_order[self.shuffle_pos + 1]
+            return self.shuffle_order[0] if self.repeat_enabled else None
+        if self.current_index < len(self.playlist) - 1:
+            return self.current_index + 1
+        return 0 if self.repeat_enabled else None
+
+    def queue_next_track(self):
+        """Précharge la piste suivante dans le lecteur pour l'enchaînement / le fondu"""
+        self.queued_index = self.peek_next_index()
+        if self.queued_index is None:
+            self.audio_player.clear_next()
+        else:
+            self.audio_player.queue_next(self.playlist[self.queued_index])
+        self.prioritize_beats()
+        self.prioritize_loudness()
+
+    def on_track_changed(self, file_name):
+        """Le lecteur a enchaîné sur la piste préchargée : mettre l'interface à jour"""
+        try:
+            if self.queued_index is not None and self.playlist[self.queued_index] == file_name:
+                index = self.queued_index
+            else:
+                index = self.playlist.index(file_name)
+            self.current_index = index
+            if self.shuffle_enabled and index in self.shuffle_order:
+                self.shuffle_pos = self.shuffle_order.index(index)
+            self.current_file = file_name
+            self.waveform_widget.set_loop_points(None, None)
+            self.update_active_track()
+            self.load_cover(file_name)
+            self.load_waveform(file_name)
+            self.prev_button.setEnabled(self.current_index > 0)
+            self.next_button.setEnabled(self.current_index < len(self.playlist) - 1)
+            self.current_position = 0
+            self.waveform_widget.set_position(0)
+            self.queue_next_track()
+            self.publish_status()
+        except Exception as e:
+            print(f"Erreur changement de piste: {e}")
+
+    def on_playback_finished(self):
+        """Fin de piste sans enchaînement préparé : passer à la suivante s'il y en a une"""
+        self.is_playing = False
+        self.play_button.setText("▶")
+        if self.peek_next_index() is not None:
+            self.next_track()
+        else:
+            self.publish_status()
+
+    def show_crossfade_menu(self, pos):
+        """Menu contextuel du bouton suivant : durée du fondu enchaîné"""
+        menu = QMenu(self)
+        for label, duration in (("Sans blanc", 0), ("Fondu 2 s", 2), ("Fondu 5 s", 5), ("Fondu 10 s", 10)):
+            action = menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(self.audio_player.crossfade_duration == duration)
+            action.triggered.connect(lambda checked, d=duration: self.audio_player.set_crossfade(d))
+        menu.exec(self.next_button.mapToGlobal(pos))
+
     def toggle_shuffle(self):
         self.shuffle_enabled = not self.shuffle_enabled
         if self.shuffle_enabled:
@@ -1299,42 +2112,54 @@ class MacAmp(QMainWindow):
             self.shuffle_order = []
             self.shuffle_pos = 0
         self.shuffle_button.setChecked(self.shuffle_enabled)
+        if self.current_file:
+            self.queue_next_track()
         print(f"Shuffle {'activé' if self.shuffle_enabled else 'désactivé'}")
 
     def toggle_repeat(self):
-        """Active/désactive la répétition de la piste en cours"""
+        """Active/désactive la répétition de la piste en cours
+
+        La boucle est faite dans le callback audio ; l'interface est prévenue par track_looped.
+        """
         self.repeat_enabled = not self.repeat_enabled
         self.repeat_button.setChecked(self.repeat_enabled)
-        self.audio_player.repeat_enabled = self.repeat_enabled  # Synchroniser avec l'audio player
+        self.audio_player.set_repeat(self.repeat_enabled)  # Synchroniser avec l'audio player
+        if self.current_file:
+            self.queue_next_track()
         print(f"Repeat {'activé' if self.repeat_enabled else 'désactivé'}")
         
-        # Si repeat est activé et qu'une piste est en cours de lecture, s'assurer qu'elle continue
-        if self.repeat_enabled and self.is_playing:
-            self.play()  # Utiliser la méthode play au lieu de self.stream.start()
-            
-        # Ajouter un timer pour vérifier la fin de la piste et réinitialiser la waveform
-        if self.repeat_enabled:
-            self.check_end_timer = QTimer()
-            self.check_end_timer.timeout.connect(self.check_track_end)
-            self.check_end_timer.start(100)  # Vérifier toutes les 100ms
-        else:
-            if hasattr(self, 'check_end_timer'):
-                self.check_end_timer.stop()
-                
-    def check_track_end(self):
-        """Vérifie si la piste est terminée et réinitialise la waveform si nécessaire"""
-        if self.repeat_enabled and self.is_playing:
-            current_pos = self.audio_player.get_position()
-            duration = self.audio_player.get_duration()
-            # Réinitialiser la waveform juste avant la fin de la piste
-            if current_pos >= duration - 0.1:  # 100ms avant la fin
-                self.waveform_widget.set_position(0)
+    def set_loop_point(self, which, seconds):
+        """Pose le point A (0) ou B (1) ; la boucle démarre dès que les deux sont posés"""
+        points = list(self.waveform_widget.loop_points)
+        points[which] = seconds
+        if None not in points:
+            points.sort()
+            if not self.audio_player.set_loop(*points):
+                print("Boucle trop courte")
+                return
+        self.waveform_widget.set_loop_points(*points)
+        
+    def set_loop_point_here(self, which):
+        if self.current_file:
+            self.set_loop_point(which, self.audio_player.get_position())
+        
+    def clear_loop(self):
+        self.audio_player.clear_loop()
+        self.waveform_widget.set_loop_points(None, None)
+        
+    def on_track_looped(self):
+        """Retour au début de la boucle (repeat ou A-B), signalé par le callback"""
+        loop = self.audio_player.get_loop()
+        duration = self.audio_player.get_duration()
+        self.waveform_widget.set_position(loop[0] / duration if loop and duration else 0)
 
     def toggle_playlist(self):
         largeur_constante = 530
         taille_etendue = QSize(530, 430)
         if self.is_large:
             # Rétrécir la fenêtre : retirer la playlist et le bouton d'ajout, ajuster dynamiquement la hauteur
+            self._main_layout.removeWidget(self.search_field)
+            self.search_field.setParent(None)
             self._main_layout.removeWidget(self.playlist_container)
             self.playlist_container.setParent(None)
             self._main_layout.removeWidget(self.browse_button)
@@ -1346,18 +2171,43 @@ class MacAmp(QMainWindow):
         else:
             # Agrandir la fenêtre (largeur/hauteur d'origine), réinsérer la playlist et le bouton d'ajout
             self.resize(taille_etendue)
+            self._main_layout.addWidget(self.search_field)
             self._main_layout.addWidget(self.playlist_container)
             self._main_layout.addWidget(self.browse_button)
             self.centralWidget().layout().activate()
             self.is_large = True
 
+class MacAmpApplication(QApplication):
+    """Transmet à la fenêtre les fichiers ouverts depuis le Finder (QFileOpenEvent)"""
+    def __init__(self, argv):
+        super().__init__(argv)
+        self.window = None
+        self.pending_files = []
+        
+    def event(self, event):
+        if event.type() == QEvent.Type.FileOpen:
+            path = event.file()
+            if path.lower().endswith(('.mp3', '.wav', '.ogg', '.aiff')):
+                if self.window is not None:
+                    self.window.add_files([path])
+                else:
+                    self.pending_files.append(path)
+            return True
+        return super().event(event)
+
 def main():
-    app = QApplication(sys.argv)
+    app = MacAmpApplication(sys.argv)
     
     # Utiliser une police système moderne par défaut
     app.setFont(QFont("SF Pro", 11))
     
     window = MacAmp()
+    app.window = window
+    files = [os.path.abspath(arg) for arg in sys.argv[1:]
+             if not arg.startswith('-') and arg.lower().endswith(('.mp3', '.wav', '.ogg', '.aiff'))]
+    files += app.pending_files
+    if files:
+        window.add_files(files)
     window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,192 @@
+"""Contrôle de MacAmp par socket Unix locale
+
+Protocole : un objet JSON par ligne dans chaque sens. Une commande est de la
+forme {"cmd": "play"} avec ses paramètres ; la réponse reprend l'éventuel
+champ "id" de la commande et contient "ok" (et "error" en cas d'échec).
+
+Commandes propres au serveur :
+- {"cmd": "batch", "commands": [...]} exécute plusieurs commandes en un aller-retour
+  et renvoie {"ok": true, "responses": [...]} ;
+- {"cmd": "subscribe"} abonne la connexion : l'état courant puis chaque
+  changement d'état sont poussés sous la forme {"event": "status", ...} ;
+- {"cmd": "unsubscribe"}.
+
+Ce module n'importe ni Qt ni le moteur audio pour rester rapide à charger.
+"""
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+
+
+def default_socket_path():
+    cache_dir = os.environ.get('MACAMP_CACHE_DIR') or os.path.join(os.path.expanduser("~"), ".macamp")
+    return os.path.join(cache_dir, 'control.sock')
+
+
+class ControlRequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+
+    def send(self, message):
+        # Réponses et événements poussés partagent la connexion
+        data = json.dumps(message).encode('utf-8') + b'\n'
+        with self.write_lock:
+            self.wfile.write(data)
+
+    def handle(self):
+        try:
+            self.serve_lines()
+        except ConnectionError:
+            pass  # Client parti sans fermer proprement
+
+    def serve_lines(self):
+        control = self.server.control
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                command = json.loads(line)
+            except ValueError as e:
+                self.send({'ok': False, 'error': f"JSON invalide: {e}"})
+                continue
+            name = command.get('cmd')
+            if name == 'subscribe':
+                response = {'ok': True}
+            elif name == 'unsubscribe':
+                control.remove_subscriber(self)
+                response = {'ok': True}
+            elif name == 'batch':
+                response = {'ok': True, 'responses': [control.dispatch(c) for c in command.get('commands', [])]}
+            else:
+                response = control.dispatch(command)
+            if 'id' in command:
+                response['id'] = command['id']
+            self.send(response)
+            if name == 'subscribe':
+                # L'abonné reçoit d'abord l'état courant, puis chaque changement
+                self.send(dict(control.dispatch({'cmd': 'status'}), event='status'))
+                control.add_subscriber(self)
+
+    def finish(self):
+        self.server.control.remove_subscriber(self)
+        super().finish()
+
+
+class ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Serveur de commandes : chaque commande est transmise à handler(command) -> dict"""
+    def __init__(self, handler, socket_path=None):
+        self.handler = handler
+        self.socket_path = socket_path or default_socket_path()
+        self.server = None
+        self.thread = None
+        self.subscribers = set()
+        self.subscribers_lock = threading.Lock()
+        # Les événements sont envoyés par un thread dédié : un client lent ne bloque pas l'appelant
+        self.events = queue.Queue()
+        self.publisher = None
+
+    def dispatch(self, command):
+        try:
+            response = self.handler(command)
+        except Exception as e:
+            return {'ok': False, 'error': str(e)}
+        response = dict(response or {})
+        response.setdefault('ok', True)
+        return response
+
+    def add_subscriber(self, connection):
+        with self.subscribers_lock:
+            self.subscribers.add(connection)
+
+    def remove_subscriber(self, connection):
+        with self.subscribers_lock:
+            self.subscribers.discard(connection)
+
+    def publish(self, event):
+        """Pousse un événement ({"event": ..., ...}) à tous les abonnés"""
+        if self.subscribers:
+            self.events.put(event)
+
+    def publish_loop(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            with self.subscribers_lock:
+                subscribers = list(self.subscribers)
+            for connection in subscribers:
+                try:
+                    connection.send(event)
+                except OSError:
+                    self.remove_subscriber(connection)
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            if is_listening(self.socket_path):
+                raise RuntimeError(f"Une instance écoute déjà sur {self.socket_path}")
+            os.unlink(self.socket_path)  # Socket orpheline d'une instance terminée
+        self.server = ThreadingUnixServer(self.socket_path, ControlRequestHandler)
+        self.server.control = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.publisher = threading.Thread(target=self.publish_loop, daemon=True)
+        self.publisher.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.events.put(None)
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+
+def is_listening(socket_path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def send_command(command, socket_path=None, timeout=2.0):
+    """Envoie une commande et renvoie la réponse (client minimal)"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(command).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            return json.loads(reader.readline())
+
+
+def forward_to_running_instance(paths, socket_path=None):
+    """Transmet des fichiers à une fenêtre déjà ouverte ; renvoie False s'il n'y en a pas
+
+    Un lecteur sans interface qui tient la socket ne compte pas : il ne peut pas
+    afficher de fenêtre, la nouvelle instance doit démarrer.
+    """
+    socket_path = socket_path or default_socket_path()
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        if send_command({'cmd': 'status'}, socket_path).get('mode') != 'gui':
+            return False
+        response = send_command({'cmd': 'enqueue', 'paths': [os.path.abspath(p) for p in paths],
+                                 'activate': True}, socket_path)
+    except (OSError, ValueError):
+        return False  # Socket orpheline : cette instance prendra le relais
+    return response.get('ok', False)
@@ -0,0 +1,220 @@
+"""Comportement du moteur audio : boucle, enchaînement, égaliseur, positionnement MP3
+
+Aucun périphérique n'est ouvert : les blocs sont lus directement par read_source
+ou rendus par render_to_file.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+import audio_engine
+from audio_engine import (AudioPlayer, ParametricEqualizer, SeekIndexStore, StreamingSource,
+                          build_seek_index, render_to_file)
+
+
+def setUpModule():
+    global TEMP_DIR
+    TEMP_DIR = tempfile.mkdtemp(prefix='macamp-tests-')
+    os.environ['MACAMP_CACHE_DIR'] = os.path.join(TEMP_DIR, 'cache')
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+def sine(seconds, sample_rate=44100, amplitude=0.5, freq=440.0):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+    return np.repeat(signal[:, None], 2, axis=1)
+
+
+def player_with(audio_data, sample_rate, block_size=512):
+    player = AudioPlayer()
+    player.latency_tuner.enabled = False
+    player.audio_data = np.ascontiguousarray(audio_data, dtype=np.float32)
+    player.sample_rate = sample_rate
+    player.current_file = 'test'
+    player.ensure_buffers(block_size)
+    player.update_crossfade_curves()
+    player.update_seam_curves()
+    return player
+
+
+def read_blocks(player, count, block_size):
+    blocks = []
+    for _ in range(count):
+        mix = np.zeros((block_size, 2), dtype=np.float32)
+        player.read_source(mix, block_size)
+        blocks.append(mix)
+    return np.concatenate(blocks)
+
+
+class LoopTest(unittest.TestCase):
+    def test_ab_loop_is_sample_accurate(self):
+        sample_rate = 8000
+        total = 8000
+        ramp = np.arange(total, dtype=np.float32) / total
+        player = player_with(np.vstack([ramp, ramp]), sample_rate)
+        self.assertTrue(player.set_loop(1000 / sample_rate, 3000 / sample_rate))
+        looped = []
+        player.on_track_looped = lambda: looped.append(player.current_frame)
+        player.current_frame = 2500
+        output = read_blocks(player, 8, 256)[:, 0]
+
+        # Jusqu'à la fin de boucle, puis retour au début avec le fondu de jointure
+        seam = len(player.seam_fade_in)
+        expected = np.concatenate([
+            ramp[2500:3000],
+            ramp[1000:1000 + seam] * player.seam_fade_in + ramp[3000:3000 + seam] * player.seam_fade_out,
+            ramp[1000 + seam:1000 + len(output) - 500],
+        ])
+        np.testing.assert_allclose(output, expected, atol=1e-6)
+        self.assertEqual(looped, [1000])
+
+    def test_loop_shorter_than_two_seams_is_refused(self):
+        player = player_with(np.zeros((2, 8000)), 8000)
+        self.assertFalse(player.set_loop(0.5, 0.5 + 1 / 8000))
+        self.assertIsNone(player.get_loop())
+
+
+class EndOfStreamTest(unittest.TestCase):
+    def test_track_ending_on_block_boundary_finishes_once(self):
+        for total in (4096, 4000):
+            player = player_with(np.full((2, total), 0.1), 44100)
+            player.is_playing = True
+            finished = []
+            player.on_playback_finished = lambda: finished.append(player.current_frame)
+            output = read_blocks(player, 10, 512)
+            self.assertEqual(finished, [total])
+            self.assertTrue(player.end_of_stream)
+            self.assertEqual(int(np.count_nonzero(output[:, 0])), total)
+
+
+class TrackSwitchGainTest(unittest.TestCase):
+    def test_transition_block_keeps_one_gain_domain(self):
+        """WAV int16 (échelle dans le gain de sortie) <-> piste décodée en float, dans les deux sens"""
+        signal = sine(2, freq=44100 * 0.05 / (2 * np.pi))
+        pcm_path = os.path.join(TEMP_DIR, 'boundary-int16.wav')
+        decoded_path = os.path.join(TEMP_DIR, 'boundary-float.flac')
+        output = os.path.join(TEMP_DIR, 'boundary-export.wav')
+        sf.write(pcm_path, signal, 44100, subtype='PCM_16')
+        sf.write(decoded_path, signal, 44100)
+        for files in ([pcm_path, decoded_path], [decoded_path, pcm_path]):
+            with self.subTest(first=os.path.basename(files[0])):
+                render_to_file(files, output, block_size=512)
+                mixed, _ = sf.read(output, dtype='float32')
+                peaks = np.abs(mixed[:len(mixed) // 512 * 512, 0]).reshape(-1, 512).max(axis=1)
+                self.assertLess(peaks.max(), 0.51)
+                self.assertGreater(peaks.min(), 0.4)
+
+
+class EqualizerTest(unittest.TestCase):
+    def setUp(self):
+        self.signal = sine(1, amplitude=0.5, freq=250.0)
+
+    def process_blocks(self, equalizer, changes, block_size=512):
+        blocks = []
+        for index in range(len(self.signal) // block_size):
+            for band, gain_db in changes.get(index, ()):
+                equalizer.set_band(band, gain_db=gain_db)
+            block = self.signal[index * block_size:(index + 1) * block_size].copy()
+            equalizer.process(block)
+            blocks.append(block)
+        return np.concatenate(blocks)
+
+    def test_blocks_match_one_pass_filter(self):
+        from scipy.signal import sosfilt
+        equalizer = ParametricEqualizer(44100)
+        output = self.process_blocks(equalizer, {0: [(3, 5.0)]})
+        reference = sosfilt(equalizer.coefficients[1], self.signal[:len(output)].astype(np.float64), axis=0)
+        np.testing.assert_allclose(output, reference, atol=1e-6)
+
+    def test_band_to_and_from_flat_keeps_state(self):
+        equalizer = ParametricEqualizer(44100)
+        output = self.process_blocks(equalizer, {0: [(0, 4.0), (1, 6.0)], 40: [(1, 0.0)], 60: [(2, -3.0)]})
+        self.assertEqual(equalizer.zi.shape, (2, len(equalizer.bands), 2))
+        # Pas de saut aux changements de réglage : pente bornée par celle du signal filtré juste avant
+        steps = np.abs(np.diff(output[:, 0]))
+        for change in (40 * 512, 60 * 512):
+            before = steps[change - 10 * 512:change - 2].max()
+            self.assertLess(steps[change - 2:change + 2].max(), 1.1 * before)
+
+    def test_all_flat_is_bypassed(self):
+        equalizer = ParametricEqualizer(44100)
+        equalizer.set_band(2, gain_db=3.0)
+        equalizer.set_band(2, gain_db=0.0)
+        self.assertIsNone(equalizer.coefficients[1])
+        block = self.signal[:512].copy()
+        equalizer.process(block)
+        np.testing.assert_array_equal(block, self.signal[:512])
+
+
+@unittest.skipUnless('MP3' in sf.available_formats(), "libsndfile sans MP3")
+class Mp3SeekTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.path = os.path.join(TEMP_DIR, 'seek.mp3')
+        rng = np.random.default_rng(0)
+        signal = sine(20, amplitude=0.3, freq=330.0) + 0.02 * rng.standard_normal((20 * 44100, 1)).astype(np.float32)
+        sf.write(cls.path, signal, 44100, format='MP3')
+        cls.index = build_seek_index(cls.path)
+
+    def test_indexed_seek_matches_decoding_from_start(self):
+        reference = StreamingSource(self.path)
+        total = reference.shape[1]
+        self.assertEqual(self.index['total'], total)
+        full = np.asarray(reference)
+        for position in (0, 1152 * 7 + 13, total // 3, total // 2 + 101, total - 5000):
+            with self.subTest(position=position):
+                # Source neuve : le premier bloc est décodé depuis l'index, sans lecture préalable
+                source = StreamingSource(self.path, self.index)
+                source.prepare(position)
+                np.testing.assert_allclose(source[:, position:position + 4096], full[:, position:position + 4096],
+                                           atol=1e-6)
+
+    def test_index_store_round_trip_and_invalidation(self):
+        store = SeekIndexStore()
+        store.set(self.path, self.index)
+        self.assertEqual(store.get(self.path), self.index)
+        copy = os.path.join(TEMP_DIR, 'seek-copy.mp3')
+        shutil.copy(self.path, copy)
+        store.set(copy, self.index)
+        os.utime(copy, ns=(1, 1))
+        self.assertIsNone(store.get(copy))
+        self.assertIsNone(store.get(os.path.join(TEMP_DIR, 'absent.mp3')))
+
+
+class StreamingLoopTest(unittest.TestCase):
+    def test_loop_head_stays_decoded(self):
+        path = os.path.join(TEMP_DIR, 'loop.ogg')
+        sf.write(path, sine(40, amplitude=0.3), 44100)
+        source = StreamingSource(path)
+        chunk = source.CHUNK_FRAMES
+        source.set_loop((chunk // 2, 9 * chunk + 100), seam_frames=441)
+        StreamingSource.prefetcher.submit(lambda: None).result()  # Attendre les décodages demandés
+        for number in range(2, 10):
+            source.decode_chunk(number)  # Lecture jusqu'à la fin de boucle
+        self.assertIn(0, source.chunks)
+        self.assertIn(9, source.chunks)
+        source.set_loop(None)
+        self.assertEqual(source.pinned, frozenset())
+
+
+class LazyImportTest(unittest.TestCase):
+    def test_engine_import_does_not_load_analysis_modules(self):
+        import subprocess
+        import sys
+        code = ("import sys, audio_engine; "
+                "print(','.join(m for m in ('librosa', 'scipy.signal', 'PIL.Image', 'mutagen') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(audio_engine.__file__)))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
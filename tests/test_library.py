@@ -0,0 +1,75 @@
+"""Recherche et tri de la playlist : SearchIndex et SortKeys"""
+import unittest
+
+import numpy as np
+
+from audio_engine import SearchIndex, SortKeys, collation_key
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(0, "Beyoncé - Halo.mp3", "Beyoncé", "Halo")
+        self.index.add(1, "Daft Punk - Around the World.mp3", "Daft Punk", "Around the World")
+        self.index.add(2, "piste_03.wav")
+
+    def matches(self, query):
+        return np.flatnonzero(self.index.search(query)).tolist()
+
+    def test_prefix_without_accents_or_case(self):
+        self.assertEqual(self.matches("beyo"), [0])
+        self.assertEqual(self.matches("BEYONCE"), [0])
+        self.assertEqual(self.matches("wor"), [1])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.matches("daft world"), [1])
+        self.assertEqual(self.matches("daft halo"), [])
+        self.assertEqual(self.matches("inconnu"), [])
+
+    def test_empty_query_shows_everything(self):
+        self.assertIsNone(self.index.search("  "))
+
+    def test_tags_received_later_are_searchable(self):
+        self.index.add(2, "Artiste", "Titre tardif")
+        self.assertEqual(self.matches("tardif"), [2])
+        self.assertEqual(self.matches("piste"), [2])  # Le nom de fichier reste indexé
+        self.assertEqual(self.matches("a"), [1, 2])
+
+
+class SortKeysTest(unittest.TestCase):
+    def setUp(self):
+        self.keys = SortKeys()
+        rows = [
+            {'artist': "Zoé", 'title': "b", 'track': 2, 'length': 30.0},
+            {'artist': "alpha", 'title': "A", 'length': 10.0},
+            {'artist': "Élodie", 'title': "c", 'track': 1, 'length': 20.0},
+            {'artist': "alpha", 'title': "C", 'track': 3, 'length': 10.0},
+        ]
+        for entry, metadata in enumerate(rows):
+            self.keys.set(entry, metadata)
+        self.entries = np.arange(4)
+
+    def sorted_entries(self, name, descending=False, entries=None):
+        entries = self.entries if entries is None else entries
+        return entries[self.keys.order(name, entries, descending)].tolist()
+
+    def test_text_columns_ignore_accents_and_case(self):
+        self.assertEqual(self.sorted_entries('artist'), [1, 3, 2, 0])
+        self.assertEqual(collation_key("Élodie"), "elodie")
+
+    def test_tracks_without_number_sort_last(self):
+        self.assertEqual(self.sorted_entries('track'), [2, 0, 3, 1])
+
+    def test_sort_is_stable_in_both_directions(self):
+        by_title = np.array(self.sorted_entries('title'))
+        # À artiste égal, l'ordre par titre est conservé
+        self.assertEqual(self.sorted_entries('artist', entries=by_title), [1, 3, 2, 0])
+        self.assertEqual(self.sorted_entries('duration', descending=True), [0, 2, 1, 3])
+
+    def test_updated_metadata_changes_order(self):
+        self.keys.set(0, {'artist': "Aaron", 'title': "b", 'track': 2, 'length': 30.0})
+        self.assertEqual(self.sorted_entries('artist')[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
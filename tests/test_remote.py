@@ -0,0 +1,162 @@
+"""Contrôle à distance : protocole de la socket, lecteur sans interface, fenêtre
+
+Les commandes qui ouvriraient un stream audio (play) ne sont pas envoyées.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from remote_control import ControlServer, forward_to_running_instance, send_command
+
+
+def setUpModule():
+    global TEMP_DIR, TRACK
+    TEMP_DIR = tempfile.mkdtemp(prefix='macamp-tests-')
+    os.environ['MACAMP_CACHE_DIR'] = os.path.join(TEMP_DIR, 'cache')
+    TRACK = os.path.join(TEMP_DIR, 'piste.wav')
+    t = np.arange(5 * 44100) / 44100
+    sf.write(TRACK, np.repeat((0.3 * np.sin(2 * np.pi * 440 * t))[:, None], 2, axis=1), 44100)
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+class ControlServerTest(unittest.TestCase):
+    def setUp(self):
+        self.received = []
+        self.socket_path = os.path.join(TEMP_DIR, 'c.sock')
+        self.mode = 'gui'
+        self.server = ControlServer(self.handle, self.socket_path)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def handle(self, command):
+        self.received.append(command)
+        if command['cmd'] == 'fail':
+            raise ValueError("échec voulu")
+        return {'mode': self.mode, 'echo': command['cmd']}
+
+    def test_reply_carries_ok_and_id(self):
+        response = send_command({'cmd': 'status', 'id': 7}, self.socket_path)
+        self.assertEqual(response, {'mode': 'gui', 'echo': 'status', 'ok': True, 'id': 7})
+
+    def test_handler_error_is_reported(self):
+        response = send_command({'cmd': 'fail'}, self.socket_path)
+        self.assertFalse(response['ok'])
+        self.assertEqual(response['error'], "échec voulu")
+
+    def test_batch_runs_commands_in_order(self):
+        response = send_command({'cmd': 'batch', 'commands': [{'cmd': 'next'}, {'cmd': 'status'}]},
+                                self.socket_path)
+        self.assertEqual([r['echo'] for r in response['responses']], ['next', 'status'])
+
+    def test_forward_only_to_a_window(self):
+        self.assertTrue(forward_to_running_instance([TRACK], self.socket_path))
+        self.assertEqual(self.received[-1]['paths'], [TRACK])
+        self.mode = 'headless'
+        self.received.clear()
+        self.assertFalse(forward_to_running_instance([TRACK], self.socket_path))
+        self.assertEqual([c['cmd'] for c in self.received], ['status'])
+
+
+class HeadlessCommandTest(unittest.TestCase):
+    def setUp(self):
+        from headless import HeadlessPlayer
+        self.headless = HeadlessPlayer([TRACK])
+        self.assertTrue(self.headless.load_position(0, start=False))
+
+    def tearDown(self):
+        self.headless.player.shutdown()
+
+    def test_status_reports_headless_mode(self):
+        status = self.headless.execute({'cmd': 'status'})
+        self.assertEqual(status['mode'], 'headless')
+        self.assertEqual(status['state'], 'paused')
+        self.assertAlmostEqual(status['duration'], 5.0)
+
+    def test_seek_while_paused_moves_position(self):
+        status = self.headless.execute({'cmd': 'seek', 'position': 2.5})
+        self.assertAlmostEqual(status['position'], 2.5)
+
+    def test_loop_bounds_are_checked(self):
+        self.assertTrue(self.headless.execute({'cmd': 'loop', 'start': 1.0, 'end': 2.0})['ok'])
+        self.assertEqual(self.headless.player.get_loop(), (1.0, 2.0))
+        self.assertFalse(self.headless.execute({'cmd': 'loop', 'start': 1.0, 'end': 1.001})['ok'])
+        self.headless.execute({'cmd': 'loop'})
+        self.assertIsNone(self.headless.player.get_loop())
+
+    def test_enqueue_and_unknown_command(self):
+        self.assertEqual(self.headless.execute({'cmd': 'enqueue', 'paths': [TRACK]})['added'], 1)
+        self.assertEqual(len(self.headless.playlist), 2)
+        self.assertFalse(self.headless.execute({'cmd': 'rewind'})['ok'])
+
+
+class WindowCommandTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        try:
+            from PyQt6.QtWidgets import QApplication
+            from macamp import MacAmp
+        except ImportError as e:
+            raise unittest.SkipTest(f"Interface indisponible: {e}")
+        cls.QApplication = QApplication
+        cls.previous_dir = os.getcwd()
+        # Icônes et police sont chargées relativement à la racine du dépôt
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        cls.app = QApplication.instance() or QApplication([])
+        cls.window = MacAmp()
+
+    @classmethod
+    def tearDownClass(cls):
+        # Laisser finir les analyses en cours avant d'effacer le dossier temporaire ; après
+        # closeEvent (shutdown sans attente), un second shutdown n'attendrait plus les workers
+        for pool in (cls.window.analysis_pool, cls.window.loudness_pool, cls.window.beat_pool):
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+        cls.window.close()
+        os.chdir(cls.previous_dir)
+
+    def test_no_track_seek_fails(self):
+        # Avant test_seek_* (ordre alphabétique) : aucune piste n'est encore chargée
+        response = self.window.handle_remote_command({'cmd': 'seek', 'position': 3})
+        self.assertFalse(response['ok'])
+
+    def test_seek_does_not_wait_for_waveform(self):
+        self.window.handle_remote_command({'cmd': 'enqueue', 'paths': [TRACK]})
+        response = self.window.handle_remote_command({'cmd': 'seek', 'position': 1.5})
+        self.assertEqual(response['mode'], 'gui')
+        self.assertAlmostEqual(response['position'], 1.5)
+
+    def test_timeout_is_reported_and_command_dropped(self):
+        executed = []
+        handler = self.window.handle_remote_command
+        self.window.handle_remote_command = lambda command: executed.append(command) or handler(command)
+        try:
+            result = {}
+            # Boucle d'événements arrêtée : l'interface ne répond pas
+            thread = threading.Thread(target=lambda: result.update(
+                self.window.submit_remote_command({'cmd': 'status'}, timeout=0.2)))
+            thread.start()
+            thread.join()
+            time.sleep(0.05)
+            self.QApplication.processEvents()
+            self.assertFalse(result['ok'])
+            self.assertTrue(result['error'])
+            self.assertEqual(executed, [])
+        finally:
+            del self.window.handle_remote_command
+
+
+if __name__ == '__main__':
+    unittest.main()